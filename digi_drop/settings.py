@@ -97,9 +97,98 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not the in-memory default, so spawned process pools (audit_points) can reach it
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Cache
+# Login nonces, rate limits and counters live here. Use a shared cache
+# (e.g. CACHE_URL=redis://127.0.0.1:6379/1) when running more than one worker.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+LOGIN_NONCE_TTL = 300
+
+# Wallet signature recovery. 0 workers recovers inline on the web worker;
+# set it to the number of cores to run recoveries on a process pool.
+SIGNATURE_RECOVERY_WORKERS = env.int('SIGNATURE_RECOVERY_WORKERS', default=0)
+SIGNATURE_RECOVERY_QUEUE_SIZE = env.int('SIGNATURE_RECOVERY_QUEUE_SIZE', default=64)
+SIGNATURE_RECOVERY_QUEUE_TIMEOUT = 2
+
+# Last-seen tracking: one cache write per user per resolution window, queued in the cache
+# and flushed to DigiUser.last_connected_at in bulk every flush interval by whichever
+# worker gets there first, or by `manage.py flush_activity --loop`. With more than one
+# worker the cache must be shared (CACHE_URL).
+ACTIVITY_RESOLUTION = 60
+ACTIVITY_FLUSH_INTERVAL = 30
+
+# Score histogram bucket width for rank lookups (main.services.rank). Smaller buckets
+# make the within-bucket distinct count cheaper but the histogram larger.
+RANK_BUCKET_WIDTH = 10
+
+# Platform counters (main.services.counters) are spread over this many rows each,
+# and the public stats endpoint caches them for GLOBAL_STATS_CACHE_TTL seconds.
+PLATFORM_COUNTER_SHARDS = 8
+GLOBAL_STATS_CACHE_TTL = 10
+
+# Leaderboard snapshot (main.services.leaderboard): rebuilt when a change reaches the
+# board; the TTL only bounds staleness if an invalidation is ever lost.
+LEADERBOARD_SIZE = 100
+LEADERBOARD_SNAPSHOT_TTL = 5 * 60
+LEADERBOARD_PAGE_MAX_SIZE = 100
+PERIOD_LEADERBOARD_CACHE_TTL = 30
+
+# Seasons (main.services.seasons): the active season id is cached for SEASON_CACHE_TTL
+# and dropped on start/close; an active season's board is cached like the period boards.
+# Run more than one worker only with a shared CACHE_URL: with per-process caches the
+# other workers keep the old id until the TTL runs out. Their writes to a closed season
+# are discarded, but awards to a newly started season are missed until then.
+SEASON_CACHE_TTL = 60
+SEASON_LEADERBOARD_CACHE_TTL = 30
+
+# Users whose SybilScore (written by the score_sybils command) is at or above this are
+# left off every leaderboard and out of allocate_airdrop.
+SYBIL_SCORE_THRESHOLD = env.float('SYBIL_SCORE_THRESHOLD', default=0.7)
+
+# Per-user profile payloads (main.services.profile_cache) are invalidated by a generation
+# bump on every profile write; the TTLs only bound memory and cross-user drift (rank).
+PROFILE_CACHE_TTL = 10 * 60
+PROFILE_STATS_CACHE_TTL = 15
+
+# Live push (main.services.live): each process polls the shared event log in the cache
+# once per LIVE_POLL_INTERVAL seconds and fans events out to its SSE clients. Needs a
+# shared CACHE_URL when running more than one process.
+LIVE_POLL_INTERVAL = 1
+LIVE_EVENT_TTL = 60
+LIVE_KEEPALIVE_INTERVAL = 15
+LIVE_RETRY_MS = 3000
+LIVE_SUBSCRIBER_QUEUE_SIZE = 100
+LIVE_TICKET_TTL = 30  # seconds a POST /live/ticket ticket can be redeemed, once
+
+# Write-behind points (main.services.points): task and referral awards are summed per user
+# and reason in the cache and applied in batches by the first award after each
+# POINTS_FLUSH_INTERVAL and by `manage.py flush_pending_points`. Pending points live only
+# in the cache, so enable it only with a shared, non-evicting CACHE_URL, and flush before
+# turning it off. POINTS_FLUSH_BATCH_SIZE counts queued users per batch.
+POINTS_WRITE_BEHIND = env.bool('POINTS_WRITE_BEHIND', default=False)
+POINTS_FLUSH_INTERVAL = 5
+POINTS_FLUSH_BATCH_SIZE = 5000
+
+# Point rollups (main.services.rollups): the rank histogram, DailyPointDelta and SeasonScore
+# rows are rolled up from the PointEvent ledger in batches: one batch after the first award
+# in each POINTS_ROLLUP_INTERVAL, and any backlog by `manage.py roll_up_points --loop`. Events younger than
+# POINTS_ROLLUP_LAG seconds wait for the next run, so it must exceed the longest award
+# transaction.
+POINTS_ROLLUP_INTERVAL = 5
+POINTS_ROLLUP_LAG = 10
+
+# Dashboard (/dashboard): sections are built concurrently on a thread pool of this size,
+# each worker thread using its own DB connection. 0 builds them one after another.
+DASHBOARD_MAX_WORKERS = env.int('DASHBOARD_MAX_WORKERS', default=4)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -148,12 +237,28 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
    
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'main.authentication.ProfileClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication'
-    )
+    ),
+    # Proxies in front of the app; the client IP is taken from X-Forwarded-For accordingly.
+    # 0 uses REMOTE_ADDR: without a proxy, X-Forwarded-For is client-controlled. Set it
+    # to the number of proxies in production.
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    # "<view throttle_scope>.<ip|nonce|wallet|user>": "<requests>/<period>", see main/throttling.py.
+    # login.ip counts login attempts (POST) and login.nonce the nonce requests (GET).
+    'DEFAULT_THROTTLE_RATES': {
+        'login.nonce': '30/m',
+        'login.ip': '30/m',
+        'login.wallet': '10/m',
+        'verify_payment.user': '10/m',
+        'testnet_onboard.ip': '10/h',
+    },
  
 }
 
+# One testnet application (and faucet payout) per IP per week
+TESTNET_REGISTRATION_RATE = '1/7d'
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
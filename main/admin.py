@@ -6,7 +6,8 @@ from django.contrib import admin
 from web3 import Web3
 
 from .utils import get_bnb_usd_price
-from .models import DigiPass, DigiUser, Profile, PassTransaction, Task, UserTaskCompletion, TestnetApplication
+from .models import (DigiPass, DigiUser, PointEvent, Profile, PassTransaction, Season, SeasonStanding,
+                     SybilScore, Task, UserTaskCompletion, TestnetApplication)
 
 admin.site.register([DigiUser, Profile, PassTransaction, TestnetApplication])
 
@@ -22,6 +23,60 @@ class UserTaskCompletionAdmin(admin.ModelAdmin):
     list_display = ('user', 'task', 'completed_at', 'awarded_points')
     list_filter = ('task',)
 
+@admin.register(PointEvent)
+class PointEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'amount', 'balance_after', 'reason', 'reference', 'created_at')
+    list_filter = ('reason',)
+    raw_id_fields = ('user',)
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Season)
+class SeasonAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'starts_at', 'ends_at')
+    list_filter = ('status',)
+    # Opened and closed with the start_season / close_season commands
+    readonly_fields = ('status', 'starts_at', 'ends_at')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(SeasonStanding)
+class SeasonStandingAdmin(admin.ModelAdmin):
+    list_display = ('season', 'rank', 'user', 'points')
+    list_filter = ('season',)
+    raw_id_fields = ('user',)
+
+    # Frozen when the season closed
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SybilScore)
+class SybilScoreAdmin(admin.ModelAdmin):
+    list_display = ('user', 'score', 'star_size', 'mint_burst', 'task_burst', 'cheapest_pass', 'scored_at')
+    list_filter = ('cheapest_pass',)
+    ordering = ('-score',)
+    raw_id_fields = ('user',)
+    # Written by the score_sybils command
+    readonly_fields = ('score', 'star_size', 'mint_burst', 'task_burst', 'cheapest_pass', 'scored_at')
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(DigiPass)
 class DigiPassAdmin(admin.ModelAdmin):
     list_display = ('pass_id','name', 'usd_price', 'point_power')
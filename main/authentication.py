@@ -0,0 +1,142 @@
+from uuid import UUID
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import DigiUser, Profile
+from .services.activity import record_activity
+from .services.leaderboard import invalidate_leaderboard
+from .services.profile_cache import bump_generation
+
+CLAIMS_VERSION_KEY = "profile_claims_version:{}"
+INACTIVE = -1  # cached in place of the version for users that are deactivated or gone
+
+
+class ProfileClaimsRefreshToken(RefreshToken):
+    """
+    Refresh/access token pair that carries the pass claims permission checks need:
+    has_pass, the pass point_power and the profile's claims_version.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        profile = user.profile
+        token["has_pass"] = profile.has_pass
+        token["point_power"] = getattr(profile.current_pass, "point_power", 1)
+        token["claims_version"] = profile.claims_version
+        return token
+
+
+class TokenClaimsUser(SimpleLazyObject):
+    """
+    Stands in for the DigiUser of a validated token. pk and the auth flags come from the
+    token; the row is only loaded if a view touches any other attribute.
+    Filter on user_id=request.user.pk to keep it unloaded.
+    """
+
+    def __init__(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        super().__init__(lambda: DigiUser.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+        self.__dict__["_user_id"] = UUID(str(user_id))
+
+    @property
+    def pk(self):
+        return self.__dict__["_user_id"]
+
+    id = pk
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        # IsAuthenticated tests bool(request.user); answer without loading the row
+        return True
+
+
+class ProfileClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not load the user per request. Whether the user still
+    exists and is active rides on the cached claims_version check (a cache hit per
+    request); deactivating or deleting a user drops that entry. Every authenticated
+    request is recorded as activity (coalesced in the cache, flushed to the DB in bulk).
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            record_activity(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if _current_claims_version(validated_token[api_settings.USER_ID_CLAIM]) is None:
+            raise AuthenticationFailed("User is inactive or no longer exists", code="user_inactive")
+        return TokenClaimsUser(validated_token)
+
+
+def _read_claims_version(user_id):
+    version = (
+        Profile.objects.filter(user_id=user_id, user__is_active=True)
+        .values_list("claims_version", flat=True).first()
+    )
+    return INACTIVE if version is None else version
+
+
+def _current_claims_version(user_id):
+    """The profile's claims_version, or None if the user is deactivated or gone."""
+    key = CLAIMS_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _read_claims_version(user_id)
+        # add, not set: never overwrite a newer version written by invalidate_pass_claims
+        cache.add(key, version, timeout=60 * 60)
+    return None if version == INACTIVE else version
+
+
+def forget_claims_version(user_id):
+    """Drops the cached claims_version once the current transaction commits; the next request re-reads it."""
+    transaction.on_commit(lambda: cache.delete(CLAIMS_VERSION_KEY.format(user_id)))
+
+
+def get_token_pass_claims(token, user_id):
+    """
+    Returns {"has_pass", "point_power"} from an access token when its claims_version is
+    still current, otherwise None and the caller should read the profile instead.
+    """
+    if token is None or "claims_version" not in token:
+        return None
+    if _current_claims_version(user_id) != token["claims_version"]:
+        return None
+    return {"has_pass": token["has_pass"], "point_power": token["point_power"]}
+
+
+def get_pass_claims(request):
+    return get_token_pass_claims(request.auth, request.user.pk)
+
+
+def get_point_power(request):
+    claims = get_pass_claims(request)
+    if claims is not None:
+        return claims["point_power"]
+    return getattr(request.user.profile.current_pass, "point_power", 1)
+
+
+def invalidate_pass_claims(user_id):
+    """
+    Bumps the profile's claims_version so tokens issued before a pass mint or upgrade
+    stop being trusted, and marks the leaderboard stale. Call it inside the transaction
+    that changes the pass.
+    Returns the new version.
+    """
+    Profile.objects.filter(user_id=user_id).update(claims_version=F("claims_version") + 1)
+    version = _read_claims_version(user_id)
+    transaction.on_commit(lambda: cache.set(CLAIMS_VERSION_KEY.format(user_id), version, timeout=60 * 60))
+    bump_generation(user_id)
+    # A new pass holder may belong on the leaderboard
+    invalidate_leaderboard()
+    return version
@@ -0,0 +1,92 @@
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from main.services.points_audit import (apply_corrections, audit_opening_range, audit_range, ledger_start,
+                                        user_id_ranges)
+from main.services.workers import setup_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every points balance against the sum of its PointEvent ledger. The user id "
+        "space is split into ranges audited in parallel on a process pool; mismatches are "
+        "streamed to a CSV report and, with --apply, reset to the ledger total. Flush "
+        "write-behind points first (flush_pending_points) so queued awards are not reported. "
+        "--opening-report also checks the opening balances the ledger started from against the "
+        "task, referral and pass-upgrade history before it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--report", help="CSV file for the mismatches (default: stdout).")
+        parser.add_argument("--apply", action="store_true", help="Reset mismatched balances to their ledger totals.")
+        parser.add_argument("--chunks", type=int, default=256, help="Number of user id ranges.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Process pool size (default: all cores); 0 audits in this process.")
+        parser.add_argument("--opening-report",
+                            help="CSV file for opening balances below what the user's history explains.")
+        parser.add_argument("--opening-tolerance", type=int,
+                            help="Also report opening balances more than this many points above the history "
+                                 "(daily login points are not part of it).")
+
+    def handle(self, *args, **options):
+        if options["chunks"] < 1:
+            raise CommandError("--chunks must be at least 1")
+        ranges = user_id_ranges(options["chunks"])
+        report = open(options["report"], "w", newline="") if options["report"] else sys.stdout
+        started = time.perf_counter()
+        mismatched = corrected = 0
+        try:
+            writer = csv.writer(report)
+            writer.writerow(["user_id", "balance", "ledger_total", "difference"])
+            for rows in self.audit(options["workers"], audit_range, ranges):
+                for user_id, balance, ledger_total in rows:
+                    writer.writerow([user_id, balance, ledger_total, ledger_total - balance])
+                mismatched += len(rows)
+                if options["apply"] and rows:
+                    corrected += len(apply_corrections(user_id for user_id, _, _ in rows))
+        finally:
+            if report is not sys.stdout:
+                report.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"Audited {len(ranges)} ranges in {elapsed:.1f}s: {mismatched} mismatched balances, {corrected} corrected."
+        ))
+        if options["opening_report"]:
+            self.audit_openings(ranges, options)
+
+    def audit_openings(self, ranges, options):
+        started = ledger_start()
+        if started is None:
+            self.stderr.write("The ledger is empty; no opening balances to check.")
+            return
+        suspicious = 0
+        with open(options["opening_report"], "w", newline="") as report:
+            writer = csv.writer(report)
+            writer.writerow(["user_id", "opening_balance", "reconstructed", "difference"])
+            for rows in self.audit(options["workers"], audit_opening_range, ranges, started, options["opening_tolerance"]):
+                writer.writerows(rows)
+                suspicious += len(rows)
+        self.stderr.write(self.style.SUCCESS(
+            f"Checked opening balances against the history before {started:%Y-%m-%d %H:%M}: {suspicious} suspicious."
+        ))
+
+    def audit(self, workers, function, ranges, *args):
+        """Yields function(first, last, *args) for each range as soon as it is done."""
+        if workers <= 0:
+            for first, last in ranges:
+                yield function(first, last, *args)
+            return
+        # spawn, not fork: each worker sets Django up and opens its own DB connection
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=setup_worker, initargs=(str(connection.settings_dict["NAME"]),),
+        ) as pool:
+            futures = [pool.submit(function, first, last, *args) for first, last in ranges]
+            for future in as_completed(futures):
+                yield future.result()
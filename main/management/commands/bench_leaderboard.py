@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main.serializers import LeaderboardSerializer
+from main.services.leaderboard import leaderboard_queryset, top_rows
+
+
+def serializer_per_row(size):
+    """The previous LeaderboardView.list: one serializer and one wallet query per row."""
+    return [
+        LeaderboardSerializer(profile, context={"rank": rank}).data
+        for rank, profile in enumerate(leaderboard_queryset()[:size], start=1)
+    ]
+
+
+def bulk(size):
+    return top_rows(size)[0]
+
+
+class Command(BaseCommand):
+    help = "Compare queries and latency of building the leaderboard per row vs in one query, on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--size", type=int, default=settings.LEADERBOARD_SIZE)
+
+    def handle(self, *args, **options):
+        iterations, size = options["iterations"], options["size"]
+        results = {}
+        for name, build in (("per-row", serializer_per_row), ("bulk", bulk)):
+            with CaptureQueriesContext(connection) as queries:
+                rows = build(size)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                build(size)
+            latency = (time.perf_counter() - started) / iterations * 1000
+            results[name] = rows
+            self.stdout.write(f"{name:8} {len(rows)} rows, {len(queries)} queries, {latency:.2f} ms per build")
+
+        if results["per-row"] != results["bulk"]:
+            self.stderr.write("Outputs differ between the two paths")
@@ -0,0 +1,40 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from main.services.signature import recover_signer
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark wallet signature recovery, inline and on a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=2000, help="Signatures to recover per run.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Process pool size for the pooled run (default: all cores).")
+
+    def handle(self, *args, **options):
+        count, workers = options["count"], options["workers"]
+        account = Account.create()
+        messages = [f"Login to Digidrop: bench-{i}" for i in range(count)]
+        signatures = [account.sign_message(encode_defunct(text=m)).signature.hex() for m in messages]
+
+        started = time.perf_counter()
+        for message, signature in zip(messages, signatures):
+            recover_signer(message, signature)
+        inline_rate = count / (time.perf_counter() - started)
+        self.stdout.write(f"inline:  {inline_rate:,.0f} recoveries/s on 1 core")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(recover_signer, messages[:workers], signatures[:workers]))  # warm up
+            started = time.perf_counter()
+            list(pool.map(recover_signer, messages, signatures, chunksize=max(1, count // (workers * 8))))
+            pooled_rate = count / (time.perf_counter() - started)
+        cores = min(workers, os.cpu_count() or 1)
+        self.stdout.write(
+            f"pooled:  {pooled_rate:,.0f} recoveries/s on {workers} processes / {cores} cores "
+            f"({pooled_rate / cores:,.0f}/s per core, {pooled_rate / inline_rate:.1f}x inline)"
+        )
+        self.stdout.write(f"backend: {type(Account._keys.backend).__name__}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.services.seasons import SeasonError, close_season
+
+
+class Command(BaseCommand):
+    help = (
+        "Close the active season: freeze every pass holder's season points and rank into "
+        "read-only standings and drop the season's live scores."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            season = close_season()
+        except SeasonError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed season {season.id} ({season.name}) with {season.standings.count()} standings."
+        ))
@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.services.activity import flush_activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the last-seen times queued in the cache to DigiUser.last_connected_at. Requests "
+        "flush them too, at most once per ACTIVITY_FLUSH_INTERVAL; run this with --loop so quiet "
+        "periods are flushed as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running until interrupted.")
+
+    def handle(self, *args, **options):
+        while True:
+            written = flush_activity()
+            if written or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Wrote {written} last-seen times."))
+            if not options["loop"]:
+                return
+            time.sleep(settings.ACTIVITY_FLUSH_INTERVAL)
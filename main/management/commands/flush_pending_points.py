@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.services.points import flush_pending_points
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply point awards pending in write-behind mode (POINTS_WRITE_BEHIND). Drains the queue "
+        "and exits; with --loop keeps flushing every POINTS_FLUSH_INTERVAL seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running until interrupted.")
+
+    def handle(self, *args, **options):
+        while True:
+            applied = 0
+            while True:
+                flushed = flush_pending_points()
+                applied += flushed
+                if not flushed:
+                    break
+            if applied or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Applied {applied} queued point awards."))
+            if not options["loop"]:
+                return
+            time.sleep(settings.POINTS_FLUSH_INTERVAL)
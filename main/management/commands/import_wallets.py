@@ -0,0 +1,135 @@
+import csv
+import re
+import time
+import uuid
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, IntegrityError
+from main.models import DigiUser, Profile, ProfileScore
+from main.services import counters
+from main.services.referrals import add_referrals
+
+WALLET_RE = re.compile(r"^0x[0-9a-f]{40}$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-register campaign wallets from a CSV with a 'wallet' column and an optional "
+        "'referral_code' column: the referrer's code, or the referrer's wallet address. Wallets "
+        "imported by this CSV only get their codes during the import, so refer to them by "
+        "wallet, on a row after the referrer's. Users and profiles are bulk-inserted in chunks; "
+        "post_save signals do not fire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Parse and validate without writing.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        self.dry_run = options["dry_run"]
+        self.stats = {"created": 0, "existing": 0, "invalid": 0, "duplicate": 0, "referred": 0}
+        self.seen = set()
+
+        started = time.perf_counter()
+        try:
+            with open(options["csv_path"], newline="") as f:
+                reader = csv.DictReader(f)
+                if not reader.fieldnames or "wallet" not in reader.fieldnames:
+                    raise CommandError("CSV must have a 'wallet' column")
+                chunk = []
+                for row in reader:
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        self.import_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self.import_chunk(chunk)
+        except FileNotFoundError:
+            raise CommandError(f"No such file: {options['csv_path']}")
+
+        elapsed = time.perf_counter() - started
+        rate = self.stats["created"] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {self.stats['created']} wallets ({self.stats['referred']} referred) in {elapsed:.1f}s "
+            f"({rate:,.0f} rows/s). Skipped {self.stats['existing']} existing, "
+            f"{self.stats['duplicate']} duplicate and {self.stats['invalid']} invalid rows."
+        ))
+
+    def import_chunk(self, rows):
+        wallets = {}
+        for row in rows:
+            wallet = DigiUser.objects.normalize_wallet_address(row.get("wallet"))
+            if not WALLET_RE.match(wallet):
+                self.stats["invalid"] += 1
+            elif wallet in self.seen:
+                self.stats["duplicate"] += 1
+            else:
+                self.seen.add(wallet)
+                wallets[wallet] = self.parse_referrer(row.get("referral_code"), wallet)
+
+        self.insert_wallets(wallets)
+
+    @staticmethod
+    def parse_referrer(value, wallet):
+        """A referrer's wallet address (lowercase) or referral code (uppercase); None for none or the row's own wallet."""
+        value = (value or "").strip()
+        referrer = DigiUser.objects.normalize_wallet_address(value)
+        if WALLET_RE.match(referrer):
+            return referrer if referrer != wallet else None
+        return value.upper() or None
+
+    def insert_wallets(self, wallets, retry=True):
+        # Referrer wallets are looked up with the chunk's own: registered ones, earlier chunks included
+        referrer_wallets = {referrer for referrer in wallets.values() if referrer and WALLET_RE.match(referrer)}
+        known = dict(DigiUser.objects.filter(wallet_address__in=[*wallets, *referrer_wallets])
+                     .values_list("wallet_address", "id"))
+        existing = {wallet for wallet in wallets if wallet in known}
+        wallets = {wallet: referrer for wallet, referrer in wallets.items() if wallet not in existing}
+        if not wallets:
+            self.stats["existing"] += len(existing)
+            return
+
+        codes = {referrer for referrer in wallets.values() if referrer and referrer not in referrer_wallets}
+        referrers = {**known, **dict(Profile.objects.filter(referral_code__in=codes).values_list("referral_code", "user_id"))}
+
+        users = [DigiUser(id=uuid.uuid4(), wallet_address=wallet, password=make_password(None)) for wallet in wallets]
+        # A referrer on an earlier row of this chunk is inserted in the same statement as its referees
+        referrers.update((user.wallet_address, user.id) for user in users)
+        profiles = [
+            Profile(user=user, referral_code=referral_code, referred_by_id=referrers.get(wallets[user.wallet_address]))
+            for user, referral_code in zip(users, self.new_referral_codes(len(users)))
+        ]
+
+        if not self.dry_run:
+            try:
+                with transaction.atomic():
+                    DigiUser.objects.bulk_create(users, batch_size=1000)
+                    Profile.objects.bulk_create(profiles, batch_size=1000)
+                    ProfileScore.objects.bulk_create([ProfileScore(profile=profile) for profile in profiles], batch_size=1000)
+                    counters.increment(counters.USERS, len(users))
+                    add_referrals(profile.referred_by_id for profile in profiles)
+            except IntegrityError:
+                if not retry:
+                    raise
+                # A wallet logged in (or a code was taken) mid-chunk; re-check once.
+                self.stats["existing"] += len(existing)
+                return self.insert_wallets(wallets, retry=False)
+
+        self.stats["existing"] += len(existing)
+        self.stats["created"] += len(users)
+        self.stats["referred"] += sum(1 for profile in profiles if profile.referred_by_id)
+
+    def new_referral_codes(self, count):
+        """
+        Generates referral codes for a whole chunk, checking collisions with one query
+        per round instead of one per row. Collisions are astronomically rare, so this
+        almost always takes a single round.
+        """
+        codes = set()
+        while len(codes) < count:
+            candidates = {Profile.generate_referral_code() for _ in range(count - len(codes))} - codes
+            taken = set(Profile.objects.filter(referral_code__in=candidates).values_list("referral_code", flat=True))
+            codes |= candidates - taken
+        return list(codes)
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from main.services.login_nonce import purge_login_nonces
+
+
+class Command(BaseCommand):
+    help = "Bulk-delete legacy LoginNonce rows. Login nonces are now signed and cache-backed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-minutes", type=int, default=5,
+                            help="Only delete nonces older than this (default: 5, the nonce lifetime).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = purge_login_nonces(
+            older_than=timedelta(minutes=options["older_than_minutes"]),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} login nonces."))
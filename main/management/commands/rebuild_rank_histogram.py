@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from main.services.rank import rebuild_histogram
+
+
+class Command(BaseCommand):
+    help = "Recompute the score histogram behind rank lookups. Run periodically (e.g. hourly) to correct drift."
+
+    def handle(self, *args, **options):
+        buckets = rebuild_histogram()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt score histogram ({buckets} buckets)."))
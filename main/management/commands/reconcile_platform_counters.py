@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from main.services.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the platform counters behind /stats from the source tables. Run periodically (e.g. hourly)."
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters()
+        for name, (counted, actual) in drift.items():
+            self.stdout.write(f"{name}: {counted} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled platform counters ({len(drift)} corrected)."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from main.services.referrals import repair_referral_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute Profile.referral_count from referred_by and fix any that drifted."
+
+    def handle(self, *args, **options):
+        repaired = repair_referral_counts()
+        self.stdout.write(self.style.SUCCESS(f"Repaired referral counts on {repaired} profiles."))
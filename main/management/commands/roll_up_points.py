@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.services.rollups import roll_up_points
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll the PointEvent ledger up into the rank histogram, the daily deltas and the active "
+        "season's scores. Awards trigger it too, at most once per POINTS_ROLLUP_INTERVAL; run this "
+        "with --loop so the last awards before a quiet period are rolled up as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running until interrupted.")
+
+    def handle(self, *args, **options):
+        while True:
+            rolled = roll_up_points()
+            if rolled or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Rolled up {rolled} ledger events."))
+            if not options["loop"]:
+                return
+            time.sleep(settings.POINTS_ROLLUP_INTERVAL)
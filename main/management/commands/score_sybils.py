@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Score users for referral farming: star-shaped referral clusters, sibling wallets minting "
+        "passes and completing the same tasks within minutes of each other, and cheapest-tier mints. "
+        "Only users without a score or with a verified mint or completed task since their last score "
+        "(and their referrers and the other referees of both) are scored unless --all is given. Users at or above SYBIL_SCORE_THRESHOLD are left off the leaderboards "
+        "and the airdrop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rescore every user, not just new ones.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="New users scored per batch.")
+
+    def handle(self, *args, **options):
+        try:
+            from main.services.sybil_scoring import score_new_users
+        except ImportError:
+            raise CommandError("score_sybils needs numpy: pip install numpy")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        scored, flagged = score_new_users(rescore_all=options["all"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} users, {flagged} at or above the threshold."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.services.seasons import SeasonError, start_season
+
+
+class Command(BaseCommand):
+    help = "Open a new season. Points awarded from now on also count toward it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Display name of the season.")
+
+    def handle(self, *args, **options):
+        try:
+            season = start_season(options["name"])
+        except SeasonError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Started season {season.id} ({season.name})."))
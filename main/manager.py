@@ -4,10 +4,21 @@ from django.utils.translation import gettext_lazy as _
 
 
 class UserManager(BaseUserManager):
+    @classmethod
+    def normalize_wallet_address(cls, wallet_address):
+        """
+        Canonical storage and lookup form of a wallet: stripped and lowercased.
+        Always compare against the column with an exact match so the unique index is used.
+        """
+        return (wallet_address or "").strip().lower()
+
+    def get_by_natural_key(self, wallet_address):
+        return self.get(wallet_address=self.normalize_wallet_address(wallet_address))
+
     def create_user(self, wallet_address,password=None, **extra_fields):
         if not wallet_address:
             raise ValueError('Wallet address is required')
-        user = self.model(wallet_address=wallet_address.lower(), **extra_fields)
+        user = self.model(wallet_address=self.normalize_wallet_address(wallet_address), **extra_fields)
         if password:
             user.set_password(password)
         else:
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_merge_20260703_1748'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='usertaskcompletion',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='end_date',
+            field=models.DateField(blank=True, help_text='The date this quest expires.', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reset_interval',
+            field=models.CharField(choices=[('one_time', 'One-Time'), ('daily', 'Daily'), ('weekly', 'Weekly')], default='one_time', help_text='How often this task can be repeated.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='start_date',
+            field=models.DateField(blank=True, help_text='The date this quest becomes visible.', null=True),
+        ),
+    ]
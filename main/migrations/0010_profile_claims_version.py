@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_task_schedule_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped when the pass changes; invalidates pass claims in issued tokens.'),
+        ),
+    ]
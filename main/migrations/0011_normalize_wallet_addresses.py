@@ -0,0 +1,48 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:36
+
+from django.db import migrations, models
+import django.db.models.functions.text
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def lowercase_wallet_addresses(apps, schema_editor):
+    """
+    Backfills the canonical lowercase form. Rows that would collide after lowercasing
+    are the same wallet registered twice and have to be merged by hand first.
+    """
+    for model_name in ("DigiUser", "TestnetApplication"):
+        model = apps.get_model("main", model_name)
+        duplicates = list(
+            model.objects.values(wallet=Lower("wallet_address"))
+            .annotate(n=Count("pk"))
+            .filter(n__gt=1)
+            .values_list("wallet", flat=True)[:20]
+        )
+        if duplicates:
+            raise RuntimeError(
+                f"{model_name} has wallet addresses that differ only by case, merge them first: {duplicates}"
+            )
+        model.objects.exclude(wallet_address=Lower("wallet_address")).update(wallet_address=Lower("wallet_address"))
+
+    TestnetApplication = apps.get_model("main", "TestnetApplication")
+    TestnetApplication.objects.exclude(email=Lower("email")).update(email=Lower("email"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_profile_claims_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_wallet_addresses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='digiuser',
+            constraint=models.CheckConstraint(check=models.Q(('wallet_address', django.db.models.functions.text.Lower('wallet_address'))), name='digiuser_wallet_address_lowercase'),
+        ),
+        migrations.AddConstraint(
+            model_name='testnetapplication',
+            constraint=models.CheckConstraint(check=models.Q(('wallet_address', django.db.models.functions.text.Lower('wallet_address'))), name='testnetapp_wallet_address_lowercase'),
+        ),
+    ]
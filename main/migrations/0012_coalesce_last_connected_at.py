@@ -0,0 +1,19 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_normalize_wallet_addresses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='digiuser',
+            name='last_connected_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
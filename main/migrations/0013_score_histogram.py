@@ -0,0 +1,40 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F
+
+
+def build_histogram(apps, schema_editor):
+    Profile = apps.get_model("main", "Profile")
+    ScoreBucket = apps.get_model("main", "ScoreBucket")
+    width = settings.RANK_BUCKET_WIDTH
+    floor = ExpressionWrapper(F("scored_point") / width * width, output_field=BigIntegerField())
+    counts = (
+        Profile.objects.filter(scored_point__gte=width)
+        .annotate(floor=floor)
+        .values("floor")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    ScoreBucket.objects.bulk_create(
+        [ScoreBucket(floor=row["floor"], profile_count=row["n"]) for row in counts], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_coalesce_last_connected_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('floor', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('profile_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:43
+
+from datetime import datetime, time, timedelta
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def seed_counters(apps, schema_editor):
+    DigiUser = apps.get_model("main", "DigiUser")
+    Profile = apps.get_model("main", "Profile")
+    PassTransaction = apps.get_model("main", "PassTransaction")
+    PlatformCounter = apps.get_model("main", "PlatformCounter")
+    today = timezone.now().date()
+    day_start = timezone.make_aware(datetime.combine(today, time.min))
+    values = {
+        "users": DigiUser.objects.count(),
+        "passes": Profile.objects.filter(has_pass=True).count(),
+        "points": Profile.objects.aggregate(total=Sum("scored_point"))["total"] or 0,
+        f"minted:{today.isoformat()}": PassTransaction.objects.filter(
+            minted=True, created_at__gte=day_start, created_at__lt=day_start + timedelta(days=1)
+        ).count(),
+    }
+    PlatformCounter.objects.bulk_create(
+        [PlatformCounter(name=name, shard=0, value=value) for name, value in values.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_score_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('name', 'shard')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_platform_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('current_pass__isnull', False), ('has_pass', True)), fields=['-scored_point', 'user'], name='profile_leaderboard_idx'),
+        ),
+    ]
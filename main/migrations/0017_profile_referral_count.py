@@ -0,0 +1,39 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_referral_counts(apps, schema_editor):
+    Profile = apps.get_model("main", "Profile")
+    referrals = (
+        Profile.objects.filter(referred_by=OuterRef("user_id"))
+        .values("referred_by")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    referrer_ids = Profile.objects.filter(referred_by__isnull=False).values("referred_by")
+    Profile.objects.filter(user_id__in=referrer_ids).update(
+        referral_count=Coalesce(Subquery(referrals), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_daily_point_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='referral_count',
+            field=models.PositiveIntegerField(default=0, help_text='Profiles referred by this user; maintained on signup, repaired by repair_referral_counts.'),
+        ),
+        migrations.RunPython(backfill_referral_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('referral_count__gt', 0)), fields=['-referral_count', 'user'], name='profile_top_referrers_idx'),
+        ),
+    ]
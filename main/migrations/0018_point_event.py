@@ -0,0 +1,46 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def record_opening_balances(apps, schema_editor):
+    # Balances earned before the ledger existed become one opening event per profile,
+    # so the ledger sums to scored_point for every user from the start.
+    Profile = apps.get_model("main", "Profile")
+    PointEvent = apps.get_model("main", "PointEvent")
+    balances = Profile.objects.filter(scored_point__gt=0).values_list("user_id", "scored_point")
+    batch = []
+    for user_id, balance in balances.iterator(chunk_size=5000):
+        batch.append(PointEvent(user_id=user_id, amount=balance, balance_after=balance, reason="opening_balance"))
+        if len(batch) >= 5000:
+            PointEvent.objects.bulk_create(batch)
+            batch = []
+    PointEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_profile_referral_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('amount', models.BigIntegerField()),
+                ('balance_after', models.PositiveBigIntegerField()),
+                ('reason', models.CharField(choices=[('opening_balance', 'Opening balance'), ('daily_login', 'Daily login'), ('task', 'Task completed'), ('referral', 'Referred a user'), ('referral_bonus', 'Joined with a referral'), ('pass_adjustment', 'Login points for a pass upgrade')], max_length=20)),
+                ('reference', models.CharField(blank=True, default='', help_text='Task id or tx hash behind the award', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='main_pointe_user_id_359522_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
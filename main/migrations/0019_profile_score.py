@@ -0,0 +1,55 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# One set-based statement each way: the copy runs inside the database, not row by row
+# through Python, and the board index is only built once the table is filled.
+COPY_SCORES = """
+    INSERT INTO main_profilescore (user_id, scored_point, last_login_date)
+    SELECT user_id, scored_point, last_login_date FROM main_profile
+"""
+RESTORE_SCORES = """
+    UPDATE main_profile SET
+        scored_point = COALESCE((SELECT s.scored_point FROM main_profilescore s WHERE s.user_id = main_profile.user_id), 0),
+        last_login_date = (SELECT s.last_login_date FROM main_profilescore s WHERE s.user_id = main_profile.user_id)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_point_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileScore',
+            fields=[
+                ('profile', models.OneToOneField(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='main.profile', to_field='user')),
+                ('scored_point', models.PositiveBigIntegerField(default=0)),
+                ('last_login_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunSQL(COPY_SCORES, RESTORE_SCORES),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='main_profil_scored__5196ab_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_leaderboard_idx',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='last_login_date',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='scored_point',
+        ),
+        migrations.AddIndex(
+            model_name='profilescore',
+            index=models.Index(fields=['-scored_point', 'profile'], name='profilescore_board_idx'),
+        ),
+    ]
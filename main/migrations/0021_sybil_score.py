@@ -0,0 +1,30 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_seasons'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SybilScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sybil_score', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('score', models.FloatField()),
+                ('star_size', models.PositiveIntegerField(help_text="Profiles referred by this user's referrer, this one included.")),
+                ('mint_burst', models.PositiveIntegerField(help_text="Siblings whose first pass was minted within the burst window of this user's.")),
+                ('task_burst', models.FloatField(help_text="Share of this user's completed tasks a sibling also completed within the burst window.")),
+                ('cheapest_pass', models.BooleanField(help_text='The first pass minted was the cheapest tier.')),
+                ('scored_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['score'], name='sybilscore_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_sybil_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sybilscore',
+            name='star_size',
+            field=models.PositiveIntegerField(help_text="Profiles referred by this user's referrer (this one included) or by this user, whichever is more."),
+        ),
+    ]
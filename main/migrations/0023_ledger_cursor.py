@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+def start_after_existing_events(apps, schema_editor):
+    # Events written so far were rolled up as they were awarded
+    PointEvent = apps.get_model("main", "PointEvent")
+    LedgerCursor = apps.get_model("main", "LedgerCursor")
+    last = PointEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    LedgerCursor.objects.create(name="point_rollups", last_event_id=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_sybil_hub_star_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_event_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(start_after_existing_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_ledger_cursor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('current_pass__isnull', False), ('has_pass', True)), fields=['user'], name='profile_pass_holder_idx'),
+        ),
+    ]
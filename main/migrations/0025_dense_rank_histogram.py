@@ -0,0 +1,54 @@
+# Generated by Django 4.2.20 on 2026-10-18 13:08
+
+from collections import Counter
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_histogram(apps, schema_editor):
+    ProfileScore = apps.get_model("main", "ProfileScore")
+    ScoreBucket = apps.get_model("main", "ScoreBucket")
+    ScoreLevel = apps.get_model("main", "ScoreLevel")
+    width = settings.RANK_BUCKET_WIDTH
+    counts = (
+        ProfileScore.objects.filter(scored_point__gte=width)
+        .values("scored_point")
+        .annotate(n=Count("profile"))
+        .order_by()
+        .values_list("scored_point", "n")
+    )
+    levels = [ScoreLevel(score=score, profile_count=n) for score, n in counts]
+    ScoreLevel.objects.bulk_create(levels, batch_size=1000)
+    buckets = Counter(level.score // width * width for level in levels)
+    ScoreBucket.objects.all().delete()
+    ScoreBucket.objects.bulk_create(
+        [ScoreBucket(floor=floor, score_count=n) for floor, n in buckets.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_profile_pass_holder_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreLevel',
+            fields=[
+                ('score', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('profile_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='scorebucket',
+            name='profile_count',
+        ),
+        migrations.AddField(
+            model_name='scorebucket',
+            name='score_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(build_histogram, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils import timezone
 from datetime import timedelta
 from django.utils.translation import gettext_lazy as _
@@ -11,8 +13,8 @@ from django.contrib.auth.models import AbstractBaseUser
 
 class DigiUser(AbstractBaseUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    wallet_address = models.CharField(max_length=42, unique=True)  # e.g., 0xabc...123
-    last_connected_at = models.DateTimeField(auto_now=True)
+    wallet_address = models.CharField(max_length=42, unique=True)  # lowercase, e.g., 0xabc...123
+    last_connected_at = models.DateTimeField(default=timezone.now)  # flushed in bulk by services.activity
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
@@ -28,6 +30,9 @@ class DigiUser(AbstractBaseUser):
     class Meta:
         verbose_name = _("User")
         verbose_name_plural=_("Users")
+        constraints = [
+            models.CheckConstraint(check=models.Q(wallet_address=Lower("wallet_address")), name="digiuser_wallet_address_lowercase"),
+        ]
 
     def has_perm(self, perm, obj=None):
         return True
@@ -63,29 +68,225 @@ class DigiPass(models.Model):
     def __str__(self):
         return self.name
 
+class ProfileQuerySet(models.QuerySet):
+    def with_score(self):
+        """Annotates scored_point and last_login_date from the profile's ProfileScore row."""
+        return self.annotate(scored_point=F("score__scored_point"), last_login_date=F("score__last_login_date"))
+
+
 class Profile(models.Model):
     user = models.OneToOneField(DigiUser, related_name="profile", on_delete=models.CASCADE)
     names = models.CharField(max_length=100, null=True, blank=True)
     email = models.EmailField(max_length=200, null=True, blank=True)
     avatar_url = models.CharField(max_length=200, null=True, blank=True)
-    scored_point = models.PositiveBigIntegerField(default=0, db_index=True)
-    last_login_date = models.DateField(null=True, blank=True)
     has_pass = models.BooleanField(default=False)
     current_pass = models.ForeignKey(DigiPass, null=True, blank=True, on_delete=models.SET_NULL)
     referral_code = models.CharField(max_length=10, unique=True, editable=False)
     referred_by = models.ForeignKey(DigiUser, on_delete=models.CASCADE, related_name="referred_users", blank=True, null=True)
+    claims_version = models.PositiveIntegerField(default=0, help_text="Bumped when the pass changes; invalidates pass claims in issued tokens.")
+    referral_count = models.PositiveIntegerField(default=0, help_text="Profiles referred by this user; maintained on signup, repaired by repair_referral_counts.")
+
+    objects = ProfileQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.referral_code:
-            self.referral_code = uuid.uuid4().hex[:10].upper()  # Unique 10-char code
+            self.referral_code = self.generate_referral_code()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def generate_referral_code():
+        return uuid.uuid4().hex[:10].upper()  # Unique 10-char code
+
     def __str__(self):
         return f"{self.user.wallet_address}-profile"
     
     class Meta:
-        indexes = [models.Index(fields=['-scored_point'])]
-    
+        indexes = [
+            # The board's filter, probed per row while profilescore_board_idx supplies the order
+            models.Index(
+                fields=['user'],
+                condition=models.Q(has_pass=True, current_pass__isnull=False),
+                name='profile_pass_holder_idx',
+            ),
+            models.Index(
+                fields=['-referral_count', 'user'],
+                condition=models.Q(referral_count__gt=0),
+                name='profile_top_referrers_idx',
+            ),
+        ]
+
+
+class ProfileScore(models.Model):
+    """
+    The counters every point award rewrites, split out of the wide Profile row so an
+    award only touches this narrow row and its one index. Keyed by the user id
+    (profile_id holds Profile.user_id); every Profile has exactly one.
+    """
+    profile = models.OneToOneField(
+        Profile, to_field="user", primary_key=True, related_name="score", db_column="user_id", on_delete=models.CASCADE,
+    )
+    scored_point = models.PositiveBigIntegerField(default=0)
+    last_login_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Board order: the leaderboard, rank counts and Max(scored_point) are range reads
+            models.Index(fields=['-scored_point', 'profile'], name='profilescore_board_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id}: {self.scored_point}"
+
+
+class ScoreBucket(models.Model):
+    """
+    Histogram of the distinct ProfileScore.scored_point values in RANK_BUCKET_WIDTH-wide
+    buckets, used to answer dense rank queries without counting every score above a
+    score. Bucket 0 is not tracked: it is never above anyone.
+    """
+    floor = models.PositiveBigIntegerField(primary_key=True)
+    score_count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.floor}+: {self.score_count}"
+
+
+class ScoreLevel(models.Model):
+    """
+    Number of profiles holding each tracked score, so a bucket's score_count changes only
+    when a score gains its first profile or loses its last. Empty levels are deleted.
+    """
+    score = models.PositiveBigIntegerField(primary_key=True)
+    profile_count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.score}: {self.profile_count}"
+
+
+class PlatformCounter(models.Model):
+    """
+    One shard of a platform-wide counter (users, passes, points, minted:<date>).
+    A counter's value is the sum of its shards; writers pick a random shard so
+    concurrent increments rarely wait on the same row.
+    """
+    name = models.CharField(max_length=32)
+    shard = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("name", "shard")
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}]: {self.value}"
+
+
+class DailyPointDelta(models.Model):
+    """Points a user earned on one (UTC) day, so period leaderboards never scan history."""
+    user = models.ForeignKey('DigiUser', related_name="daily_point_deltas", on_delete=models.CASCADE)
+    day = models.DateField()
+    points = models.BigIntegerField(default=0)
+
+    class Meta:
+        # Day-leading, so a period board is a range read over just that period's rows
+        unique_together = ("day", "user")
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.points}"
+
+
+class PointEvent(models.Model):
+    """
+    Append-only ledger of point awards: one row per change to ProfileScore.scored_point,
+    written in the same transaction as the balance UPDATE. Never updated or deleted.
+    """
+    class Reason(models.TextChoices):
+        OPENING_BALANCE = 'opening_balance', 'Opening balance'
+        DAILY_LOGIN = 'daily_login', 'Daily login'
+        TASK = 'task', 'Task completed'
+        REFERRAL = 'referral', 'Referred a user'
+        REFERRAL_BONUS = 'referral_bonus', 'Joined with a referral'
+        PASS_ADJUSTMENT = 'pass_adjustment', 'Login points for a pass upgrade'
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey('DigiUser', related_name="point_events", on_delete=models.CASCADE)
+    amount = models.BigIntegerField()
+    balance_after = models.PositiveBigIntegerField()
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+    reference = models.CharField(max_length=100, blank=True, default="", help_text="Task id or tx hash behind the award")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'id'])]
+
+    def __str__(self):
+        return f"{self.user_id} {self.amount:+} ({self.reason})"
+
+
+class LedgerCursor(models.Model):
+    """
+    Stores the last PointEvent a ledger consumer has processed, such as the rollups of
+    main.services.rollups.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_event_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ event {self.last_event_id}"
+
+
+class Season(models.Model):
+    """A campaign period. Points earned while a season is active also count toward it."""
+    class Status(models.TextChoices):
+        ACTIVE = 'active', 'Active'
+        CLOSED = 'closed', 'Closed'
+
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.ACTIVE)
+    starts_at = models.DateTimeField(default=timezone.now)
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='active'), name='season_single_active'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class SeasonScore(models.Model):
+    """
+    Points a user earned in the active season. Rows are keyed season-first, so the
+    active season is one contiguous index range however many seasons came before;
+    close_season moves a season's rows into SeasonStanding and deletes them here.
+    """
+    season = models.ForeignKey(Season, related_name="scores", on_delete=models.CASCADE)
+    user = models.ForeignKey('DigiUser', related_name="season_scores", on_delete=models.CASCADE)
+    points = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("season", "user")
+        indexes = [models.Index(fields=['season', '-points', 'user'], name='seasonscore_board_idx')]
+
+    def __str__(self):
+        return f"{self.season_id} {self.user_id}: {self.points}"
+
+
+class SeasonStanding(models.Model):
+    """Frozen final standing of a pass holder in a closed season. Written once, never updated."""
+    season = models.ForeignKey(Season, related_name="standings", on_delete=models.CASCADE)
+    user = models.ForeignKey('DigiUser', related_name="season_standings", on_delete=models.CASCADE)
+    points = models.BigIntegerField()
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("season", "user")
+        indexes = [models.Index(fields=['season', 'rank'], name='seasonstanding_rank_idx')]
+
+    def __str__(self):
+        return f"{self.season_id} #{self.rank} {self.user_id}: {self.points}"
+
 
 # models.py
 class PassTransaction(models.Model):
@@ -159,6 +360,29 @@ class UserTaskCompletion(models.Model):
         return f"{self.user} completed {self.task}"
     
 
+
+class SybilScore(models.Model):
+    """
+    Referral-farming likelihood of a user in [0, 1], with the features it was computed
+    from; written by score_sybils. Users at or above SYBIL_SCORE_THRESHOLD are left off
+    the leaderboards and the airdrop.
+    """
+    user = models.OneToOneField(DigiUser, primary_key=True, related_name="sybil_score", on_delete=models.CASCADE)
+    score = models.FloatField()
+    star_size = models.PositiveIntegerField(
+        help_text="Profiles referred by this user's referrer (this one included) or by this user, whichever is more."
+    )
+    mint_burst = models.PositiveIntegerField(help_text="Siblings whose first pass was minted within the burst window of this user's.")
+    task_burst = models.FloatField(help_text="Share of this user's completed tasks a sibling also completed within the burst window.")
+    cheapest_pass = models.BooleanField(help_text="The first pass minted was the cheapest tier.")
+    scored_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['score'], name='sybilscore_score_idx')]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.score:.2f}"
+
 class BlockchainListenerState(models.Model):
     """
     Stores the last processed block for a given listener.
@@ -182,6 +406,11 @@ class TestnetApplication(models.Model):
     faucet_tx_hash = models.CharField(max_length=66, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(wallet_address=Lower("wallet_address")), name="testnetapp_wallet_address_lowercase"),
+        ]
+
     def __str__(self):
         return f"TestnetApp - {self.email} - {self.wallet_address}"
 
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from .authentication import get_pass_claims
 
 
 
@@ -8,6 +9,11 @@ class HasPassPermission(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
+        # Trust the token's has_pass claim while its claims_version is current
+        claims = get_pass_claims(request)
+        if claims is not None:
+            return claims["has_pass"]
+
         user = request.user
 
         # Check if user is authenticated and has a profile with has_pass=True
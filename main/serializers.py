@@ -7,6 +7,14 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model=Profile
         fields = ["id", "names", "email", "avatar_url"]
+
+    def update(self, instance, validated_data):
+        # Write only the edited columns; a full save() would put back the scored_point
+        # read at the start of the request over any award made since.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
         
 class TaskSerializer(serializers.ModelSerializer):
     user_status = serializers.SerializerMethodField()
@@ -18,7 +26,7 @@ class TaskSerializer(serializers.ModelSerializer):
     def get_user_status(self, task):
         user = self.context["request"].user
         try:
-            user_task = UserTaskCompletion.objects.get(user=user, task=task)
+            user_task = UserTaskCompletion.objects.get(user_id=user.pk, task=task)
             return user_task.status
         except UserTaskCompletion.DoesNotExist:
             return UserTaskCompletion.Status.PENDING
@@ -26,7 +34,7 @@ class TaskSerializer(serializers.ModelSerializer):
     def get_started_at(self, task):
         user = self.context["request"].user
         try:
-            user_task = UserTaskCompletion.objects.get(user=user, task=task)
+            user_task = UserTaskCompletion.objects.get(user_id=user.pk, task=task)
             return user_task.started_at.isoformat() if user_task.started_at else None
         except UserTaskCompletion.DoesNotExist:
             return None
@@ -100,6 +108,7 @@ class PassPaymentSerializer(serializers.ModelSerializer):
 
 class LeaderboardSerializer(serializers.ModelSerializer):
     wallet = serializers.CharField(source='user.wallet_address')  # Use wallet as display name
+    scored_point = serializers.IntegerField(read_only=True)  # from Profile.objects.with_score()
     rank = serializers.SerializerMethodField()  # Custom rank
 
     class Meta:
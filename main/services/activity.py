@@ -0,0 +1,101 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from main.models import DigiUser
+from main.services import locks
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = "activity:last_seen:{}"
+SEQ_KEY = "activity:pending:seq"
+ENTRY_KEY = "activity:pending:entry:{}"
+FLUSHED_SEQ_KEY = "activity:pending:flushed"
+FLUSHED_AT_KEY = "activity:pending:flushed_at"
+FLUSH_LOCK_KEY = "activity:pending:flush_lock"
+FLUSH_LOCK_TTL = 60
+FLUSH_BATCH_SIZE = 500
+
+
+def record_activity(user_id):
+    """
+    Notes that a user was just seen. The last-seen time goes to the cache at most once
+    per ACTIVITY_RESOLUTION seconds per user (cache.add is atomic, so only one worker
+    wins per window) and is queued in the cache for the next bulk flush to
+    DigiUser.last_connected_at, whichever worker runs it.
+    """
+    now = timezone.now()
+    if not cache.add(LAST_SEEN_KEY.format(user_id), now, timeout=settings.ACTIVITY_RESOLUTION):
+        return
+
+    # add, not set: a sequence restarted after eviction never overwrites a queued entry
+    while not cache.add(ENTRY_KEY.format(_next_seq()), (user_id, now), timeout=None):
+        pass
+    cache.add(FLUSHED_AT_KEY, time.time(), timeout=None)
+    if time.time() - cache.get(FLUSHED_AT_KEY, 0) >= settings.ACTIVITY_FLUSH_INTERVAL:
+        flush_activity()
+
+
+def _next_seq():
+    start = cache.get(FLUSHED_SEQ_KEY, 0)
+    cache.add(SEQ_KEY, start, timeout=None)
+    try:
+        return cache.incr(SEQ_KEY)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(SEQ_KEY, start + 1, timeout=None)
+        return start + 1
+
+
+def get_last_seen(user_id):
+    """Last-seen time from the cache, or None if the user was not seen recently."""
+    return cache.get(LAST_SEEN_KEY.format(user_id))
+
+
+def flush_activity():
+    """
+    Writes the queued last-seen times with one UPDATE ... CASE per batch of users.
+    Only one flush runs at a time. Returns the number of users written.
+    """
+    token = locks.acquire(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    if token is None:
+        return 0
+    try:
+        cache.set(FLUSHED_AT_KEY, time.time(), timeout=None)
+        written = 0
+        while True:
+            flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+            seq = cache.get(SEQ_KEY, flushed)
+            if seq <= flushed:
+                return written
+            upto = min(seq, flushed + FLUSH_BATCH_SIZE)
+            keys = [ENTRY_KEY.format(i) for i in range(flushed + 1, upto + 1)]
+            # An entry that is numbered but not written yet is skipped: presence is
+            # best-effort, and the user's next window records them again
+            pending = {}
+            for user_id, seen_at in cache.get_many(keys).values():
+                pending[user_id] = max(seen_at, pending.get(user_id, seen_at))
+            written += _write(pending)
+            cache.set(FLUSHED_SEQ_KEY, upto, timeout=None)
+            cache.delete_many(keys)
+    finally:
+        locks.release(FLUSH_LOCK_KEY, token)
+
+
+def _write(pending):
+    if not pending:
+        return 0
+    try:
+        DigiUser.objects.filter(pk__in=pending).update(
+            last_connected_at=Case(
+                *[When(pk=user_id, then=Value(seen_at)) for user_id, seen_at in pending.items()],
+                output_field=DateTimeField(),
+            )
+        )
+    except Exception as exc:
+        # Presence data is best-effort; never fail the request that triggered the flush
+        logger.warning(f"[Activity] Failed to flush {len(pending)} last-seen times: {exc}")
+        return 0
+    return len(pending)
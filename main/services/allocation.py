@@ -0,0 +1,222 @@
+import csv
+from dataclasses import dataclass
+import numpy as np
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from main.models import Profile, UserTaskCompletion
+from main.services.sybil import without_flagged
+
+READ_CHUNK_SIZE = 20000
+WRITE_CHUNK_SIZE = 50000
+WEIGHTINGS = ("linear", "sqrt", "log")
+
+
+@dataclass
+class AllocationParams:
+    """
+    total: tokens to distribute; precision: decimal places the amounts are
+    computed at (total * 10**precision must stay below 2**53, so float64 shares
+    are exact to the unit); decimals: the token's decimals, at least precision, used
+    to write amounts in its smallest unit.
+    Points are scored_point + referral_points * referrals + task_points * completed
+    tasks, zeroed below min_points and capped at cap. weighting turns points into a
+    weight, which is scaled by the tier multiplier of the points (tiers: ascending
+    (threshold, multiplier) pairs) and, with pass_multiplier, by the pass's point_power.
+    max_share caps any one wallet's share of the total; the excess goes to the rest.
+    """
+    total: int
+    precision: int = 6
+    decimals: int = 18
+    referral_points: float = 0
+    task_points: float = 0
+    min_points: float = 0
+    cap: float = None
+    weighting: str = "linear"
+    tiers: tuple = ()
+    pass_multiplier: bool = True
+    max_share: float = None
+
+
+@dataclass
+class Columns:
+    wallets: np.ndarray
+    points: np.ndarray
+    point_power: np.ndarray
+    referrals: np.ndarray
+    tasks: np.ndarray
+
+    def __len__(self):
+        return len(self.wallets)
+
+
+def allocation_queryset(include_flagged=False):
+    """
+    One row per pass holder (the leaderboard's filter, read through
+    profile_pass_holder_idx): wallet, points, pass point_power, referrals, completed
+    tasks. Profiles without a pass get nothing and are not read. Users flagged as
+    sybils are left out unless include_flagged.
+    """
+    completed = (
+        UserTaskCompletion.objects.filter(user_id=OuterRef("user_id"), status=UserTaskCompletion.Status.COMPLETED)
+        .order_by().values("user_id").annotate(count=Count("id")).values("count")
+    )
+    profiles = Profile.objects.filter(has_pass=True, current_pass__isnull=False)
+    if not include_flagged:
+        profiles = without_flagged(profiles)
+    return profiles.values_list(
+        "user__wallet_address",
+        Coalesce("score__scored_point", Value(0)),
+        "current_pass__point_power",
+        "referral_count",
+        Coalesce(Subquery(completed, output_field=IntegerField()), Value(0)),
+    ).order_by()
+
+
+def load_columns(queryset=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Streams the rows through a server-side cursor (iterator) and packs each chunk
+    into arrays, so memory holds the columns rather than a million row tuples.
+    """
+    rows = (queryset if queryset is not None else allocation_queryset()).iterator(chunk_size=chunk_size)
+    parts, chunk = [], []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            parts.append(_pack(chunk))
+            chunk = []
+    if chunk or not parts:
+        parts.append(_pack(chunk))
+    return Columns(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def _pack(rows):
+    wallets, points, point_power, referrals, tasks = zip(*rows) if rows else ((),) * 5
+    return (
+        np.array(wallets, dtype="U42"),
+        np.array(points, dtype=np.int64),
+        np.array(point_power, dtype=np.int64),
+        np.array(referrals, dtype=np.int64),
+        np.array(tasks, dtype=np.int64),
+    )
+
+
+def synthetic_columns(count, seed=0):
+    """`count` random pass holders with a long-tailed points distribution, for benchmarking."""
+    rng = np.random.default_rng(seed)
+    addresses = np.frombuffer(rng.bytes(20 * count).hex().encode(), dtype="S40").astype("U40")
+    return Columns(
+        wallets=np.char.add("0x", addresses),
+        points=rng.lognormal(mean=7, sigma=1.5, size=count).astype(np.int64),
+        point_power=rng.choice([2, 3, 5], size=count, p=[0.5, 0.33, 0.17]),
+        referrals=rng.poisson(0.8, size=count),
+        tasks=rng.poisson(4, size=count),
+    )
+
+
+def compute_points(columns, params):
+    points = (
+        columns.points
+        + params.referral_points * columns.referrals
+        + params.task_points * columns.tasks
+    ).astype(np.float64)
+    points[points < max(params.min_points, 0)] = 0
+    if params.cap is not None:
+        np.minimum(points, params.cap, out=points)
+    return points
+
+
+def compute_weights(columns, params):
+    points = compute_points(columns, params)
+    if params.weighting == "sqrt":
+        weights = np.sqrt(points)
+    elif params.weighting == "log":
+        weights = np.log1p(points)
+    elif params.weighting == "linear":
+        weights = points.copy()
+    else:
+        raise ValueError(f"Unknown weighting: {params.weighting}")
+
+    if params.tiers:
+        thresholds = np.array([threshold for threshold, _ in params.tiers], dtype=np.float64)
+        multipliers = np.array([1.0] + [multiplier for _, multiplier in params.tiers])
+        weights *= multipliers[np.searchsorted(thresholds, points, side="right")]
+    if params.pass_multiplier:
+        weights *= np.where(columns.point_power > 0, columns.point_power, 1)
+    weights[points == 0] = 0
+    return weights
+
+
+def _capped_shares(weights, max_share):
+    """Shares proportional to weights, with no share above max_share; the excess is spread over the rest."""
+    shares = weights / weights.sum()
+    if max_share is None:
+        return shares
+    capped = np.zeros(len(shares), dtype=bool)
+    while True:
+        over = ~capped & (shares > max_share)
+        if not over.any():
+            return shares
+        capped |= over
+        free = weights * ~capped
+        if not free.sum():
+            return np.where(capped, max_share, 0.0)
+        shares = np.where(capped, max_share, free / free.sum() * (1 - max_share * capped.sum()))
+
+
+def allocate(columns, params):
+    """
+    Token amounts in units of 10**-precision tokens, as an int64 array aligned with
+    columns. Floors every share, then hands the units lost to rounding to the largest
+    remainders, so the amounts sum to exactly total (or all of it a max_share allows).
+    """
+    units = params.total * 10 ** params.precision
+    if units > 2 ** 53:
+        raise ValueError("total * 10**precision must not exceed 2**53; lower the precision")
+    if params.precision > params.decimals:
+        raise ValueError("precision cannot exceed the token's decimals")
+    weights = compute_weights(columns, params)
+    if not len(weights) or not weights.any():
+        return np.zeros(len(weights), dtype=np.int64)
+
+    exact = _capped_shares(weights, params.max_share) * units
+    amounts = np.floor(exact).astype(np.int64)
+    target = units if params.max_share is None else min(units, int(np.floor(exact.sum() + 0.5)))
+    missing = int(target - amounts.sum())
+    if missing > 0:
+        remainders = exact - amounts
+        if params.max_share is not None:
+            remainders[amounts + 1 > params.max_share * units] = -1
+            missing = min(missing, int((remainders >= 0).sum()))
+    if missing > 0:
+        amounts[np.argpartition(-remainders, missing - 1)[:missing]] += 1
+    return amounts
+
+
+def write_csv(path, columns, amounts, params):
+    """
+    Merkle-ready rows (address, amount in the token's smallest unit), one per wallet
+    with a non-zero amount, written a chunk at a time.
+    """
+    scale = "0" * (params.decimals - params.precision)
+    keep = np.flatnonzero(amounts)
+    with open(path, "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(["address", "amount"])
+        for start in range(0, len(keep), WRITE_CHUNK_SIZE):
+            index = keep[start:start + WRITE_CHUNK_SIZE]
+            values = [f"{value}{scale}" for value in amounts[index].tolist()]
+            writer.writerows(zip(columns.wallets[index].tolist(), values))
+    return len(keep)
+
+
+def write_npz(path, columns, amounts, params):
+    """The same rows as write_csv as NumPy arrays; amounts stay in units of 10**-precision tokens."""
+    keep = np.flatnonzero(amounts)
+    np.savez(
+        path,
+        address=columns.wallets[keep].astype("S42"),
+        amount=amounts[keep].astype(np.uint64),
+        precision=params.precision,
+        decimals=params.decimals,
+    )
+    return len(keep)
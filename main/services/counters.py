@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from main.models import DigiUser, PassTransaction, PlatformCounter, Profile, ProfileScore
+import logging
+
+logger = logging.getLogger(__name__)
+
+USERS = "users"
+PASSES = "passes"
+POINTS = "points"
+
+
+def minted_counter(day):
+    return f"minted:{day.isoformat()}"
+
+
+def increment(name, amount=1):
+    """
+    Adds `amount` to a random shard of a counter, inside the caller's transaction so a
+    rollback undoes it. Usually a single UPDATE; the first write to a shard creates it.
+    """
+    if not amount:
+        return
+    shard = random.randrange(settings.PLATFORM_COUNTER_SHARDS)
+    counter = PlatformCounter.objects.filter(name=name, shard=shard)
+    if not counter.update(value=F("value") + amount):
+        _, created = PlatformCounter.objects.get_or_create(name=name, shard=shard, defaults={"value": amount})
+        if not created:
+            counter.update(value=F("value") + amount)
+
+
+def record_mint(created_at):
+    """Counts a PassTransaction that became minted, on the day it was created."""
+    increment(minted_counter(created_at.date()))
+
+
+def read_counters(*names):
+    """Returns {name: value} for the given counters with one query; missing counters are 0."""
+    totals = dict(
+        PlatformCounter.objects.filter(name__in=names)
+        .values("name")
+        .annotate(total=Sum("value"))
+        .values_list("name", "total")
+    )
+    return {name: totals.get(name) or 0 for name in names}
+
+
+def actual_counts(day):
+    """The four aggregates the counters replace, for reconciliation."""
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    return {
+        USERS: DigiUser.objects.count(),
+        PASSES: Profile.objects.filter(has_pass=True).count(),
+        POINTS: ProfileScore.objects.aggregate(total=Sum("scored_point"))["total"] or 0,
+        minted_counter(day): PassTransaction.objects.filter(
+            minted=True, created_at__gte=day_start, created_at__lt=day_start + timedelta(days=1)
+        ).count(),
+    }
+
+
+def reconcile_counters(day=None):
+    """
+    Recomputes the counters from the source tables and collapses each into shard 0.
+    Daily mint counters older than yesterday are dropped.
+    Returns {name: (counted, actual)} for the counters that had drifted.
+    """
+    day = day or timezone.now().date()
+    with transaction.atomic():
+        PlatformCounter.objects.filter(
+            name__startswith="minted:", name__lt=minted_counter(day - timedelta(days=1))
+        ).delete()
+        actual = actual_counts(day)
+        counted = read_counters(*actual)
+        PlatformCounter.objects.filter(name__in=actual).delete()
+        PlatformCounter.objects.bulk_create(
+            [PlatformCounter(name=name, shard=0, value=value) for name, value in actual.items()]
+        )
+    drift = {name: (counted[name], value) for name, value in actual.items() if counted[name] != value}
+    if drift:
+        logger.warning(f"[Counters] Corrected drift: {drift}")
+    return drift
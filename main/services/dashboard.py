@@ -0,0 +1,54 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DASHBOARD_MAX_WORKERS, thread_name_prefix="dashboard"
+                )
+    return _executor
+
+
+def _run_in_worker(build):
+    # Pool threads live outside the request cycle, so apply CONN_MAX_AGE ourselves
+    close_old_connections()
+    try:
+        return build()
+    finally:
+        close_old_connections()
+
+
+def build_sections(builders):
+    """
+    Calls each builder in {name: builder} and returns (results, errors), both keyed by
+    name. With DASHBOARD_MAX_WORKERS > 0 all but one builder run on the shared thread
+    pool while the last runs on the calling thread. A failing builder is logged and
+    reported in errors; it never fails the others.
+    """
+    results, errors = {}, {}
+    names = list(builders)
+
+    futures = {}
+    if settings.DASHBOARD_MAX_WORKERS > 0:
+        futures = {name: _get_executor().submit(_run_in_worker, builders[name]) for name in names[:-1]}
+
+    # Inline builders first, so the calling thread works while the pool does
+    for name in sorted(names, key=lambda name: name in futures):
+        try:
+            results[name] = futures[name].result() if name in futures else builders[name]()
+        except Exception as exc:
+            logger.warning(f"[Dashboard] Section {name} failed: {exc}")
+            errors[name] = "Section unavailable"
+    return results, errors
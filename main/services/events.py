@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+SEQ_KEY = "live:seq"
+EVENT_KEY = "live:event:{}"
+
+
+def publish(event):
+    """
+    Appends an event to the shared log in the cache: one incr for the sequence number
+    and one set for the event. Every process's live broadcaster picks it up on its
+    next poll (see main.services.live).
+    """
+    cache.add(SEQ_KEY, 0, timeout=None)
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        # Evicted between add and incr; readers treat a reset sequence as a gap
+        cache.set(SEQ_KEY, 1, timeout=None)
+        seq = 1
+    cache.set(EVENT_KEY.format(seq), event, timeout=settings.LIVE_EVENT_TTL)
+
+
+def publish_on_commit(event):
+    transaction.on_commit(lambda: publish(event))
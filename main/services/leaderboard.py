@@ -0,0 +1,304 @@
+import hashlib
+import json
+from datetime import timedelta
+from uuid import UUID
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from main.models import DailyPointDelta, Profile
+from main.services.events import publish
+from main.services.rank import get_rank
+from main.services.sybil import without_flagged
+
+SNAPSHOT_KEY = "leaderboard:snapshot"
+GENERATION_KEY = "leaderboard:generation"
+ROW_FIELDS = ("user_id", "names", "scored_point", "avatar_url")
+OUTPUT_FIELDS = ("wallet", "names", "scored_point", "rank", "avatar_url")
+CURSOR_SALT = "main.leaderboard.cursor"
+
+# Every board ranks ties alike, as dense ranks ("1223"): one plus the number of distinct
+# higher scores. get_rank, the season boards and frozen season standings count the
+# same way.
+
+
+def dense_ranks(rows, key):
+    """Adds dense ranks to rows already sorted by `key`, highest first."""
+    previous, rank = None, 0
+    for row in rows:
+        if row[key] != previous:
+            previous, rank = row[key], rank + 1
+        row["rank"] = rank
+    return rows
+
+
+def board_profiles():
+    """
+    Pass holders not flagged as sybils, with scored_point joined from ProfileScore.
+    An inner join (every profile has a score), so the score table can drive the read.
+    """
+    return without_flagged(
+        Profile.objects.with_score().filter(has_pass=True, current_pass__isnull=False, score__isnull=False)
+    )
+
+
+def leaderboard_queryset():
+    """
+    Pass holders in board order: profilescore_board_idx is walked in order and each row
+    is checked against profile_pass_holder_idx, so the top rows need no sort.
+    """
+    return board_profiles().order_by("-scored_point", "score__profile_id")
+
+
+def top_rows(size):
+    """
+    The top `size` board rows in LeaderboardSerializer's shape, joined to the wallet in
+    one query, with no serializer per row. The rows start at the top, so their
+    dense ranks follow from the scores read; a DENSE_RANK() window would rank the
+    whole board before the LIMIT. Also returns the user ids on the board.
+    """
+    rows = dense_ranks(list(
+        leaderboard_queryset().values(*ROW_FIELDS, wallet=F("user__wallet_address"))[:size]
+    ), "scored_point")
+    return [_output_row(row) for row in rows], {str(row["user_id"]) for row in rows}
+
+
+def _build_snapshot(generation):
+    rows, user_ids = top_rows(settings.LEADERBOARD_SIZE)
+    full = len(rows) >= settings.LEADERBOARD_SIZE
+    body = json.dumps(rows, sort_keys=True, default=str).encode()
+    return {
+        "generation": generation,
+        "rows": rows,
+        "user_ids": user_ids,
+        # Any score change can matter while the board has free slots
+        "cutoff": rows[-1]["scored_point"] if full else None,
+        "etag": hashlib.md5(body).hexdigest(),
+        "last_modified": timezone.now(),
+    }
+
+
+def get_snapshot():
+    """
+    The top LEADERBOARD_SIZE pass holders with precomputed ranks, an ETag and the time
+    it was built. Rebuilt (one indexed query) only after a change that can affect it.
+
+    A snapshot is tagged with the generation that was current before its query ran,
+    so a build that raced a later change is never served as current.
+    """
+    cached = cache.get_many([SNAPSHOT_KEY, GENERATION_KEY])
+    generation = cached.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    snapshot = cached.get(SNAPSHOT_KEY)
+    if snapshot is not None and snapshot["generation"] == generation:
+        return snapshot
+
+    snapshot = _build_snapshot(generation)
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=settings.LEADERBOARD_SNAPSHOT_TTL)
+    return snapshot
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+    publish({"type": "leaderboard"})
+
+
+def invalidate_leaderboard():
+    """Marks the snapshot stale once the current transaction commits."""
+    transaction.on_commit(_bump_generation)
+
+
+def note_profile_change(user_id, score=None):
+    """
+    Called when a profile's score (or displayed fields, score=None) changes. Only
+    invalidates the snapshot when the profile is on the board or its new score reaches
+    the cutoff; changes further down cost one cache read.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        # A reader may be building one right now from data without this change
+        invalidate_leaderboard()
+        return
+    on_board = str(user_id) in snapshot["user_ids"]
+    reaches_board = score is not None and (snapshot["cutoff"] is None or score >= snapshot["cutoff"])
+    if on_board or reaches_board:
+        invalidate_leaderboard()
+
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row, direction):
+    """
+    Signed, so the rank a page continues from cannot be forged: the client can only
+    hand back a cursor this server issued.
+    """
+    payload = {"s": row["scored_point"], "u": str(row["user_id"]), "r": row["rank"], "d": direction}
+    return signing.dumps(payload, salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+        return int(payload["s"]), UUID(payload["u"]), int(payload["r"]), payload["d"]
+    except (signing.BadSignature, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _output_row(row):
+    return {key: row[key] for key in OUTPUT_FIELDS}
+
+
+def _rows(queryset):
+    return list(queryset.values(*ROW_FIELDS, wallet=F("user__wallet_address")))
+
+
+def _rows_and_next(queryset, limit):
+    """Up to `limit` rows and the row after them (None at the end), from one query for limit + 1."""
+    rows = _rows(queryset[:limit + 1])
+    return rows[:limit], rows[limit] if len(rows) > limit else None
+
+
+def _below(score, user_id):
+    """Board positions after (score, user_id) in board order."""
+    return leaderboard_queryset().filter(
+        Q(scored_point__lt=score) | Q(scored_point=score, user_id__gt=user_id)
+    )
+
+
+def _above(score, user_id):
+    """Board positions before (score, user_id), nearest first."""
+    return (
+        board_profiles()
+        .filter(Q(scored_point__gt=score) | Q(scored_point=score, user_id__lt=user_id))
+        .order_by("scored_point", "-score__profile_id")
+    )
+
+
+def _rank_down(rows, score, rank):
+    """Dense ranks for rows following a row with (score, rank), in board order."""
+    for row in rows:
+        if row["scored_point"] != score:
+            score, rank = row["scored_point"], rank + 1
+        row["rank"] = rank
+    return rows
+
+
+def _rank_up(rows, score, rank):
+    """Dense ranks for rows preceding a row with (score, rank), nearest first."""
+    for row in rows:
+        if row["scored_point"] != score:
+            score, rank = row["scored_point"], rank - 1
+        row["rank"] = rank
+    return rows
+
+
+def _page_response(rows, has_previous, has_next):
+    return {
+        "results": [_output_row(row) for row in rows],
+        "previous": encode_cursor(rows[0], "prev") if rows and has_previous else None,
+        "next": encode_cursor(rows[-1], "next") if rows and has_next else None,
+    }
+
+
+def get_page(cursor=None, limit=50):
+    """
+    One page of the full board with dense ranks. The cursor holds the
+    (scored_point, user_id) key and rank of the row it continues from, so every page
+    is one range read on profilescore_board_idx however deep it is. Ranks are carried
+    from page to page and reflect the board as it was when the first page was read.
+    """
+    if cursor is None:
+        rows, beyond = _rows_and_next(leaderboard_queryset(), limit)
+        return _page_response(_rank_down(rows, None, 0), False, beyond is not None)
+
+    score, user_id, rank, direction = decode_cursor(cursor)
+    if direction == "next":
+        rows, beyond = _rows_and_next(_below(score, user_id), limit)
+        return _page_response(_rank_down(rows, score, rank), True, beyond is not None)
+    if direction == "prev":
+        rows, beyond = _rows_and_next(_above(score, user_id), limit)
+        return _page_response(_rank_up(rows, score, rank)[::-1], beyond is not None, True)
+    raise InvalidCursor("Invalid cursor")
+
+
+def get_around(user_id, size=10):
+    """
+    The caller's row with up to `size` board neighbours on each side, dense-ranked,
+    plus cursors to keep paging in either direction. Returns None if the user is not
+    on the board.
+
+    The caller's rank is read from the snapshot when their score is on it, else from
+    the score histogram (get_rank), which like the stats rank counts every profile's
+    score, not only the board's; no query counts the rows above the caller.
+    """
+    me = _rows(leaderboard_queryset().filter(user_id=user_id))
+    if not me:
+        return None
+    me = me[0]
+    score = me["scored_point"]
+    ranks = {row["scored_point"]: row["rank"] for row in get_snapshot()["rows"]}
+    me["rank"] = ranks[score] if score in ranks else get_rank(score)
+    above, beyond_above = _rows_and_next(_above(score, user_id), size)
+    below, beyond_below = _rows_and_next(_below(score, user_id), size)
+    rows = _rank_up(above, score, me["rank"])[::-1] + [me] + _rank_down(below, score, me["rank"])
+    return _page_response(rows, beyond_above is not None, beyond_below is not None)
+
+
+PERIOD_KEY = "leaderboard:{}:{}"
+
+
+def period_bounds(period, day):
+    """First and last day of the daily or (ISO, Monday-first) weekly period containing `day`."""
+    if period == "daily":
+        return day, day
+    if period == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def get_period_board(period, day=None):
+    """
+    Top earners of a period, summed from the DailyPointDelta rollups of that period
+    only. Cached briefly: the current period changes with every award.
+    """
+    start, end = period_bounds(period, day or timezone.now().date())
+    key = PERIOD_KEY.format(period, start.isoformat())
+    board = cache.get(key)
+    if board is None:
+        rows = (
+            without_flagged(DailyPointDelta.objects.filter(
+                day__range=(start, end),
+                user__profile__has_pass=True,
+                user__profile__current_pass__isnull=False,
+            ))
+            .values("user_id")
+            .annotate(
+                points=Sum("points"),
+                wallet=F("user__wallet_address"),
+                names=F("user__profile__names"),
+                avatar_url=F("user__profile__avatar_url"),
+            )
+            .order_by("-points", "user_id")[:settings.LEADERBOARD_SIZE]
+        )
+        board = {
+            "period": period,
+            "start": start,
+            "end": end,
+            "results": dense_ranks([
+                {"wallet": row["wallet"], "names": row["names"], "points": row["points"], "avatar_url": row["avatar_url"]}
+                for row in rows
+            ], "points"),
+        }
+        cache.set(key, board, timeout=settings.PERIOD_LEADERBOARD_CACHE_TTL)
+    return board
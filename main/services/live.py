@@ -0,0 +1,184 @@
+import asyncio
+import secrets
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from main.authentication import CLAIMS_VERSION_KEY
+from main.models import Profile
+from main.services.events import EVENT_KEY, SEQ_KEY
+from main.services.leaderboard import get_snapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_POLL = 1000
+TICKET_KEY = "live:ticket:{}"
+
+
+def issue_ticket(user_id):
+    """
+    A random, single-use ticket for opening the live stream, valid for LIVE_TICKET_TTL
+    seconds. EventSource cannot send headers, and a ticket in the query string is
+    harmless once used, unlike the access token.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(TICKET_KEY.format(ticket), str(user_id), timeout=settings.LIVE_TICKET_TTL)
+    return ticket
+
+
+async def redeem_ticket(ticket):
+    """The user id a ticket was issued to, or None. Only the first redeemer gets it."""
+    if not ticket:
+        return None
+    key = TICKET_KEY.format(ticket)
+    user_id = await cache.aget(key)
+    # delete() reports whether the key was still there, so a replay racing us loses
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
+
+
+def board_access(user_ids):
+    """{user_id: (sees_board, claims_version)} read from the profiles; missing or inactive users are left out."""
+    rows = Profile.objects.filter(user_id__in=user_ids, user__is_active=True).values_list(
+        "user_id", "has_pass", "current_pass_id", "claims_version",
+    )
+    return {
+        str(user_id): (has_pass and current_pass_id is not None, version)
+        for user_id, has_pass, current_pass_id, version in rows
+    }
+
+
+def leaderboard_diff(old_rows, new_rows):
+    """Rows that are new or changed (keyed by wallet), and wallets that left the board."""
+    old = {row["wallet"]: row for row in old_rows}
+    new = {row["wallet"]: row for row in new_rows}
+    return {
+        "upsert": [row for wallet, row in new.items() if old.get(wallet) != row],
+        "remove": [wallet for wallet in old if wallet not in new],
+    }
+
+
+class Subscription:
+    def __init__(self, user_id, sees_board, claims_version=None):
+        self.user_id = str(user_id)
+        self.sees_board = sees_board
+        self.claims_version = claims_version
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+    def send(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind reconnects and starts from a fresh snapshot
+            self.dropped = True
+
+
+class Broadcaster:
+    """
+    One per process. A single task polls the shared event log and fans events out to
+    every connected client of this process, so a leaderboard change costs one snapshot
+    read (usually zero queries) per process, however many clients are connected.
+    The task runs only while there are subscribers.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.task = None
+        self.last_seq = None
+        self.board = None
+
+    async def subscribe(self, user_id):
+        """Subscribes a user; returns None if they have no profile."""
+        access = (await sync_to_async(board_access)([user_id])).get(str(user_id))
+        if access is None:
+            return None
+        subscription = Subscription(user_id, *access)
+        if subscription.sees_board:
+            if self.board is None:
+                self.board = await sync_to_async(get_snapshot)()
+            subscription.send({"type": "leaderboard", "etag": self.board["etag"], "rows": self.board["rows"]})
+        self.subscribers.add(subscription)
+        if self.task is None or self.task.done():
+            self.last_seq = await cache.aget(SEQ_KEY, 0)
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+                await self.poll()
+        except Exception as exc:
+            logger.warning(f"[Live] Broadcaster stopped: {exc}")
+        finally:
+            self.board = None
+
+    async def poll(self):
+        seq = await cache.aget(SEQ_KEY, 0)
+        if seq == self.last_seq:
+            return
+        first = self.last_seq + 1 if seq > self.last_seq else 1
+        first = max(first, seq - MAX_EVENTS_PER_POLL + 1)
+        events = await cache.aget_many([EVENT_KEY.format(i) for i in range(first, seq + 1)])
+        self.last_seq = seq
+
+        points, board_changed = {}, False
+        for i in range(first, seq + 1):
+            event = events.get(EVENT_KEY.format(i))
+            if event is None:
+                continue
+            if event["type"] == "points":
+                points[event["user_id"]] = event
+            elif event["type"] == "leaderboard":
+                board_changed = True
+
+        diff = None
+        if board_changed:
+            await self.recheck_board_access()
+        if board_changed and any(subscription.sees_board for subscription in self.subscribers):
+            snapshot = await sync_to_async(get_snapshot)()
+            if self.board is None or snapshot["etag"] != self.board["etag"]:
+                diff = {"type": "leaderboard_diff", "etag": snapshot["etag"],
+                        **leaderboard_diff(self.board["rows"] if self.board else [], snapshot["rows"])}
+            self.board = snapshot
+
+        for subscription in list(self.subscribers):
+            if subscription.user_id in points:
+                subscription.send(points[subscription.user_id])
+            if diff and subscription.sees_board:
+                subscription.send(diff)
+
+
+    async def recheck_board_access(self):
+        """
+        Re-reads who may see the board before a diff goes out: one cache read of every
+        subscriber's claims_version, and one profile query only for those whose version
+        moved (a pass change) or is no longer cached. Subscribers whose user is gone are dropped.
+        """
+        subscribers = list(self.subscribers)
+        versions = await cache.aget_many({CLAIMS_VERSION_KEY.format(s.user_id) for s in subscribers})
+        stale = {
+            s.user_id for s in subscribers
+            if versions.get(CLAIMS_VERSION_KEY.format(s.user_id)) != s.claims_version or s.claims_version is None
+        }
+        if not stale:
+            return
+        access = await sync_to_async(board_access)(stale)
+        for subscription in subscribers:
+            if subscription.user_id not in stale:
+                continue
+            if subscription.user_id not in access:
+                subscription.dropped = True
+                subscription.sees_board = False
+                continue
+            subscription.sees_board, subscription.claims_version = access[subscription.user_id]
+            await cache.aadd(CLAIMS_VERSION_KEY.format(subscription.user_id), subscription.claims_version,
+                             timeout=60 * 60)
+
+
+broadcaster = Broadcaster()
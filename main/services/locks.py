@@ -0,0 +1,22 @@
+import secrets
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+# Deletes the lock only if it still holds our token, in one round trip
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def acquire(key, timeout):
+    """Takes a cache lock for at most timeout seconds. Returns the owner token, or None if it is held."""
+    token = secrets.randbits(62)  # an int, which the Redis backend stores unpickled
+    return token if cache.add(key, token, timeout=timeout) else None
+
+
+def release(key, token):
+    """Deletes the lock unless it expired and someone else holds it now."""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        redis_key = backend.make_and_validate_key(key)
+        backend._cache.get_client(redis_key, write=True).eval(RELEASE_SCRIPT, 1, redis_key, token)
+    elif cache.get(key) == token:
+        cache.delete(key)
@@ -0,0 +1,95 @@
+import hmac
+import hashlib
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from main.models import LoginNonce
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nonces are valid for 5 minutes, same window as the old LoginNonce rows.
+NONCE_TTL = getattr(settings, "LOGIN_NONCE_TTL", 300)
+USED_NONCE_KEY = "login_nonce_used:{}"
+
+
+def _sign(payload):
+    key = f"digidrop.login-nonce:{settings.SECRET_KEY}".encode()
+    return hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_nonce():
+    """
+    Returns a self-expiring nonce of the form "<random>.<issued_at>.<mac>".
+    Nothing is stored: the MAC proves we issued it and issued_at bounds its lifetime.
+    """
+    payload = f"{get_random_string(32)}.{int(time.time())}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_nonce(nonce):
+    """
+    Checks the MAC and expiry of a nonce without touching the cache or the database.
+    Legacy nonces (issued before the switch, stored as LoginNonce rows) are still
+    accepted until they expire.
+    """
+    if not nonce or not isinstance(nonce, str):
+        return False
+
+    parts = nonce.split(".")
+    if len(parts) == 1:
+        return _verify_legacy_nonce(nonce)
+    if len(parts) != 3:
+        return False
+
+    random_part, issued_at, mac = parts
+    if not hmac.compare_digest(_sign(f"{random_part}.{issued_at}"), mac):
+        return False
+    try:
+        age = time.time() - int(issued_at)
+    except ValueError:
+        return False
+    return -30 <= age <= NONCE_TTL
+
+
+def consume_nonce(nonce):
+    """
+    Marks a verified nonce as used. Returns False if it was already consumed.
+    cache.add is atomic, so two concurrent logins with the same nonce cannot both win.
+    """
+    if "." not in nonce:
+        return LoginNonce.objects.filter(nonce=nonce, used=False).update(used=True) == 1
+    random_part = nonce.split(".", 1)[0]
+    # Keep the marker a little longer than the nonce can live so it never resurrects.
+    return cache.add(USED_NONCE_KEY.format(random_part), 1, timeout=NONCE_TTL + 60)
+
+
+def _verify_legacy_nonce(nonce):
+    nonce_obj = LoginNonce.objects.filter(nonce=nonce).first()
+    if nonce_obj is None:
+        return False
+    return not nonce_obj.used and not nonce_obj.is_expired()
+
+
+def purge_login_nonces(older_than=timedelta(minutes=5), batch_size=5000):
+    """
+    Deletes LoginNonce rows in primary-key batches so the purge never holds one
+    giant transaction on a table with millions of rows. Returns the number deleted.
+    """
+    cutoff = timezone.now() - older_than
+    deleted = 0
+    while True:
+        ids = list(
+            LoginNonce.objects.filter(created_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        count, _ = LoginNonce.objects.filter(id__in=ids).delete()
+        deleted += count
+        logger.info(f"[NoncePurge] Deleted {deleted} login nonces so far")
+    return deleted
@@ -3,6 +3,9 @@ from django.db import transaction
 from web3 import Web3
 from django.conf import settings
 from main.models import PassTransaction, DigiPass, DigiUser
+from main.authentication import invalidate_pass_claims
+from main.services import counters
+from main.services.points import Reason, credit_points
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +24,7 @@ def handle_pass_minted(event):
     amount_paid = Decimal(args["amountPaid"]["value"]) / Decimal(10**18)
 
     try:
-        user = DigiUser.objects.get(wallet_address__iexact=wallet)
+        user = DigiUser.objects.get(wallet_address=DigiUser.objects.normalize_wallet_address(wallet))
     except DigiUser.DoesNotExist:
         logger.warning(f"[Webhook] DigiUser with wallet {wallet} does not exist. Skipping pass minted event.")
         return
@@ -36,7 +39,7 @@ def handle_pass_minted(event):
         if PassTransaction.objects.filter(tx_hash=tx_hash).exists():
             return
 
-        PassTransaction.objects.create(
+        pass_tx = PassTransaction.objects.create(
             tx_hash=tx_hash,
             user=user,
             wallet_address=wallet,
@@ -47,6 +50,7 @@ def handle_pass_minted(event):
             usd_price=digipass.usd_price,
             is_upgrade=False,
         )
+        counters.record_mint(pass_tx.created_at)
 
         profile = user.profile
         if profile.referred_by and not profile.has_pass:
@@ -56,18 +60,21 @@ def handle_pass_minted(event):
         # Login points adjustment logic
         from datetime import date
         today = date.today()
-        if profile.last_login_date == today:
+        if profile.score.last_login_date == today:
             old_pass = profile.current_pass
             old_power = getattr(old_pass, "point_power", 1) if old_pass else 1
             new_power = getattr(digipass, "point_power", 1)
             if new_power > old_power:
                 points_to_add = (new_power - old_power) * 10
-                profile.scored_point += points_to_add
+                credit_points(profile.user_id, points_to_add, Reason.PASS_ADJUSTMENT, reference=tx_hash)
                 logger.info(f"[Webhook] Adjusted daily login points for {wallet}: +{points_to_add} points (power {old_power} -> {new_power})")
 
+        if not profile.has_pass:
+            counters.increment(counters.PASSES)
         profile.current_pass = digipass
         profile.has_pass = True
-        profile.save(update_fields=["current_pass", "has_pass", "scored_point"])
+        profile.save(update_fields=["current_pass", "has_pass"])
+        invalidate_pass_claims(user.id)
 
 
 def handle_pass_upgraded(event):
@@ -79,7 +86,7 @@ def handle_pass_upgraded(event):
     amount_paid = Decimal(args["amountPaid"]["value"]) / Decimal(10**18)
 
     try:
-        user = DigiUser.objects.get(wallet_address__iexact=wallet)
+        user = DigiUser.objects.get(wallet_address=DigiUser.objects.normalize_wallet_address(wallet))
     except DigiUser.DoesNotExist:
         logger.warning(f"[Webhook] DigiUser with wallet {wallet} does not exist. Skipping pass upgraded event.")
         return
@@ -94,7 +101,7 @@ def handle_pass_upgraded(event):
         if PassTransaction.objects.filter(tx_hash=tx_hash).exists():
             return
 
-        PassTransaction.objects.create(
+        pass_tx = PassTransaction.objects.create(
             tx_hash=tx_hash,
             user=user,
             wallet_address=wallet,
@@ -105,22 +112,24 @@ def handle_pass_upgraded(event):
             usd_price=new_pass.usd_price,
             is_upgrade=True,
         )
+        counters.record_mint(pass_tx.created_at)
 
         profile = user.profile
 
         # Login points adjustment logic
         from datetime import date
         today = date.today()
-        if profile.last_login_date == today:
+        if profile.score.last_login_date == today:
             old_pass = profile.current_pass
             old_power = getattr(old_pass, "point_power", 1) if old_pass else 1
             new_power = getattr(new_pass, "point_power", 1)
             if new_power > old_power:
                 points_to_add = (new_power - old_power) * 10
-                profile.scored_point += points_to_add
+                credit_points(profile.user_id, points_to_add, Reason.PASS_ADJUSTMENT, reference=tx_hash)
                 logger.info(f"[Webhook] Adjusted daily login points for {wallet} (upgrade): +{points_to_add} points (power {old_power} -> {new_power})")
 
         profile.current_pass = new_pass
-        profile.save(update_fields=["current_pass", "scored_point"])
+        profile.save(update_fields=["current_pass"])
+        invalidate_pass_claims(user.id)
 
 
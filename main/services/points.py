@@ -0,0 +1,334 @@
+from collections import defaultdict
+from uuid import UUID
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import BigIntegerField, Case, F, Value, When, sql
+from main.models import PointEvent, Profile, ProfileScore
+from main.services import counters, leaderboard, locks, profile_cache, rollups
+from main.services.events import publish_on_commit
+import logging
+
+logger = logging.getLogger(__name__)
+
+Reason = PointEvent.Reason
+
+PENDING_SEQ_KEY = "points:pending:seq"
+PENDING_ENTRY_KEY = "points:pending:entry:{}"
+PENDING_AMOUNT_KEY = "points:pending:amount:{}:{}"
+PENDING_TOTAL_KEY = "points:pending:user:{}"
+PENDING_LOGGED_KEY = "points:pending:logged:{}:{}"
+FLUSHED_SEQ_KEY = "points:pending:flushed"
+GAP_KEY = "points:pending:gap"
+FLUSH_BATCH_KEY = "points:pending:batch"
+SETTLED_KEY = "points:pending:settled:{}:{}"
+FLUSH_LOCK_KEY = "points:pending:flush_lock"
+FLUSH_DUE_KEY = "points:pending:flush_due"
+FLUSH_REFERENCE = "flush:{}"
+FLUSH_LOCK_TTL = 60
+RELOG_AFTER = 60 * 60  # a user with pending points but no queue entry is queued again by their next award after this
+SETTLED_TTL = 24 * 60 * 60
+
+
+def credit_points(user_id, amount, reason, reference="", only_if=None, also_set=None):
+    """
+    Adds `amount` to a user's ProfileScore.scored_point with an atomic UPDATE ... RETURNING,
+    records it in the PointEvent ledger and runs the score-change hooks. Every point award goes
+    through here or credit_points_many.
+
+    reason: a PointEvent.Reason; reference: the task id or tx hash behind the award.
+    only_if: optional Q that must match the ProfileScore row for the award to happen.
+    also_set: extra columns written by the same UPDATE.
+    Returns the new balance, or None if only_if did not match.
+    """
+    # No savepoint: callers already run inside a transaction and nothing here is retried
+    with transaction.atomic(savepoint=False):
+        scores = ProfileScore.objects.filter(profile_id=user_id)
+        if only_if is not None:
+            scores = scores.filter(only_if)
+        updated = _update_returning(scores, {"scored_point": F("scored_point") + amount, **(also_set or {})})
+        if not updated:
+            return None
+        new_balance = updated[0][1]
+        PointEvent.objects.create(
+            user_id=user_id, amount=amount, balance_after=new_balance, reason=reason, reference=str(reference),
+        )
+        counters.increment(counters.POINTS, amount)
+        _after_credit(user_id, amount, new_balance)
+    return new_balance
+
+
+def _update_returning(queryset, values):
+    """
+    queryset.update(**values) that also returns each updated row's (profile_id,
+    scored_point) as written, so no second read of the row is needed.
+    """
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    update_sql, params = compiler.as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        returning = ", ".join(compiler.quote_name_unless_alias(ProfileScore._meta.get_field(name).column)
+                              for name in ("profile", "scored_point"))
+        cursor.execute(f"{update_sql} RETURNING {returning}", params)
+        # Raw rows: the backend may hand the id back as a string
+        return [(UUID(str(profile_id)), balance) for profile_id, balance in cursor.fetchall()]
+
+
+def credit_points_many(awards):
+    """
+    Applies several awards at once: one UPDATE ... RETURNING for every balance and one
+    bulk INSERT into the ledger. Awards to the same user are summed.
+
+    awards: iterable of (user_id, amount, reason, reference).
+    Returns {user_id: new_balance} for the users that have a profile.
+    """
+    awards = [award for award in awards if award[1]]
+    totals = defaultdict(int)
+    for user_id, amount, _, _ in awards:
+        totals[user_id] += amount
+    if not totals:
+        return {}
+
+    with transaction.atomic(savepoint=False):
+        added = Case(
+            *[When(profile_id=user_id, then=Value(total)) for user_id, total in totals.items()],
+            default=Value(0), output_field=BigIntegerField(),
+        )
+        balances = dict(_update_returning(
+            ProfileScore.objects.filter(profile_id__in=totals), {"scored_point": F("scored_point") + added},
+        ))
+
+        # Replay each user's awards up from the old balance, so balance_after is exact per event
+        running = {user_id: balance - totals[user_id] for user_id, balance in balances.items()}
+        events = []
+        for user_id, amount, reason, reference in awards:
+            if user_id in running:
+                running[user_id] += amount
+                events.append(PointEvent(
+                    user_id=user_id, amount=amount, balance_after=running[user_id],
+                    reason=reason, reference=str(reference),
+                ))
+        PointEvent.objects.bulk_create(events)
+
+        totals = {user_id: totals[user_id] for user_id in balances}
+        counters.increment(counters.POINTS, sum(totals.values()))
+        rollups.schedule_rollup()
+        for user_id, new_balance in balances.items():
+            _notify(user_id, totals[user_id], new_balance)
+    return balances
+
+
+def award_points(user_id, amount, reason, reference=""):
+    """
+    For awards that need neither a guard nor the new balance (tasks, referrals).
+    Credited immediately, or with POINTS_WRITE_BEHIND queued for the next batched flush.
+    """
+    award_points_many([(user_id, amount, reason, reference)])
+
+
+def award_points_many(awards):
+    """
+    credit_points_many for awards whose new balances the caller does not need. With
+    POINTS_WRITE_BEHIND the awards are added to per-user pending amounts in the cache
+    once the caller's transaction commits, and applied by flush_pending_points; reads
+    add pending_points meanwhile.
+    """
+    awards = [(UUID(str(user_id)), amount, reason, str(reference)) for user_id, amount, reason, reference in awards]
+    if not settings.POINTS_WRITE_BEHIND:
+        credit_points_many(awards)
+        return
+    transaction.on_commit(lambda: _queue_awards(awards))
+
+
+def _incr(key, delta=1, start=0):
+    cache.add(key, start, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, start + delta, timeout=None)
+        return start + delta
+
+
+def _queue_awards(awards):
+    amounts = defaultdict(int)
+    for user_id, amount, reason, _ in awards:
+        if amount:
+            amounts[user_id, reason] += amount
+    for (user_id, reason), amount in amounts.items():
+        _incr(PENDING_TOTAL_KEY.format(user_id), amount)
+        pending = _incr(PENDING_AMOUNT_KEY.format(user_id, reason), amount)
+        # Only an amount that was at zero needs a queue entry: the flush reads the whole amount.
+        # The logged marker re-queues an amount whose entry was lost.
+        if pending == amount or cache.add(PENDING_LOGGED_KEY.format(user_id, reason), True, timeout=RELOG_AFTER):
+            _log_pending(user_id, reason)
+
+    # At most one opportunistic flush per interval across all workers
+    if cache.add(FLUSH_DUE_KEY, True, timeout=settings.POINTS_FLUSH_INTERVAL):
+        try:
+            flush_pending_points()
+        except Exception as exc:
+            # The awards stay queued for the next flush; never fail the request
+            logger.warning(f"[Points] Opportunistic flush failed: {exc}")
+
+
+def _log_pending(user_id, reason):
+    cache.set(PENDING_LOGGED_KEY.format(user_id, reason), True, timeout=RELOG_AFTER)
+    # An evicted sequence restarts above everything already flushed, never below it;
+    # add, not set, so a restarted sequence never overwrites an entry that is still queued
+    while not cache.add(
+        PENDING_ENTRY_KEY.format(_incr(PENDING_SEQ_KEY, start=_flushed_seq())), (user_id, reason), timeout=None,
+    ):
+        pass
+
+
+def _flushed_seq():
+    """
+    The last queue entry flushed. If the cache lost it, the durable copy is the
+    reference of the latest flushed batch in the ledger.
+    """
+    flushed = cache.get(FLUSHED_SEQ_KEY)
+    if flushed is None:
+        reference = (PointEvent.objects.filter(reference__startswith=FLUSH_REFERENCE.format(""))
+                     .order_by("-id").values_list("reference", flat=True).first())
+        flushed = int(reference.rsplit(":", 1)[1]) if reference else 0
+        cache.add(FLUSHED_SEQ_KEY, flushed, timeout=None)
+    return flushed
+
+
+def pending_points(user_id):
+    """Points queued for a user but not yet flushed to their profile."""
+    if not settings.POINTS_WRITE_BEHIND:
+        return 0
+    return cache.get(PENDING_TOTAL_KEY.format(user_id), 0)
+
+
+def with_pending_points(payload, field, user_id):
+    """A copy of payload with the user's pending points added to payload[field]."""
+    pending = pending_points(user_id)
+    return {**payload, field: payload[field] + pending} if pending else payload
+
+
+def flush_pending_points(batch_size=None):
+    """
+    Applies the pending amounts of up to batch_size queued entries, oldest first, with
+    one credit_points_many: one UPDATE for every profile and one ledger event per user
+    and reason. Only one flush runs at a time. A batch is applied at most once: a flush
+    that dies halfway is finished by the next one. Returns the number of amounts settled.
+    """
+    token = locks.acquire(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    if token is None:
+        return 0
+    try:
+        batch = cache.get(FLUSH_BATCH_KEY) or _next_batch(batch_size or settings.POINTS_FLUSH_BATCH_SIZE)
+        if batch is None:
+            return 0
+        return _settle_batch(batch, _apply_batch(batch))
+    finally:
+        locks.release(FLUSH_LOCK_KEY, token)
+
+
+def _next_batch(batch_size):
+    """
+    Reads up to batch_size queue entries and their pending amounts into a batch, saved
+    in the cache before anything is applied. None if there is nothing to flush.
+    """
+    flushed = _flushed_seq()
+    seq = cache.get(PENDING_SEQ_KEY, flushed)
+    keys = [PENDING_ENTRY_KEY.format(i) for i in range(flushed + 1, min(seq, flushed + batch_size) + 1)]
+    entries = cache.get_many(keys)
+
+    queued, upto = {}, flushed
+    for i, key in enumerate(keys, start=flushed + 1):
+        entry = entries.get(key)
+        if entry is None:
+            # Numbered but not written yet: wait for it, unless it was already missing last time.
+            # Its amount is not lost: it stays pending until the user is queued again.
+            if cache.get(GAP_KEY) != i:
+                cache.set(GAP_KEY, i, timeout=None)
+                break
+            logger.warning(f"[Points] Queue entry {i} never arrived; skipping it")
+        else:
+            queued[tuple(entry)] = None
+        upto = i
+    if upto == flushed:
+        return None
+
+    amounts = cache.get_many([PENDING_AMOUNT_KEY.format(*entry) for entry in queued])
+    awards = []
+    for user_id, reason in queued:
+        amount = amounts.get(PENDING_AMOUNT_KEY.format(user_id, reason), 0)
+        if amount > 0:
+            awards.append((user_id, amount, reason))
+    batch = {"upto": upto, "awards": awards, "entries": keys[:upto - flushed]}
+    cache.set(FLUSH_BATCH_KEY, batch, timeout=None)
+    return batch
+
+
+def _apply_batch(batch):
+    """
+    Credits the batch under the ledger reference flush:<upto>, unless a ledger event
+    with that reference shows it was already applied. Returns the ids of the users
+    the batch credited, now or in an earlier run, read back from the ledger.
+    """
+    reference = FLUSH_REFERENCE.format(batch["upto"])
+    user_ids = sorted({user_id for user_id, _, _ in batch["awards"]})
+    with transaction.atomic():
+        # Lock one of the batch's profiles first, so a second flush of the same batch waits for ours to commit
+        marker = (ProfileScore.objects.select_for_update().filter(profile_id__in=user_ids)
+                  .order_by("profile_id").values_list("profile_id", flat=True).first())
+        if marker is not None and not PointEvent.objects.filter(user_id=marker, reference=reference).exists():
+            credit_points_many((user_id, amount, reason, reference) for user_id, amount, reason in batch["awards"])
+        return set(PointEvent.objects.filter(user_id__in=user_ids, reference=reference).values_list("user_id", flat=True))
+
+
+def _settle_batch(batch, credited):
+    """
+    Takes the applied amounts off the pending ones and forgets the batch. Each amount is
+    taken off once even if this runs again; what was added meanwhile is queued again.
+    An amount that was not credited stays pending and is queued again, unless its user
+    no longer has a profile: that one is dropped, and logged. Returns the number of
+    amounts settled.
+    """
+    upto = batch["upto"]
+    missed = {user_id for user_id, _, _ in batch["awards"]} - credited
+    orphans = missed - set(Profile.objects.filter(user_id__in=missed).values_list("user_id", flat=True)) if missed else set()
+    for i, (user_id, amount, reason) in enumerate(batch["awards"]):
+        if user_id in missed and user_id not in orphans:
+            logger.warning(f"[Points] No score row for {user_id}; {amount} {reason} points stay queued")
+            _log_pending(user_id, reason)
+            continue
+        if not cache.add(SETTLED_KEY.format(upto, i), True, timeout=SETTLED_TTL):
+            continue
+        if user_id in orphans:
+            logger.warning(f"[Points] Dropping {amount} {reason} points queued for deleted user {user_id}")
+        _decr(PENDING_TOTAL_KEY.format(user_id), amount)
+        if _decr(PENDING_AMOUNT_KEY.format(user_id, reason), amount) > 0:
+            _log_pending(user_id, reason)
+    cache.set(FLUSHED_SEQ_KEY, upto, timeout=None)
+    cache.delete_many(batch["entries"])
+    cache.delete(FLUSH_BATCH_KEY)
+    settled = len(batch["awards"]) - sum(1 for user_id, _, _ in batch["awards"] if user_id in missed - orphans)
+    logger.info(f"[Points] Flushed {settled} pending amounts up to queue entry {upto}")
+    return settled
+
+
+def _decr(key, delta):
+    try:
+        return cache.decr(key, delta)
+    except ValueError:
+        return 0
+
+
+def _after_credit(user_id, amount, new_balance):
+    # The rank histogram, daily deltas and season scores are rolled up from the ledger in batches
+    rollups.schedule_rollup()
+    _notify(user_id, amount, new_balance)
+
+
+def _notify(user_id, amount, new_balance):
+    leaderboard.note_profile_change(user_id, new_balance)
+    profile_cache.bump_generation(user_id)
+    publish_on_commit({"type": "points", "user_id": str(user_id), "point": new_balance, "added": amount})
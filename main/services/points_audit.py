@@ -0,0 +1,145 @@
+from collections import defaultdict
+from uuid import UUID
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, Exists, OuterRef, Sum, Value, When
+from main.models import PassTransaction, PointEvent, Profile, ProfileScore, UserTaskCompletion
+from main.services import counters, leaderboard, profile_cache, rank
+import logging
+
+logger = logging.getLogger(__name__)
+
+UUID_SPACE = 1 << 128
+APPLY_BATCH_SIZE = 500
+# What the pre-ledger code awarded (see award_referral_points and the pass verifier)
+REFERRAL_POINTS = 100  # per referee's first mint, times the referrer's point_power
+REFERRAL_BONUS_POINTS = 80  # to a referred user on their first mint
+PASS_ADJUSTMENT_POINTS = 10  # per point_power gained by a pass upgrade
+
+
+def user_id_ranges(chunks):
+    """Splits the user id (UUID) space into `chunks` contiguous, inclusive (first, last) ranges."""
+    step = -(-UUID_SPACE // chunks)
+    return [(UUID(int=start), UUID(int=min(start + step, UUID_SPACE) - 1)) for start in range(0, UUID_SPACE, step)]
+
+
+def _ledger_totals(**filters):
+    return dict(
+        PointEvent.objects.filter(**filters)
+        .values("user_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+        .values_list("user_id", "total")
+    )
+
+
+def audit_range(first, last):
+    """
+    Compares every balance in the user id range [first, last] with the sum of its
+    PointEvent ledger, with one range read of each table. Returns the mismatches as
+    (user_id, balance, ledger_total) tuples. Safe to run in a worker process.
+    """
+    balances = (
+        ProfileScore.objects.filter(profile_id__gte=first, profile_id__lte=last)
+        .values_list("profile_id", "scored_point")
+    )
+    ledger = _ledger_totals(user_id__gte=first, user_id__lte=last)
+    return [
+        (user_id, balance, ledger.get(user_id, 0))
+        for user_id, balance in balances.iterator(chunk_size=5000)
+        if balance != ledger.get(user_id, 0)
+    ]
+
+
+def ledger_start():
+    """When the ledger began: its first opening balance, else its first event; None if it is empty."""
+    events = PointEvent.objects.order_by("id").values_list("created_at", flat=True)
+    return events.filter(reason=PointEvent.Reason.OPENING_BALANCE).first() or events.first()
+
+
+def audit_opening_range(first, last, started, tolerance=None):
+    """
+    Checks the opening balances in the user id range [first, last], which were copied
+    from scored_point when the ledger started, against what the user's history before
+    `started` explains: completed tasks (their awarded_points), referral awards and
+    bonuses for first mints, and pass-upgrade adjustments (counted as if every upgrade
+    fell on a login day, so an upper bound). Daily login points left no history, so
+    an opening balance may exceed the reconstruction by up to `tolerance`; it may never
+    fall short of it. Returns (user_id, opening_balance, reconstructed, difference)
+    tuples. Safe to run in a worker process.
+    """
+    in_range = {"user_id__gte": first, "user_id__lte": last}
+    opening = dict(
+        PointEvent.objects.filter(reason=PointEvent.Reason.OPENING_BALANCE, **in_range).values_list("user_id", "amount")
+    )
+    earned = defaultdict(int)
+
+    tasks = (
+        UserTaskCompletion.objects.filter(status=UserTaskCompletion.Status.COMPLETED, completed_at__lt=started, **in_range)
+        .values("user_id").annotate(points=Sum("awarded_points")).order_by().values_list("user_id", "points")
+    )
+    for user_id, points in tasks:
+        earned[user_id] += points
+
+    mints = PassTransaction.objects.filter(is_verified=True, created_at__lt=started)
+    referred = Profile.objects.filter(referred_by__isnull=False).filter(Exists(mints.filter(user_id=OuterRef("user_id"))))
+    for user_id in referred.filter(**in_range).values_list("user_id", flat=True):
+        earned[user_id] += REFERRAL_BONUS_POINTS
+    referees = dict(
+        referred.filter(referred_by__gte=first, referred_by__lte=last)
+        .values("referred_by").annotate(count=Count("user_id")).order_by().values_list("referred_by", "count")
+    )
+    # The referrer's pass then is not recorded; its current one is the best estimate
+    powers = Profile.objects.filter(user_id__in=referees).values_list("user_id", "current_pass__point_power")
+    for user_id, power in powers:
+        earned[user_id] += referees[user_id] * REFERRAL_POINTS * (power or 1)
+
+    previous = {}
+    for user_id, power in mints.filter(**in_range).order_by("user_id", "created_at").values_list("user_id", "digipass__point_power"):
+        earned[user_id] += max(power - previous.get(user_id, 1), 0) * PASS_ADJUSTMENT_POINTS
+        previous[user_id] = power
+
+    rows = []
+    for user_id in opening.keys() | earned.keys():
+        balance, reconstructed = opening.get(user_id, 0), earned.get(user_id, 0)
+        difference = balance - reconstructed
+        if difference < 0 or (tolerance is not None and difference > tolerance):
+            rows.append((user_id, balance, reconstructed, difference))
+    return rows
+
+
+def apply_corrections(user_ids):
+    """
+    Sets each listed balance to its ledger total. Rows are locked and re-checked first,
+    so an award that landed since the audit read is not undone. Runs the score-change
+    hooks (rank histogram, points counter, leaderboard, profile cache) like an award.
+    Returns {user_id: (old_balance, new_balance)} for the balances changed.
+    """
+    user_ids = list(user_ids)
+    fixes = {}
+    for start in range(0, len(user_ids), APPLY_BATCH_SIZE):
+        batch = user_ids[start:start + APPLY_BATCH_SIZE]
+        with transaction.atomic():
+            balances = dict(
+                ProfileScore.objects.select_for_update().filter(profile_id__in=batch).values_list("profile_id", "scored_point")
+            )
+            ledger = _ledger_totals(user_id__in=batch)
+            wrong = {
+                user_id: (balance, ledger.get(user_id, 0))
+                for user_id, balance in balances.items()
+                if balance != ledger.get(user_id, 0)
+            }
+            if not wrong:
+                continue
+            ProfileScore.objects.filter(profile_id__in=wrong).update(scored_point=Case(
+                *[When(profile_id=user_id, then=Value(new)) for user_id, (_, new) in wrong.items()],
+                output_field=BigIntegerField(),
+            ))
+            rank.record_score_changes(wrong.values())
+            counters.increment(counters.POINTS, sum(new - old for old, new in wrong.values()))
+            for user_id, (_, new) in wrong.items():
+                leaderboard.note_profile_change(user_id, new)
+                profile_cache.bump_generation(user_id)
+        fixes.update(wrong)
+    if fixes:
+        logger.warning(f"[PointsAudit] Reset {len(fixes)} balances to their ledger totals")
+    return fixes
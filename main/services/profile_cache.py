@@ -0,0 +1,53 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = "profile_gen:{}"
+PAYLOAD_KEY = "profile:{}:{}:{}"
+
+
+def _new_generation():
+    # Never reuses a generation an evicted counter might have had, so old payloads stay unreachable
+    return time.time_ns()
+
+
+def get_generation(user_id):
+    key = GENERATION_KEY.format(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(user_id):
+    key = GENERATION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), timeout=None)
+
+
+def bump_generation(user_id):
+    """
+    Makes every cached payload of the user unreachable once the current transaction
+    commits. Bumping after commit means a reader that sees the new generation also
+    sees the new rows, so a write is never followed by a stale read.
+    """
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def cached_payload(kind, user_id, build, timeout=None, cache_if=None):
+    """
+    Read-through cache of a per-user payload, keyed by the user's current generation.
+    build() makes the payload on a miss; it is only stored when cache_if(payload) is
+    true (default: always).
+    """
+    key = PAYLOAD_KEY.format(kind, user_id, get_generation(user_id))
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        if cache_if is None or cache_if(payload):
+            cache.set(key, payload, timeout=timeout or settings.PROFILE_CACHE_TTL)
+    return payload
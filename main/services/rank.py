@@ -0,0 +1,103 @@
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Sum, Value, When
+from main.models import ProfileScore, ScoreBucket, ScoreLevel
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def bucket_floor(score):
+    width = settings.RANK_BUCKET_WIDTH
+    return score // width * width
+
+
+def get_rank(score):
+    """
+    1-based dense rank of a score: the distinct scores held above it, plus one, so tied
+    profiles share a rank and the next rank follows on. Costs one SUM over the (small)
+    bucket table and one distinct count bounded to a single bucket's score range, no
+    matter how many profiles exist.
+    """
+    floor = bucket_floor(score)
+    above_bucket = (
+        ScoreBucket.objects.filter(floor__gt=floor).aggregate(n=Sum("score_count"))["n"] or 0
+    )
+    within_bucket = ProfileScore.objects.filter(
+        scored_point__gt=score, scored_point__lt=floor + settings.RANK_BUCKET_WIDTH
+    ).values("scored_point").distinct().count()
+    return above_bucket + within_bucket + 1
+
+
+def record_score_changes(changes):
+    """
+    Applies (old_score, new_score) pairs to the histogram: the net move per score is
+    added to its ScoreLevel, and a bucket's score_count moves only for the scores that
+    gained their first profile or lost their last. A fixed number of statements however
+    many profiles changed.
+    """
+    deltas = {}
+    for old_score, new_score in changes:
+        if old_score != new_score:
+            deltas[old_score] = deltas.get(old_score, 0) - 1
+            deltas[new_score] = deltas.get(new_score, 0) + 1
+    deltas = {score: delta for score, delta in deltas.items() if bucket_floor(score) and delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        ScoreLevel.objects.bulk_create(
+            [ScoreLevel(score=score) for score, delta in deltas.items() if delta > 0], ignore_conflicts=True,
+        )
+        before = dict(
+            ScoreLevel.objects.select_for_update().filter(score__in=deltas).values_list("score", "profile_count")
+        )
+        _add_counts(ScoreLevel.objects, "profile_count", deltas)
+        ScoreLevel.objects.filter(score__in=deltas, profile_count__lte=0).delete()
+
+        buckets = {}
+        for score, delta in deltas.items():
+            count = before.get(score, 0)
+            occupied = (count + delta > 0) - (count > 0)
+            if occupied:
+                buckets[bucket_floor(score)] = buckets.get(bucket_floor(score), 0) + occupied
+        buckets = {floor: delta for floor, delta in buckets.items() if delta}
+        if buckets:
+            ScoreBucket.objects.bulk_create(
+                [ScoreBucket(floor=floor) for floor, delta in buckets.items() if delta > 0], ignore_conflicts=True,
+            )
+            _add_counts(ScoreBucket.objects, "score_count", buckets)
+
+
+def _add_counts(manager, field, deltas):
+    """Adds {pk: delta} to `field` of the rows with one UPDATE."""
+    manager.filter(pk__in=deltas).update(**{field: F(field) + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        output_field=BigIntegerField(),
+    )})
+
+
+def rebuild_histogram():
+    """
+    Recomputes every level and bucket from ProfileScore with one GROUP BY and swaps the
+    table contents in a single transaction. Corrects any drift from concurrent incremental
+    updates. Returns the number of non-empty buckets.
+    """
+    counts = (
+        ProfileScore.objects.filter(scored_point__gte=settings.RANK_BUCKET_WIDTH)
+        .values("scored_point")
+        .annotate(n=Count("profile"))
+        .order_by()
+        .values_list("scored_point", "n")
+    )
+    levels = [ScoreLevel(score=score, profile_count=n) for score, n in counts]
+    buckets = Counter(bucket_floor(level.score) for level in levels)
+    with transaction.atomic():
+        ScoreLevel.objects.all().delete()
+        ScoreLevel.objects.bulk_create(levels, batch_size=1000)
+        ScoreBucket.objects.all().delete()
+        ScoreBucket.objects.bulk_create(
+            [ScoreBucket(floor=floor, score_count=n) for floor, n in buckets.items()], batch_size=1000
+        )
+    logger.info(f"[Rank] Rebuilt score histogram with {len(buckets)} buckets")
+    return len(buckets)
@@ -0,0 +1,79 @@
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from main.models import Profile
+from main.services.leaderboard import dense_ranks
+from main.services.profile_cache import bump_generation
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPAIR_BATCH_SIZE = 500
+
+
+def add_referrals(referrer_ids):
+    """
+    Increments referral_count for each referrer id (repeats count more than once)
+    with a single UPDATE. Call it in the transaction that inserts the referred profiles.
+    """
+    counts = Counter(referrer_id for referrer_id in referrer_ids if referrer_id)
+    if not counts:
+        return
+    Profile.objects.filter(user_id__in=counts).update(
+        referral_count=F("referral_count") + Case(
+            *[When(user_id=referrer_id, then=Value(n)) for referrer_id, n in counts.items()],
+            output_field=IntegerField(),
+        )
+    )
+    for referrer_id in counts:
+        bump_generation(referrer_id)
+
+
+def top_referrers(size=None):
+    """Profiles with the most referrals, read from profile_top_referrers_idx."""
+    rows = (
+        Profile.objects.filter(referral_count__gt=0)
+        .order_by("-referral_count", "user_id")
+        .values("names", "avatar_url", "referral_count", wallet=F("user__wallet_address"))
+        [:size or settings.LEADERBOARD_SIZE]
+    )
+    return dense_ranks(list(rows), "referral_count")
+
+
+def repair_referral_counts():
+    """
+    Recomputes every referral_count from Profile.referred_by with one GROUP BY and
+    writes only the counts that differ. Returns the number of profiles corrected.
+    """
+    actual = dict(
+        Profile.objects.filter(referred_by__isnull=False)
+        .values("referred_by")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("referred_by", "n")
+    )
+    stored = dict(
+        Profile.objects.filter(referral_count__gt=0).values_list("user_id", "referral_count")
+    )
+    wrong = {
+        user_id: actual.get(user_id, 0)
+        for user_id in actual.keys() | stored.keys()
+        if actual.get(user_id, 0) != stored.get(user_id, 0)
+    }
+
+    items = list(wrong.items())
+    with transaction.atomic():
+        for start in range(0, len(items), REPAIR_BATCH_SIZE):
+            batch = items[start:start + REPAIR_BATCH_SIZE]
+            Profile.objects.filter(user_id__in=[user_id for user_id, _ in batch]).update(
+                referral_count=Case(
+                    *[When(user_id=user_id, then=Value(n)) for user_id, n in batch],
+                    output_field=IntegerField(),
+                )
+            )
+            for user_id, _ in batch:
+                bump_generation(user_id)
+    if wrong:
+        logger.warning(f"[Referrals] Repaired referral_count on {len(wrong)} profiles")
+    return len(wrong)
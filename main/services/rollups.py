@@ -0,0 +1,93 @@
+from collections import defaultdict
+from datetime import timedelta
+from itertools import takewhile
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Value, When
+from django.utils import timezone
+from main.models import DailyPointDelta, LedgerCursor, PointEvent
+from main.services import rank, seasons
+import logging
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "point_rollups"
+ROLLUP_DUE_KEY = "points:rollup_due"
+BATCH_SIZE = 5000
+
+
+def schedule_rollup():
+    """After the current transaction, rolls the ledger up if no worker did for POINTS_ROLLUP_INTERVAL."""
+    transaction.on_commit(_roll_up_if_due)
+
+
+def _roll_up_if_due():
+    if not cache.add(ROLLUP_DUE_KEY, True, timeout=settings.POINTS_ROLLUP_INTERVAL):
+        return
+    try:
+        # One batch at most: a backlog is caught up by roll_up_points --loop, not by a user request
+        roll_up_points(max_batches=1)
+    except Exception as exc:
+        # The events stay in the ledger for the next roll-up; never fail the request
+        logger.warning(f"[Rollups] Roll-up failed: {exc}")
+
+
+def roll_up_points(lag=None, batch_size=BATCH_SIZE, max_batches=None):
+    """
+    Applies the ledger events written since the last roll-up to the per-day
+    DailyPointDelta rows, the active season's SeasonScore rows and the rank histogram,
+    batch_size events per transaction, with one batched write per table. The cursor
+    advances in the same transaction, so every event is rolled up exactly once.
+
+    Events younger than `lag` seconds (POINTS_ROLLUP_LAG) wait for the next run: an
+    award transaction still open could yet commit an event with a lower id. Stops
+    after max_batches batches if given, caught up or not.
+    Returns the number of events rolled up.
+    """
+    lag = settings.POINTS_ROLLUP_LAG if lag is None else lag
+    settled = timezone.now() - timedelta(seconds=lag)
+    rolled = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            cursor = LedgerCursor.objects.select_for_update().get_or_create(name=CURSOR_NAME)[0]
+            events = (
+                PointEvent.objects.filter(id__gt=cursor.last_event_id).order_by("id")
+                .values_list("id", "user_id", "amount", "balance_after", "created_at")[:batch_size]
+            )
+            events = list(takewhile(lambda event: event[4] <= settled, events))
+            if not events:
+                return rolled
+            _roll_up(events)
+            cursor.last_event_id = events[-1][0]
+            cursor.save(update_fields=["last_event_id", "updated_at"])
+        rolled += len(events)
+        batches += 1
+        if len(events) < batch_size:
+            break
+    return rolled
+
+
+def _roll_up(events):
+    days = defaultdict(lambda: defaultdict(int))
+    old_balance, new_balance = {}, {}
+    for _, user_id, amount, balance_after, created_at in events:
+        days[created_at.date()][user_id] += amount
+        old_balance.setdefault(user_id, balance_after - amount)
+        new_balance[user_id] = balance_after
+
+    rank.record_score_changes((old_balance[user_id], balance) for user_id, balance in new_balance.items())
+    for day, totals in days.items():
+        add_daily_deltas(day, totals)
+    seasons.add_season_points((user_id, amount, created_at) for _, user_id, amount, _, created_at in events)
+
+
+def add_daily_deltas(day, totals):
+    """Adds {user_id: amount} to the users' DailyPointDelta rows for `day`: one INSERT and one UPDATE."""
+    DailyPointDelta.objects.bulk_create(
+        [DailyPointDelta(user_id=user_id, day=day) for user_id in totals], ignore_conflicts=True,
+    )
+    DailyPointDelta.objects.filter(day=day, user_id__in=totals).update(points=F("points") + Case(
+        *[When(user_id=user_id, then=Value(amount)) for user_id, amount in totals.items()],
+        default=Value(0), output_field=BigIntegerField(),
+    ))
@@ -0,0 +1,230 @@
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Value, When, Window
+from django.db.models.functions import DenseRank
+from django.utils import timezone
+from main.models import Season, SeasonScore, SeasonStanding
+from main.services.sybil import without_flagged
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_KEY = "season:active"
+BOARD_KEY = "season:{}:board"
+NO_SEASON = 0  # cached in place of None, so "no active season" is a cache hit too
+FREEZE_BATCH_SIZE = 5000
+
+
+def active_season_id():
+    """
+    Id of the active season, or None. Cached; start_season and close_season invalidate
+    it, which reaches other workers only through a shared cache, so writers still check
+    the season's status themselves.
+    """
+    season_id = cache.get(ACTIVE_KEY)
+    if season_id is None:
+        season_id = Season.objects.filter(status=Season.Status.ACTIVE).values_list("id", flat=True).first() or NO_SEASON
+        cache.set(ACTIVE_KEY, season_id, timeout=settings.SEASON_CACHE_TTL)
+    return season_id or None
+
+
+def _forget_active():
+    transaction.on_commit(lambda: cache.delete(ACTIVE_KEY))
+
+
+def _still_active(season_id):
+    """The season, if it is still active, as a subquery: writes go through it so a stale cached id writes nothing."""
+    return Season.objects.filter(pk=season_id, status=Season.Status.ACTIVE).values("pk")
+
+
+def add_season_points(events):
+    """
+    Rolls awards, as (user_id, amount, created_at) triples, into the active season's
+    SeasonScore rows: one INSERT and one UPDATE. Awards made before the season started
+    count toward no season. No query at all while no season is active.
+    """
+    season_id = active_season_id()
+    if season_id is None:
+        return
+    season = Season.objects.filter(pk=season_id, status=Season.Status.ACTIVE).values("starts_at").first()
+    if season is None:
+        cache.delete(ACTIVE_KEY)
+        return
+    totals = defaultdict(int)
+    for user_id, amount, created_at in events:
+        if created_at >= season["starts_at"]:
+            totals[user_id] += amount
+    if not totals:
+        return
+    SeasonScore.objects.bulk_create(
+        [SeasonScore(season_id=season_id, user_id=user_id) for user_id in totals], ignore_conflicts=True,
+    )
+    SeasonScore.objects.filter(season_id__in=_still_active(season_id), user_id__in=totals).update(points=F("points") + Case(
+        *[When(user_id=user_id, then=Value(amount)) for user_id, amount in totals.items()],
+        default=Value(0), output_field=BigIntegerField(),
+    ))
+
+
+def resolve_season(value):
+    """The Season for "current" (the active one) or an id; None if there is no such season."""
+    if value == "current":
+        season_id = active_season_id()
+    else:
+        try:
+            season_id = int(value)
+        except ValueError:
+            return None
+    if season_id is None:
+        return None
+    return Season.objects.filter(pk=season_id).first()
+
+
+def _board_scores(season):
+    """The season's SeasonScore rows of current, unflagged pass holders: one range of seasonscore_board_idx."""
+    return without_flagged(SeasonScore.objects.filter(
+        season=season, user__profile__has_pass=True, user__profile__current_pass__isnull=False,
+    ))
+
+
+def _season_payload(season):
+    return {
+        "id": season.id,
+        "name": season.name,
+        "status": season.status,
+        "starts_at": season.starts_at,
+        "ends_at": season.ends_at,
+    }
+
+
+def get_season_board(season):
+    """
+    Top LEADERBOARD_SIZE of a season. An active season is ranked from its own
+    SeasonScore rows and cached briefly; a closed one is read from its frozen
+    standings and cached until evicted.
+    """
+    key = BOARD_KEY.format(season.id)
+    board = cache.get(key)
+    if board is not None:
+        return board
+
+    if season.status == Season.Status.CLOSED:
+        rows = SeasonStanding.objects.filter(season=season).order_by("rank", "user_id")
+        timeout = None
+    else:
+        rows = _board_scores(season).annotate(
+            rank=Window(DenseRank(), order_by=[F("points").desc()]),
+        ).order_by("-points", "user_id")
+        timeout = settings.SEASON_LEADERBOARD_CACHE_TTL
+    rows = rows.values(
+        "points", "rank",
+        wallet=F("user__wallet_address"), names=F("user__profile__names"), avatar_url=F("user__profile__avatar_url"),
+    )[:settings.LEADERBOARD_SIZE]
+    board = {**_season_payload(season), "results": list(rows)}
+    cache.set(key, board, timeout=timeout)
+    return board
+
+
+def get_season_standing(season, user_id):
+    """
+    A user's points and rank in a season, or None if they are not ranked in it.
+    In the active season the (dense) rank is one count of the distinct point totals
+    above the user's.
+    """
+    if season.status == Season.Status.CLOSED:
+        standing = SeasonStanding.objects.filter(season=season, user_id=user_id).values("points", "rank").first()
+    else:
+        points = _board_scores(season).filter(user_id=user_id).values_list("points", flat=True).first()
+        standing = points is not None and {
+            "points": points,
+            "rank": _distinct_points(_board_scores(season).filter(points__gt=points)) + 1,
+        }
+    return {**_season_payload(season), **standing} if standing else None
+
+
+def _distinct_points(scores):
+    return scores.order_by().values("points").distinct().count()
+
+
+def board_rows(season):
+    """The season's top rows in the /leaderboard row shape, season points in scored_point."""
+    return [
+        {"wallet": row["wallet"], "names": row["names"], "scored_point": row["points"], "rank": row["rank"],
+         "avatar_url": row["avatar_url"]}
+        for row in get_season_board(season)["results"]
+    ]
+
+
+def season_stats(season, user_id):
+    """The profile/stats fields scoped to a season: the user's season points and rank, and the season's top score."""
+    standing = get_season_standing(season, user_id)
+    results = get_season_board(season)["results"]
+    if standing is None:
+        # Not on the board yet: behind everyone who has season points
+        standing = {"points": 0, "rank": _distinct_points(_board_scores(season).filter(points__gt=0)) + 1}
+    return {
+        "season_id": season.id,
+        "season_point": standing["points"],
+        "rank": standing["rank"],
+        "highest_point": results[0]["points"] if results else 0,
+    }
+
+
+def list_seasons():
+    return [_season_payload(season) for season in Season.objects.order_by("-starts_at", "-id")]
+
+
+class SeasonError(Exception):
+    pass
+
+
+def start_season(name):
+    """Opens a new season. Only one season can be active at a time."""
+    with transaction.atomic():
+        if Season.objects.select_for_update().filter(status=Season.Status.ACTIVE).exists():
+            raise SeasonError("Another season is still active; close it first")
+        season = Season.objects.create(name=name)
+        _forget_active()
+    logger.info(f"[Seasons] Started season {season.id} ({name})")
+    return season
+
+
+def close_season():
+    """
+    Freezes the active season: each pass holder's points and rank are copied into
+    SeasonStanding, the season's SeasonScore rows are deleted and the season is marked
+    closed. Awards made from here on count toward no season until the next one starts.
+    Every award made before the call is counted: it waits POINTS_ROLLUP_LAG seconds,
+    until those awards have settled, and rolls the ledger up with the usual lag.
+    Returns the closed season.
+    """
+    from main.services.rollups import roll_up_points  # rollups imports this module
+
+    time.sleep(settings.POINTS_ROLLUP_LAG)
+    roll_up_points()
+    with transaction.atomic():
+        season = Season.objects.select_for_update().filter(status=Season.Status.ACTIVE).first()
+        if season is None:
+            raise SeasonError("No season is active")
+        # Mark it closed first: awards blocked on our lock see no active season afterwards
+        season.status = Season.Status.CLOSED
+        season.ends_at = timezone.now()
+        season.save(update_fields=["status", "ends_at"])
+
+        ranked = _board_scores(season).annotate(
+            rank=Window(DenseRank(), order_by=[F("points").desc()]),
+        ).values_list("user_id", "points", "rank")
+        batch, frozen = [], 0
+        for user_id, points, rank in ranked.iterator(chunk_size=FREEZE_BATCH_SIZE):
+            batch.append(SeasonStanding(season=season, user_id=user_id, points=points, rank=rank))
+            if len(batch) >= FREEZE_BATCH_SIZE:
+                frozen += len(SeasonStanding.objects.bulk_create(batch))
+                batch = []
+        frozen += len(SeasonStanding.objects.bulk_create(batch))
+        SeasonScore.objects.filter(season=season).delete()
+        _forget_active()
+        transaction.on_commit(lambda: cache.delete(BOARD_KEY.format(season.id)))
+    logger.info(f"[Seasons] Closed season {season.id} ({season.name}) with {frozen} standings")
+    return season
@@ -0,0 +1,85 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from eth_account import Account
+from eth_account.messages import encode_defunct
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SignatureQueueFull(Exception):
+    """Raised when the recovery pool already has its maximum number of pending jobs."""
+
+
+class SignaturePoolBroken(Exception):
+    """Raised when a recovery process died; the pool is replaced for the next caller."""
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def recover_signer(message, signature):
+    """
+    Recovers the address that signed an EIP-191 personal message.
+    Uses the module-level Account API, so no Web3 instance is built per call.
+    """
+    return Account.recover_message(encode_defunct(text=message), signature=signature)
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = settings.SIGNATURE_RECOVERY_WORKERS
+                _slots = threading.BoundedSemaphore(settings.SIGNATURE_RECOVERY_QUEUE_SIZE)
+                # spawn, not fork: the parent is a threaded web worker holding DB connections.
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"[Signature] Started recovery pool with {workers} processes")
+    return _executor
+
+
+def _replace_executor(broken):
+    """Drops a broken pool so the next _get_executor starts a fresh one; other threads may have replaced it already."""
+    global _executor
+    with _lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    logger.warning("[Signature] Recovery pool broke; starting a new one")
+
+
+def recover_signer_offloaded(message, signature):
+    """
+    Runs recover_signer on the shared process pool when SIGNATURE_RECOVERY_WORKERS > 0,
+    otherwise inline. At most SIGNATURE_RECOVERY_QUEUE_SIZE recoveries may be queued or
+    running at once; callers beyond that wait up to SIGNATURE_RECOVERY_QUEUE_TIMEOUT
+    seconds and then get SignatureQueueFull, so a login storm sheds load instead of
+    piling up blocked web workers. If a pool process dies the pool is replaced and this
+    call raises SignaturePoolBroken.
+    """
+    if settings.SIGNATURE_RECOVERY_WORKERS <= 0:
+        return recover_signer(message, signature)
+
+    executor = _get_executor()
+    if not _slots.acquire(timeout=settings.SIGNATURE_RECOVERY_QUEUE_TIMEOUT):
+        raise SignatureQueueFull()
+    try:
+        return executor.submit(recover_signer, message, signature).result()
+    except BrokenProcessPool:
+        _replace_executor(executor)
+        raise SignaturePoolBroken()
+    finally:
+        _slots.release()
+
+
+def verify_wallet_signature(wallet_address, message, signature):
+    recovered_address = recover_signer_offloaded(message, signature)
+    return recovered_address.lower() == wallet_address.lower()
@@ -0,0 +1,12 @@
+from django.conf import settings
+from main.models import SybilScore
+
+
+def flagged_user_ids():
+    """Subquery of the users scored at or above SYBIL_SCORE_THRESHOLD, for exclude(user_id__in=...)."""
+    return SybilScore.objects.filter(score__gte=settings.SYBIL_SCORE_THRESHOLD).values("user_id")
+
+
+def without_flagged(queryset):
+    """queryset (of a model with a user_id column) minus the flagged users: one NOT IN on sybilscore_score_idx."""
+    return queryset.exclude(user_id__in=flagged_user_ids())
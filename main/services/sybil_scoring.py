@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q
+import numpy as np
+from main.models import DigiPass, PassTransaction, Profile, SybilScore, UserTaskCompletion
+from main.services.leaderboard import invalidate_leaderboard
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+WRITE_BATCH_SIZE = 2000
+BURST_WINDOW = 10 * 60  # seconds between sibling mints or task completions that count as a burst
+STAR_SIZE = 20  # referees under one referrer for the full star weight
+MINT_BURST_SIZE = 5  # siblings minting in the same window for the full mint weight
+STAR_WEIGHT = 0.3
+MINT_WEIGHT = 0.3
+TASK_WEIGHT = 0.25
+CHEAPEST_WEIGHT = 0.15
+
+
+def score_new_users(rescore_all=False, batch_size=BATCH_SIZE):
+    """
+    Scores every user without a SybilScore or with a verified mint or completed task
+    since they were scored (every user with rescore_all), batch_size at a time. Each
+    batch also rescores the batch's referrers and the other referees of both, since a
+    new referee changes its referrer's and its siblings' star and burst features.
+    Returns (users scored, users flagged among them).
+    """
+    if rescore_all:
+        new_ids = list(Profile.objects.order_by().values_list("user_id", flat=True).iterator(chunk_size=batch_size))
+    else:
+        new_ids = _stale_user_ids()
+    cheapest = DigiPass.objects.aggregate(price=Min("usd_price"))["price"]
+    scored = flagged = 0
+    for start in range(0, len(new_ids), batch_size):
+        batch_scored, batch_flagged = _score_batch(new_ids[start:start + batch_size], cheapest)
+        scored += batch_scored
+        flagged += batch_flagged
+    logger.info(f"[Sybil] Scored {scored} users ({len(new_ids)} new), {flagged} flagged")
+    return scored, flagged
+
+
+def _stale_user_ids():
+    """Users without a score, or with a verified mint or completed task newer than their score."""
+    unscored = Profile.objects.filter(user__sybil_score__isnull=True).values_list("user_id", flat=True)
+    minted = (PassTransaction.objects.filter(is_verified=True, created_at__gt=F("user__sybil_score__scored_at"))
+              .values_list("user_id", flat=True))
+    completed = (UserTaskCompletion.objects.filter(status=UserTaskCompletion.Status.COMPLETED,
+                                                   completed_at__gt=F("user__sybil_score__scored_at"))
+                 .values_list("user_id", flat=True))
+    return list(unscored.union(minted, completed))
+
+
+def _score_batch(new_ids, cheapest):
+    hubs = list(Profile.objects.filter(user_id__in=new_ids, referred_by__isnull=False)
+                .values_list("referred_by", flat=True).distinct())
+    scored = {*new_ids, *hubs}
+    referrers = Profile.objects.filter(user_id__in=scored, referred_by__isnull=False).values("referred_by")
+    members = Q(user_id__in=scored) | Q(user__profile__referred_by__in=referrers)
+
+    users = list(Profile.objects.filter(Q(user_id__in=scored) | Q(referred_by__in=referrers))
+                 .values_list("user_id", "referred_by_id", "referral_count"))
+    index = {user_id: i for i, (user_id, _, _) in enumerate(users)}
+    groups = {}
+    group = np.array([groups.setdefault(referrer, len(groups)) if referrer else -1 for _, referrer, _ in users],
+                     dtype=np.int64)
+    referees = np.array([count for _, _, count in users], dtype=np.int64)
+
+    mints = _events(
+        PassTransaction.objects.filter(members, is_verified=True).order_by("created_at")
+        .values_list("user_id", "digipass__usd_price", "created_at"), index, object,
+    )
+    completions = _events(
+        UserTaskCompletion.objects.filter(members, status=UserTaskCompletion.Status.COMPLETED, completed_at__isnull=False)
+        .values_list("user_id", "task_id", "completed_at"), index, np.int64,
+    )
+    features = compute_features(group, referees, mints, completions, cheapest)
+    return _write(users, features)
+
+
+def _events(rows, index, value_dtype):
+    """(user index, value, epoch seconds) arrays for rows of (user_id, value, datetime)."""
+    rows = [(index[user_id], value, at.timestamp()) for user_id, value, at in rows]
+    user, value, at = zip(*rows) if rows else ((), (), ())
+    return np.array(user, dtype=np.int64), np.array(value, dtype=value_dtype), np.array(at, dtype=np.float64)
+
+
+def _neighbours(keys, times, window=BURST_WINDOW):
+    """For each event, the other events with the same key less than `window` seconds away."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((times, keys))
+    start = times.min()
+    # One sorted float axis: key-major, then time; the span keeps keys `window` apart
+    span = times.max() - start + 2 * window + 1
+    axis = keys[order] * span + (times[order] - start)
+    counts = (np.searchsorted(axis, axis + window, side="left")
+              - np.searchsorted(axis, axis - window, side="right"))
+    result = np.empty(len(keys), dtype=np.int64)
+    result[order] = counts - 1
+    return result
+
+
+def compute_features(group, referees, mints, completions, cheapest):
+    """
+    Per-user features and score, as arrays aligned with `group` (each user's referrer
+    number, -1 for none) and `referees` (each user's referral_count). mints and
+    completions are _events arrays; mints oldest first.
+    """
+    count = len(group)
+    referred = group >= 0
+    # A referee's star is its referrer's referees; a referrer's is its own, the hub of the star
+    star = referees.copy()
+    if referred.any():
+        star[referred] = np.maximum(star[referred], np.bincount(group[referred])[group[referred]])
+
+    mint_user, mint_price, mint_at = mints
+    first_user, first = np.unique(mint_user, return_index=True)  # mints are oldest first
+    cheapest_pass = np.zeros(count, dtype=bool)
+    cheapest_pass[first_user] = mint_price[first] == cheapest
+    mint_burst = np.zeros(count, dtype=np.int64)
+    burst_users = first_user[group[first_user] >= 0]
+    mint_burst[burst_users] = _neighbours(group[burst_users], mint_at[first][group[first_user] >= 0])
+
+    task_user, task_id, task_at = completions
+    sibling_task = group[task_user] >= 0
+    task_burst = np.zeros(count, dtype=np.float64)
+    if sibling_task.any():
+        # One integer per (referrer, task) pair
+        pair_key = group[task_user[sibling_task]] * (task_id.max() + 1) + task_id[sibling_task]
+        hits = _neighbours(pair_key, task_at[sibling_task]) > 0
+        task_burst = (np.bincount(task_user[sibling_task], weights=hits, minlength=count)
+                      / np.maximum(np.bincount(task_user, minlength=count), 1))
+
+    score = (
+        STAR_WEIGHT * np.clip((star - 1) / (STAR_SIZE - 1), 0, 1)
+        + MINT_WEIGHT * np.minimum(mint_burst / MINT_BURST_SIZE, 1)
+        + TASK_WEIGHT * task_burst
+        + CHEAPEST_WEIGHT * cheapest_pass
+    )
+    return {"score": score, "star_size": star, "mint_burst": mint_burst, "task_burst": task_burst,
+            "cheapest_pass": cheapest_pass}
+
+
+def _write(users, features):
+    """Upserts the scores; the leaderboard is invalidated if anyone's flag changed."""
+    threshold = settings.SYBIL_SCORE_THRESHOLD
+    user_ids = [user_id for user_id, _, _ in users]
+    columns = {name: values.tolist() for name, values in features.items()}
+    scores = [
+        SybilScore(user_id=user_id, **{name: values[i] for name, values in columns.items()})
+        for i, user_id in enumerate(user_ids)
+    ]
+    flagged = {user_id for user_id, score in zip(user_ids, columns["score"]) if score >= threshold}
+    with transaction.atomic():
+        was_flagged = set(SybilScore.objects.filter(user_id__in=user_ids, score__gte=threshold)
+                          .values_list("user_id", flat=True))
+        SybilScore.objects.bulk_create(
+            scores, batch_size=WRITE_BATCH_SIZE, update_conflicts=True, unique_fields=["user"],
+            update_fields=[*columns, "scored_at"],
+        )
+        if flagged != was_flagged:
+            invalidate_leaderboard()
+    return len(scores), len(flagged)
@@ -0,0 +1,111 @@
+from datetime import date
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from main.models import DigiUser, Profile, ProfileScore
+from main.services import counters
+from main.services.activity import record_activity
+from main.services.points import Reason, credit_points
+from main.services.referrals import add_referrals
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASE_LOGIN_POINTS = 10
+CREATE_ATTEMPTS = 3  # a new referral code per attempt; only a referral code collision is retried
+
+
+def login_wallet(wallet_address, referral_code=None):
+    """
+    Finds or creates the user for a verified wallet and awards the daily login points.
+
+    Runs a fixed number of statements in one transaction:
+      - returning user: 1 SELECT (user + profile + score + pass) and the points credit
+      - new user: the SELECT, the referrer lookup, the user, profile and score INSERTs and the credit
+
+    The user, profile and score rows are bulk-inserted so the post_save profile signals
+    (which would re-save the profile and query for the profile-completion task) never fire.
+    Returns (user, created).
+    """
+    wallet_address = DigiUser.objects.normalize_wallet_address(wallet_address)
+    with transaction.atomic():
+        user = (
+            DigiUser.objects.select_related("profile__current_pass", "profile__score")
+            .filter(wallet_address=wallet_address)
+            .first()
+        )
+        created = False
+        if user is None:
+            user, created = _create_wallet_user(wallet_address, referral_code)
+
+        _award_daily_login_points(user.profile)
+    if not created:
+        record_activity(user.pk)
+    return user, created
+
+
+def _create_wallet_user(wallet_address, referral_code):
+    referrer_id = None
+    if referral_code:
+        referrer_id = (
+            Profile.objects.filter(referral_code=referral_code)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+    for attempt in range(1, CREATE_ATTEMPTS + 1):
+        user = DigiUser(wallet_address=wallet_address)
+        user.set_unusable_password()
+        profile = Profile(
+            user=user,
+            referral_code=Profile.generate_referral_code(),
+            referred_by_id=referrer_id,
+        )
+        try:
+            with transaction.atomic():
+                DigiUser.objects.bulk_create([user])
+                Profile.objects.bulk_create([profile])
+                ProfileScore.objects.bulk_create([ProfileScore(profile=profile)])
+                counters.increment(counters.USERS)
+                add_referrals([referrer_id])
+        except IntegrityError:
+            # Another request created this wallet between our SELECT and INSERT
+            existing = (
+                DigiUser.objects.select_related("profile__current_pass", "profile__score")
+                .filter(wallet_address=wallet_address)
+                .first()
+            )
+            if existing is not None:
+                return existing, False
+            # Otherwise the new referral code was taken: try another one
+            if attempt == CREATE_ATTEMPTS:
+                raise
+            logger.warning(f"[Login] Referral code collision creating {wallet_address}; retrying")
+            continue
+        user.profile = profile
+        return user, True
+
+
+def _award_daily_login_points(profile):
+    """
+    Awards the daily login points at most once per day. The UPDATE is guarded on
+    ProfileScore.last_login_date, so concurrent logins on the same day cannot double-award.
+    """
+    today = date.today()
+    if profile.score.last_login_date == today:
+        return 0
+
+    multiplier = getattr(profile.current_pass, "point_power", 1)
+    points = BASE_LOGIN_POINTS * multiplier
+    new_balance = credit_points(
+        profile.user_id,
+        points,
+        Reason.DAILY_LOGIN,
+        only_if=Q(last_login_date__isnull=True) | Q(last_login_date__lt=today),
+        also_set={"last_login_date": today},
+    )
+    if new_balance is None:
+        return 0
+
+    profile.score.scored_point = new_balance
+    profile.score.last_login_date = today
+    return points
@@ -0,0 +1,12 @@
+import django
+from django.conf import settings
+
+
+def setup_worker(database_name):
+    """
+    Process pool initializer: sets Django up in a spawned worker, on the database the
+    parent uses (the parent's may differ from settings, e.g. the test database).
+    Imports no models, so it can be unpickled before Django is set up.
+    """
+    settings.DATABASES["default"]["NAME"] = database_name
+    django.setup()
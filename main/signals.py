@@ -1,18 +1,31 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
 from django.dispatch import receiver
-from .models import Profile, DigiUser, Task, UserTaskCompletion
+from .authentication import forget_claims_version
+from .models import Profile, ProfileScore, DigiUser, Task, UserTaskCompletion
+from .services import counters
+from .services.profile_cache import bump_generation
+from .services.points import Reason, credit_points
 
 @receiver(post_save, sender=DigiUser)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+        counters.increment(counters.USERS)
+    elif kwargs.get("update_fields") is None or "is_active" in kwargs["update_fields"]:
+        # is_active may have changed: tokens are checked against the cached claims_version
+        forget_claims_version(instance.pk)
 
-@receiver(post_save, sender=DigiUser)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+@receiver(post_delete, sender=DigiUser)
+def revoke_deleted_user(sender, instance, **kwargs):
+    forget_claims_version(instance.pk)
 
+@receiver(post_save, sender=Profile)
+def create_profile_score(sender, instance, created, **kwargs):
+    # Every profile saved into existence (signup, admin) gets its score row before any award
+    if created:
+        ProfileScore.objects.create(profile=instance)
 
 @receiver(post_save, sender=Profile)
 def check_profile_completion(sender, instance, **kwargs):
@@ -22,5 +35,9 @@ def check_profile_completion(sender, instance, **kwargs):
         if task and not UserTaskCompletion.objects.filter(user=instance.user, task=task).exists():
             completion = UserTaskCompletion(user=instance.user, task=task, awarded_points=task.points)
             completion.save()
-            instance.scored_point += task.points
-            instance.save()
\ No newline at end of file
+            credit_points(instance.user_id, task.points, Reason.TASK, reference=task.id)
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    # Covers every save() (profile edits, pass changes, admin); update() paths bump explicitly
+    bump_generation(instance.user_id)
@@ -1,3 +1,1328 @@
-from django.test import TestCase
+import base64
+import csv
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F, Q, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .authentication import CLAIMS_VERSION_KEY, ProfileClaimsRefreshToken, invalidate_pass_claims
+from .models import (DailyPointDelta, DigiPass, DigiUser, LedgerCursor, LoginNonce, PassTransaction, PlatformCounter, PointEvent, Profile,
+                     ProfileScore, ScoreBucket, ScoreLevel, Season, SeasonScore, SeasonStanding, SybilScore, Task,
+                     UserTaskCompletion)
+from .serializers import UpdateProfileSerializer
+from .services import activity, signature
+from .services.activity import flush_activity, get_last_seen
+from .services.dashboard import build_sections
+from .services import counters
+from .services.login_nonce import issue_nonce, verify_nonce, consume_nonce
+from .services.events import SEQ_KEY
+from .services.leaderboard import CURSOR_SALT, get_snapshot, top_rows
+from .services.live import Broadcaster, Subscription, redeem_ticket
+from .services import locks
+from .services import points as points_service
+from .services.points import (FLUSH_DUE_KEY, FLUSH_LOCK_KEY, FLUSHED_SEQ_KEY, PENDING_SEQ_KEY, PENDING_TOTAL_KEY, Reason,
+                              award_points, award_points_many, credit_points, flush_pending_points)
+from .services.referrals import add_referrals
+from .services.rollups import roll_up_points
+from .services.wallet_login import login_wallet
+from .services.points_audit import user_id_ranges
+from .services.rank import get_rank, rebuild_histogram
+from .services import seasons
+from .services.seasons import close_season, start_season
+from .throttling import RateLimiter, parse_rate
+from .utils import award_referral_points
+from .views import UserProfileView
+
+
+def signed_login_payload(account, **extra):
+    nonce = issue_nonce()
+    message = encode_defunct(text=f"Login to Digidrop: {nonce}")
+    signature = account.sign_message(message).signature.hex()
+    return {"walletAddress": account.address, "signature": signature, "nonce": nonce, **extra}
+
+
+class LoginNonceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_nonce_request_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            resp = APIClient().get(reverse("wallet-login"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(verify_nonce(resp.data["nonce"]))
+
+    def test_nonce_can_only_be_consumed_once(self):
+        nonce = issue_nonce()
+        self.assertTrue(consume_nonce(nonce))
+        self.assertFalse(consume_nonce(nonce))
+
+    def test_tampered_nonce_is_rejected(self):
+        random_part, issued_at, mac = issue_nonce().split(".")
+        self.assertFalse(verify_nonce(f"{random_part}.{int(issued_at) + 600}.{mac}"))
+
+    def test_legacy_nonce_rows_still_work_until_purged(self):
+        LoginNonce.objects.create(nonce="legacynonce")
+        self.assertTrue(verify_nonce("legacynonce"))
+        self.assertTrue(consume_nonce("legacynonce"))
+        self.assertFalse(verify_nonce("legacynonce"))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=3600)
+# Migration 0014 seeds shard 0 of each counter, so with one shard every increment is one UPDATE
+@override_settings(PLATFORM_COUNTER_SHARDS=1)
+class WalletLoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.account = Account.create()
+
+    def login(self, **extra):
+        return self.client.post(reverse("wallet-login"), signed_login_payload(self.account, **extra), format="json")
+
+    def test_new_user_with_referral_runs_fixed_number_of_queries(self):
+        referrer = DigiUser.objects.create_user(Account.create().address)
+        code = referrer.profile.referral_code
+        ScoreBucket.objects.create(floor=10)
+
+        # SELECT user, SELECT referrer, SAVEPOINT, INSERT user, INSERT profile, INSERT score,
+        # UPDATE users counter, RELEASE, UPDATE ... RETURNING daily points, INSERT ledger event,
+        # UPDATE points counter, UPDATE referrer's referral_count, plus the outer SAVEPOINT/RELEASE
+        # of the test transaction. Buckets, deltas and seasons are rolled up after commit.
+        with self.assertNumQueries(14):
+            resp = self.login(referral=code)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.data["isNewUser"])
+        profile = Profile.objects.with_score().get(user__wallet_address=self.account.address.lower())
+        self.assertEqual(profile.referred_by, referrer)
+        self.assertEqual(Profile.objects.get(user=referrer).referral_count, 1)
+        self.assertEqual(profile.scored_point, 10)
+        self.assertEqual(profile.last_login_date, date.today())
+
+    def test_returning_user_runs_fixed_number_of_queries(self):
+        self.login()
+        ProfileScore.objects.update(last_login_date=date.today() - timedelta(days=1))
+        ScoreBucket.objects.create(floor=20)
+
+        # SAVEPOINT, SELECT user + profile + score + pass, UPDATE ... RETURNING daily points,
+        # INSERT ledger event, UPDATE points counter, RELEASE
+        with self.assertNumQueries(6):
+            resp = self.login()
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data["isNewUser"])
+        self.assertEqual(Profile.objects.with_score().get().scored_point, 20)
+
+    def test_wallet_is_stored_lowercase_and_matched_exactly(self):
+        DigiUser.objects.create_user(self.account.address.upper().replace("0X", "0x"))
+        resp = self.login()
+        self.assertFalse(resp.data["isNewUser"])
+        self.assertEqual(DigiUser.objects.get().wallet_address, self.account.address.lower())
+
+    def test_referral_code_collision_is_retried_with_a_new_code(self):
+        taken = DigiUser.objects.create_user(Account.create().address).profile.referral_code
+        codes = iter([taken, "FRESHCODE1"])
+        with mock.patch.object(Profile, "generate_referral_code", lambda: next(codes)):
+            user, created = login_wallet(self.account.address)
+
+        self.assertTrue(created)
+        self.assertEqual(Profile.objects.get(user=user).referral_code, "FRESHCODE1")
+
+    def test_repeated_collisions_are_raised_not_taken_for_an_existing_wallet(self):
+        taken = DigiUser.objects.create_user(Account.create().address).profile.referral_code
+        with mock.patch.object(Profile, "generate_referral_code", lambda: taken):
+            with self.assertRaises(IntegrityError):
+                login_wallet(self.account.address)
+        self.assertFalse(DigiUser.objects.filter(wallet_address=self.account.address.lower()).exists())
+
+    def test_daily_points_are_awarded_once_per_day(self):
+        self.login()
+        self.login()
+        self.assertEqual(Profile.objects.with_score().get().scored_point, 10)
+
+    def test_signature_from_another_wallet_is_rejected(self):
+        payload = signed_login_payload(Account.create(), walletAddress=self.account.address)
+        resp = self.client.post(reverse("wallet-login"), payload, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["error"], "Signature mismatch")
+
+    def test_replayed_nonce_is_rejected(self):
+        payload = signed_login_payload(self.account)
+        self.assertEqual(self.client.post(reverse("wallet-login"), payload, format="json").status_code, 200)
+        self.assertEqual(self.client.post(reverse("wallet-login"), payload, format="json").status_code, 400)
+
+    @override_settings(SIGNATURE_RECOVERY_WORKERS=1)
+    def test_broken_recovery_pool_is_replaced(self):
+        self.addCleanup(stop_signature_pool)
+        self.assertEqual(self.login().status_code, 200)
+        broken = signature._executor
+
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+        resp = self.login()
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "1")
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertIsNot(signature._executor, broken)
+
+
+def stop_signature_pool():
+    if signature._executor is not None:
+        signature._executor.shutdown(cancel_futures=True)
+        signature._executor = None
+
+
+def make_pass(point_power=2):
+    return DigiPass.objects.create(name="White", usd_price=5, pass_type="white", point_power=point_power, card="ntfpass/white.png")
+
+
+def make_user(digipass=None, points=0):
+    user = DigiUser.objects.create_user(Account.create().address)
+    Profile.objects.filter(user=user).update(has_pass=digipass is not None, current_pass=digipass)
+    ProfileScore.objects.filter(profile_id=user.pk).update(scored_point=points)
+    return DigiUser.objects.select_related("profile__current_pass").get(pk=user.pk)
+
+
+def auth_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {ProfileClaimsRefreshToken.for_user(user).access_token}")
+    return client
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=3600)
+class PassClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.digipass = make_pass(point_power=4)
+        self.user = make_user(self.digipass)
+
+    def test_pass_gated_request_skips_user_and_profile_loads(self):
+        client = auth_client(self.user)
+        client.get(reverse("leaderboard"))  # warm the claims_version cache and the snapshot
+
+        # No user or profile load for auth, and the board itself comes from the snapshot
+        with self.assertNumQueries(0):
+            resp = client.get(reverse("leaderboard"))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_task_completion_uses_claimed_point_power(self):
+        task = Task.objects.create(title="Follow", description="x", points=10, task_type="off_site")
+        UserTaskCompletion.objects.create(user=self.user, task=task, status=UserTaskCompletion.Status.STARTED)
+
+        resp = auth_client(self.user).post(reverse("task-completion", args=[task.id]))
+
+        self.assertEqual(resp.data["points_awarded"], 40)
+        self.assertEqual(Profile.objects.with_score().get(user=self.user).scored_point, 40)
+
+    def test_version_bump_invalidates_claims(self):
+        client = auth_client(make_user())
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 403)
+
+        passless = DigiUser.objects.exclude(pk=self.user.pk).get()
+        Profile.objects.filter(user=passless).update(has_pass=True, current_pass=self.digipass)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_pass_claims(passless.pk)
+
+        # Stale has_pass=False claim is ignored and the profile is read instead
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 200)
+
+    def test_deactivated_or_deleted_user_is_rejected(self):
+        client = auth_client(self.user)
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 200)  # claims_version now cached
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = DigiUser.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 401)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = True
+            user.save()
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertEqual(client.get(reverse("leaderboard")).status_code, 401)
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=3600)
+class ActivityTrackingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        flush_activity()
+
+    def test_requests_are_coalesced_and_flushed_in_bulk(self):
+        users = [make_user(make_pass()) for _ in range(3)]
+        DigiUser.objects.update(last_connected_at=timezone.now() - timedelta(days=30))
+        for user in users:
+            client = auth_client(user)
+            client.get(reverse("leaderboard"))
+            client.get(reverse("leaderboard"))
+            self.assertIsNotNone(get_last_seen(user.pk))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_activity(), 3)
+        self.assertFalse(DigiUser.objects.filter(last_connected_at__lt=timezone.now() - timedelta(days=1)).exists())
+
+    def test_queued_times_are_shared_and_flushed_by_the_command(self):
+        user = make_user(make_pass())
+        DigiUser.objects.filter(pk=user.pk).update(last_connected_at=timezone.now() - timedelta(days=30))
+        auth_client(user).get(reverse("leaderboard"))
+        self.assertEqual(cache.get(activity.SEQ_KEY), 1)  # queued in the cache, not in this process
+
+        out = io.StringIO()
+        call_command("flush_activity", stdout=out)
+        self.assertIn("Wrote 1 last-seen times", out.getvalue())
+        self.assertTrue(DigiUser.objects.filter(pk=user.pk, last_connected_at__gt=timezone.now() - timedelta(days=1)).exists())
+        self.assertEqual(flush_activity(), 0)
+
+    def test_saving_a_user_does_not_rewrite_the_profile(self):
+        user = make_user()
+        with self.assertNumQueries(1):
+            user.save()
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("30/m"), (30, 60))
+        self.assertEqual(parse_rate("1/7d"), (1, 7 * 24 * 60 * 60))
+
+    def test_limiter_rejects_over_limit_with_retry_after(self):
+        limiter = RateLimiter("test", "3/h")
+        self.assertEqual([limiter.hit("1.2.3.4") for _ in range(3)], [0, 0, 0])
+        self.assertGreater(limiter.hit("1.2.3.4"), 0)
+        self.assertEqual(limiter.hit("5.6.7.8"), 0)
+
+    def test_nonce_endpoint_returns_429_with_retry_after(self):
+        rates = {"login.nonce": "2/m", "login.ip": "30/m", "login.wallet": "10/m"}
+        client = APIClient()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.assertEqual(client.get(reverse("wallet-login")).status_code, 200)
+            self.assertEqual(client.get(reverse("wallet-login")).status_code, 200)
+            resp = client.get(reverse("wallet-login"))
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreater(int(resp["Retry-After"]), 0)
+
+    def test_nonce_requests_do_not_count_as_login_attempts(self):
+        rates = {"login.nonce": "10/m", "login.ip": "1/m", "login.wallet": "10/m"}
+        account = Account.create()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.assertEqual(APIClient().get(reverse("wallet-login")).status_code, 200)
+            resp = APIClient().post(reverse("wallet-login"), signed_login_payload(account), format="json")
+            self.assertEqual(resp.status_code, 200)
+            resp = APIClient().post(reverse("wallet-login"), signed_login_payload(account), format="json")
+        self.assertEqual(resp.status_code, 429)
+
+    def test_login_is_limited_per_wallet_before_touching_the_database(self):
+        rates = {"login.ip": "100/m", "login.wallet": "1/m"}
+        account = Account.create()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            APIClient().post(reverse("wallet-login"), signed_login_payload(account), format="json")
+            with self.assertNumQueries(0):
+                resp = APIClient().post(reverse("wallet-login"), signed_login_payload(account), format="json")
+        self.assertEqual(resp.status_code, 429)
+
+    def test_unsigned_attempts_from_another_ip_do_not_lock_a_wallet_out(self):
+        rates = {"login.ip": "100/m", "login.wallet": "1/m"}
+        account = Account.create()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            for _ in range(3):
+                APIClient(REMOTE_ADDR="10.0.0.9").post(
+                    reverse("wallet-login"), {"walletAddress": account.address, "signature": "0x00", "nonce": "x"},
+                    format="json",
+                )
+            resp = APIClient().post(reverse("wallet-login"), signed_login_payload(account), format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        rates = {"login.nonce": "1/m", "login.ip": "30/m", "login.wallet": "10/m"}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.assertEqual(APIClient().get(reverse("wallet-login"), HTTP_X_FORWARDED_FOR="1.1.1.1").status_code, 200)
+            resp = APIClient().get(reverse("wallet-login"), HTTP_X_FORWARDED_FOR="2.2.2.2")
+        self.assertEqual(resp.status_code, 429)
+
+
+class RankTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(points=points) for points in (0, 5, 15, 15, 27, 140)]
+        rebuild_histogram()
+
+    def test_rank_counts_distinct_higher_scores(self):
+        self.assertEqual(get_rank(140), 1)
+        self.assertEqual(get_rank(27), 2)
+        self.assertEqual(get_rank(15), 3)
+        self.assertEqual(get_rank(5), 4)
+        self.assertEqual(get_rank(0), 5)
+        self.assertEqual(get_rank(1000), 1)
+
+    def test_crediting_points_keeps_histogram_in_step(self):
+        credit_points(self.users[1].pk, 30, Reason.TASK)  # 5 -> 35
+        credit_points(self.users[2].pk, 3, Reason.TASK)  # 15 -> 18, same bucket, 15 still held
+        credit_points(self.users[4].pk, 30, Reason.TASK)  # 27 -> 57, 27 left empty
+        roll_up_points(lag=0)
+
+        self.assertEqual(get_rank(57), 2)
+        self.assertEqual(get_rank(35), 3)
+        self.assertEqual(get_rank(27), 4)
+        self.assertEqual(get_rank(15), 5)
+        levels = dict(ScoreLevel.objects.values_list("score", "profile_count"))
+        buckets = dict(ScoreBucket.objects.exclude(score_count=0).values_list("floor", "score_count"))
+        rebuild_histogram()
+        self.assertEqual(levels, dict(ScoreLevel.objects.values_list("score", "profile_count")))
+        self.assertEqual(buckets, dict(ScoreBucket.objects.values_list("floor", "score_count")))
+
+    def test_guarded_credit_returns_none_when_guard_fails(self):
+        self.assertIsNone(credit_points(self.users[0].pk, 10, Reason.TASK, only_if=Q(profile__has_pass=True)))
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[0]).scored_point, 0)
+
+    def test_stats_view_reports_histogram_rank(self):
+        client = auth_client(self.users[4])
+        resp = client.get(reverse("profile-stats"))
+        self.assertEqual(resp.data["rank"], 2)
+        self.assertEqual(resp.data["point"], 27)
+
+
+@override_settings(LEADERBOARD_SIZE=2)
+class LeaderboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.users = [make_user(digipass, points=points) for points in (50, 30, 10)]
+        self.client = auth_client(self.users[0])
+
+    def board(self):
+        resp = self.client.get(reverse("leaderboard"))
+        return [(row["wallet"], row["rank"]) for row in resp.data]
+
+    def test_unchanged_board_returns_304(self):
+        resp = self.client.get(reverse("leaderboard"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["scored_point"] for row in resp.data], [50, 30])
+
+        resp = self.client.get(reverse("leaderboard"), HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_board_is_built_with_one_query(self):
+        with self.assertNumQueries(1):
+            rows, _ = top_rows(2)
+        self.assertEqual(rows[0], {
+            "wallet": self.users[0].wallet_address, "names": None, "scored_point": 50, "rank": 1, "avatar_url": None,
+        })
+
+    def test_changes_below_the_cutoff_keep_the_snapshot(self):
+        self.board()
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_points(self.users[2].pk, 5, Reason.TASK)  # 15, still below the cutoff of 30
+        with self.assertNumQueries(0):
+            self.board()
+
+    def test_crossing_the_cutoff_refreshes_the_board(self):
+        etag = self.client.get(reverse("leaderboard"))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_points(self.users[2].pk, 60, Reason.TASK)
+
+        resp = self.client.get(reverse("leaderboard"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [(row["wallet"], row["rank"]) for row in resp.data],
+            [(self.users[2].wallet_address, 1), (self.users[0].wallet_address, 2)],
+        )
+
+
+class LeaderboardPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.scores = [90, 80, 80, 80, 70, 60, 60, 50, 40, 30]
+        self.users = [make_user(digipass, points=points) for points in self.scores]
+        make_user(points=100)  # no pass: never on the board
+        self.client = auth_client(self.users[0])
+
+    def test_pages_walk_the_board_with_dense_ranks(self):
+        self.client.get(reverse("leaderboard-page"))  # warm the claims_version cache
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                page = self.client.get(reverse("leaderboard-page"), params).data
+            seen += [(row["scored_point"], row["rank"]) for row in page["results"]]
+            cursor = page["next"]
+            if not cursor:
+                break
+
+        self.assertEqual(seen, [(90, 1), (80, 2), (80, 2), (80, 2), (70, 3), (60, 4), (60, 4), (50, 5), (40, 6), (30, 7)])
+
+    def test_previous_cursor_returns_the_page_before(self):
+        first = self.client.get(reverse("leaderboard-page"), {"limit": 4}).data
+        second = self.client.get(reverse("leaderboard-page"), {"limit": 4, "cursor": first["next"]}).data
+        back = self.client.get(reverse("leaderboard-page"), {"limit": 4, "cursor": second["previous"]}).data
+
+        self.assertEqual(back["results"], first["results"])
+        self.assertIsNone(back["previous"])
+
+    def test_previous_page_ending_inside_a_tie_is_ranked(self):
+        page = self.client.get(reverse("leaderboard-page"), {"limit": 3}).data
+        page = self.client.get(reverse("leaderboard-page"), {"limit": 3, "cursor": page["next"]}).data
+        page = self.client.get(reverse("leaderboard-page"), {"limit": 3, "cursor": page["next"]}).data
+        back = self.client.get(reverse("leaderboard-page"), {"limit": 3, "cursor": page["previous"]}).data
+        self.assertEqual([(row["scored_point"], row["rank"]) for row in back["results"]], [(80, 2), (70, 3), (60, 4)])
+
+    def test_forged_cursor_is_rejected(self):
+        cursor = self.client.get(reverse("leaderboard-page"), {"limit": 3}).data["next"]
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+        forged = base64.urlsafe_b64encode(json.dumps({**payload, "r": 1}).encode()).decode()
+        for bad in (forged, cursor[:-2] + "xx"):
+            self.assertEqual(self.client.get(reverse("leaderboard-page"), {"cursor": bad}).status_code, 400)
+
+    def test_around_me_returns_neighbours_with_dense_ranks(self):
+        resp = auth_client(self.users[4]).get(reverse("leaderboard-around-me"), {"size": 2})
+
+        self.assertEqual(
+            [(row["scored_point"], row["rank"]) for row in resp.data["results"]],
+            [(80, 2), (80, 2), (70, 3), (60, 4), (60, 4)],
+        )
+        self.assertEqual(resp.data["results"][2]["wallet"], self.users[4].wallet_address)
+        self.assertIsNotNone(resp.data["previous"])
+        self.assertIsNotNone(resp.data["next"])
+
+    @override_settings(LEADERBOARD_SIZE=2)
+    def test_around_me_below_the_snapshot_ranks_from_the_histogram(self):
+        rebuild_histogram()
+        rank = get_rank(50)
+        resp = auth_client(self.users[7]).get(reverse("leaderboard-around-me"), {"size": 2})
+
+        self.assertEqual(
+            [(row["scored_point"], row["rank"]) for row in resp.data["results"]],
+            [(60, rank - 1), (60, rank - 1), (50, rank), (40, rank + 1), (30, rank + 2)],
+        )
+
+    def test_around_me_at_the_top_has_no_previous_cursor(self):
+        resp = self.client.get(reverse("leaderboard-around-me"), {"size": 2})
+        self.assertEqual([row["rank"] for row in resp.data["results"]], [1, 2, 2])
+        self.assertIsNone(resp.data["previous"])
+
+    def test_bad_cursor_is_rejected(self):
+        resp = self.client.get(reverse("leaderboard-page"), {"cursor": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class PeriodLeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.users = [make_user(digipass, points=1000) for _ in range(3)]
+        self.client = auth_client(self.users[0])
+
+    def test_awards_are_rolled_up_per_day(self):
+        credit_points(self.users[0].pk, 10, Reason.TASK)
+        credit_points(self.users[0].pk, 15, Reason.TASK)
+        roll_up_points(lag=0)
+        self.assertEqual(DailyPointDelta.objects.get(user=self.users[0]).points, 25)
+
+    def test_rollups_apply_each_settled_event_once(self):
+        credit_points(self.users[0].pk, 10, Reason.TASK)
+        credit_points(self.users[1].pk, 20, Reason.TASK)
+        self.assertEqual(roll_up_points(lag=60), 0)  # too recent: an older award may still be committing
+        self.assertFalse(DailyPointDelta.objects.exists())
+
+        self.assertEqual(roll_up_points(lag=0, batch_size=1, max_batches=1), 1)  # as the request path does
+        self.assertEqual(roll_up_points(lag=0, batch_size=1), 1)
+        credit_points(self.users[0].pk, 5, Reason.TASK)
+        self.assertEqual(roll_up_points(lag=0), 1)
+        self.assertEqual(roll_up_points(lag=0), 0)
+
+        self.assertEqual(
+            dict(DailyPointDelta.objects.values_list("user_id", "points")),
+            {self.users[0].pk: 15, self.users[1].pk: 20},
+        )
+        self.assertEqual(LedgerCursor.objects.get(name="point_rollups").last_event_id,
+                         PointEvent.objects.latest("id").id)
+
+    def test_weekly_board_reads_only_the_weeks_rollups(self):
+        today = timezone.now().date()
+        monday = today - timedelta(days=today.weekday())
+        DailyPointDelta.objects.bulk_create([
+            DailyPointDelta(user=self.users[0], day=monday, points=30),
+            DailyPointDelta(user=self.users[0], day=monday + timedelta(days=2), points=30),
+            DailyPointDelta(user=self.users[1], day=monday, points=50),
+            DailyPointDelta(user=self.users[2], day=monday - timedelta(days=1), points=500),  # last week
+        ])
+
+        resp = self.client.get(reverse("leaderboard-weekly"), {"date": today.isoformat()})
+
+        self.assertEqual(resp.data["start"], monday)
+        self.assertEqual(
+            [(row["wallet"], row["points"], row["rank"]) for row in resp.data["results"]],
+            [(self.users[0].wallet_address, 60, 1), (self.users[1].wallet_address, 50, 2)],
+        )
+
+    def test_daily_board_rejects_bad_dates(self):
+        self.assertEqual(self.client.get(reverse("leaderboard-daily"), {"date": "yesterday"}).status_code, 400)
+
+
+
+@override_settings(POINTS_ROLLUP_LAG=0)
+class SeasonTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.users = [make_user(digipass, points=1000) for _ in range(3)]
+        self.client = auth_client(self.users[0])
+
+    def test_awards_count_toward_the_active_season_only(self):
+        credit_points(self.users[0].pk, 10, Reason.TASK)  # no season yet
+        with self.captureOnCommitCallbacks(execute=True):
+            season = start_season("S1")
+        credit_points(self.users[0].pk, 20, Reason.TASK)
+        award_points_many([(self.users[0].pk, 5, Reason.REFERRAL, ""), (self.users[1].pk, 40, Reason.REFERRAL, "")])
+        roll_up_points(lag=0)
+
+        self.assertEqual(
+            dict(SeasonScore.objects.filter(season=season).values_list("user_id", "points")),
+            {self.users[0].pk: 25, self.users[1].pk: 40},
+        )
+        resp = self.client.get(reverse("season-leaderboard", args=["current"]))
+        self.assertEqual(
+            [(row["wallet"], row["points"], row["rank"]) for row in resp.data["results"]],
+            [(self.users[1].wallet_address, 40, 1), (self.users[0].wallet_address, 25, 2)],
+        )
+        resp = self.client.get(reverse("season-me", args=["current"]))
+        self.assertEqual((resp.data["points"], resp.data["rank"]), (25, 2))
+
+    def test_leaderboard_and_stats_rank_by_the_active_season(self):
+        credit_points(self.users[2].pk, 500, Reason.TASK)  # all-time leader
+        with self.captureOnCommitCallbacks(execute=True):
+            start_season("S1")
+        credit_points(self.users[1].pk, 40, Reason.TASK)
+        credit_points(self.users[0].pk, 20, Reason.TASK)
+        roll_up_points(lag=0)
+
+        resp = self.client.get(reverse("leaderboard"))
+        self.assertEqual(
+            [(row["wallet"], row["scored_point"], row["rank"]) for row in resp.data],
+            [(self.users[1].wallet_address, 40, 1), (self.users[0].wallet_address, 20, 2)],
+        )
+        self.assertEqual(self.client.get(reverse("leaderboard"), HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+        all_time = self.client.get(reverse("leaderboard"), {"scope": "all-time"})
+        self.assertEqual(all_time.data[0]["wallet"], self.users[2].wallet_address)
+
+        stats = self.client.get(reverse("profile-stats")).data
+        self.assertEqual((stats["point"], stats["season_point"], stats["rank"], stats["highest_point"]), (1020, 20, 2, 40))
+        stats = auth_client(self.users[2]).get(reverse("profile-stats")).data
+        self.assertEqual((stats["season_point"], stats["rank"]), (0, 3))
+        self.assertEqual(self.client.get(reverse("profile-stats"), {"scope": "all-time"}).data["rank"], 3)
+
+    @override_settings(POINTS_ROLLUP_LAG=1)
+    def test_closing_freezes_standings(self):
+        # Closing waits out the lag, so the awards just made are settled and counted
+        with self.captureOnCommitCallbacks(execute=True):
+            season = start_season("S1")
+        credit_points(self.users[0].pk, 30, Reason.TASK)
+        credit_points(self.users[1].pk, 30, Reason.TASK)
+        credit_points(self.users[2].pk, 10, Reason.TASK)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("close_season", stdout=io.StringIO())
+
+        self.assertFalse(SeasonScore.objects.exists())
+        self.assertEqual(
+            sorted(SeasonStanding.objects.filter(season=season).values_list("points", "rank")),
+            [(10, 2), (30, 1), (30, 1)],
+        )
+        credit_points(self.users[2].pk, 100, Reason.TASK)  # between seasons
+        self.assertFalse(SeasonScore.objects.exists())
+
+        resp = self.client.get(reverse("season-me", args=[season.pk]))
+        self.assertEqual((resp.data["status"], resp.data["points"], resp.data["rank"]), ("closed", 30, 1))
+        self.assertEqual(self.client.get(reverse("season-leaderboard", args=["current"])).status_code, 404)
+
+    def test_workers_with_a_stale_season_id_write_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            season = start_season("S1")
+        credit_points(self.users[0].pk, 30, Reason.TASK)
+        close_season()  # the cached id is not dropped, as in a worker that has its own cache
+        self.assertEqual(cache.get(seasons.ACTIVE_KEY), season.pk)
+
+        credit_points(self.users[0].pk, 10, Reason.TASK)
+        credit_points(self.users[1].pk, 10, Reason.TASK)
+        award_points_many([(self.users[2].pk, 5, Reason.REFERRAL, "")])
+        roll_up_points(lag=0)
+        self.assertFalse(SeasonScore.objects.exists())
+        self.assertEqual(SeasonStanding.objects.get(season=season, user=self.users[0]).points, 30)
+
+    def test_only_one_season_is_active(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            start_season("S1")
+        with self.assertRaises(CommandError):
+            call_command("start_season", "S2", stdout=io.StringIO())
+        self.assertEqual(Season.objects.count(), 1)
+
+
+class ReferralCountTests(TestCase):
+    def setUp(self):
+        digipass = make_pass()
+        self.top, self.second = make_user(digipass), make_user(digipass)
+        for referrer, n in ((self.top, 3), (self.second, 1)):
+            for _ in range(n):
+                Profile.objects.filter(user=make_user()).update(referred_by=referrer)
+        add_referrals([self.top.pk, self.top.pk, self.top.pk, self.second.pk])
+
+    def test_top_referrers_and_stats_read_the_counter(self):
+        client = auth_client(self.top)
+        resp = client.get(reverse("top-referrers"))
+        self.assertEqual(
+            [(row["wallet"], row["referral_count"], row["rank"]) for row in resp.data],
+            [(self.top.wallet_address, 3, 1), (self.second.wallet_address, 1, 2)],
+        )
+        self.assertEqual(client.get(reverse("profile-stats")).data["referral_count"], 3)
+
+    def test_repair_fixes_drifted_counts(self):
+        Profile.objects.filter(user=self.top).update(referral_count=7)
+        Profile.objects.filter(user=self.second).update(referral_count=0)
+        out = io.StringIO()
+        call_command("repair_referral_counts", stdout=out)
+
+        self.assertIn("on 2 profiles", out.getvalue())
+        self.assertEqual(Profile.objects.get(user=self.top).referral_count, 3)
+        self.assertEqual(Profile.objects.get(user=self.second).referral_count, 1)
+
+
+class PointLedgerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(make_pass(), points=0)
+
+    def test_profile_created_outside_signup_gets_a_score_row(self):
+        # As when an admin re-adds a deleted profile
+        Profile.objects.filter(user=self.user).delete()
+        Profile.objects.create(user=self.user)
+
+        self.assertEqual(credit_points(self.user.pk, 5, Reason.TASK), 5)
+
+    def test_parallel_awards_are_never_lost(self):
+        def award():
+            try:
+                awarded = 0
+                while awarded < 10:
+                    try:
+                        with transaction.atomic():
+                            credit_points(self.user.pk, 5, Reason.TASK)
+                        awarded += 1
+                    except OperationalError:
+                        # SQLite locks the whole table instead of waiting on the row; retry
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=award) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Profile.objects.with_score().get(user=self.user).scored_point, 400)
+        self.assertEqual(PointEvent.objects.filter(user=self.user).aggregate(total=Sum("amount"))["total"], 400)
+        balances = sorted(PointEvent.objects.filter(user=self.user).values_list("balance_after", flat=True))
+        self.assertEqual(balances, list(range(5, 405, 5)))
+
+    def test_referral_awards_share_one_update(self):
+        referee = make_user(points=10)
+        Profile.objects.filter(user=referee).update(referred_by=self.user)
+        profile = Profile.objects.select_related("referred_by__profile__current_pass").get(user=referee)
+        award_referral_points(profile)
+
+        self.assertEqual(Profile.objects.with_score().get(user=referee).scored_point, 90)
+        self.assertEqual(Profile.objects.with_score().get(user=self.user).scored_point, 200)  # 100 x point_power 2
+        self.assertEqual(
+            list(PointEvent.objects.order_by("id").values_list("user_id", "amount", "balance_after", "reason")),
+            [(self.user.pk, 200, 200, Reason.REFERRAL), (referee.pk, 80, 90, Reason.REFERRAL_BONUS)],
+        )
+
+    def test_profile_edit_does_not_overwrite_a_concurrent_award(self):
+        stale = Profile.objects.get(user=self.user)
+        credit_points(self.user.pk, 25, Reason.TASK)
+        serializer = UpdateProfileSerializer(stale, data={"names": "Ada"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        profile = Profile.objects.with_score().get(user=self.user)
+        self.assertEqual((profile.names, profile.scored_point), ("Ada", 25))
+
+
+@override_settings(POINTS_WRITE_BEHIND=True)
+class WriteBehindPointsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.referrer = make_user(digipass, points=0)
+        self.users = [make_user(digipass, points=0) for _ in range(3)]
+        cache.set(FLUSH_DUE_KEY, True)  # no opportunistic flush; the test flushes
+
+    def test_awards_are_applied_with_one_profile_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, user in enumerate(self.users):
+                award_points_many([
+                    (self.referrer.pk, 100, Reason.REFERRAL, user.pk),
+                    (user.pk, 80, Reason.REFERRAL_BONUS, self.referrer.pk),
+                ])
+                award_points(user.pk, i + 1, Reason.TASK, reference=i)
+        self.assertEqual(Profile.objects.with_score().get(user=self.referrer).scored_point, 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            # One amount per user and reason: the referrer's three referrals are summed
+            self.assertEqual(flush_pending_points(), 7)
+        profile_updates = [q for q in queries if q["sql"].startswith('UPDATE "main_profilescore"')]
+        self.assertEqual(len(profile_updates), 1)
+
+        self.assertEqual(Profile.objects.with_score().get(user=self.referrer).scored_point, 300)
+        self.assertEqual(
+            list(Profile.objects.with_score().filter(user__in=self.users).order_by("scored_point").values_list("scored_point", flat=True)),
+            [81, 82, 83],
+        )
+        self.assertEqual(
+            list(PointEvent.objects.filter(user=self.referrer).values_list("amount", "reference")), [(300, "flush:7")],
+        )
+        self.assertEqual(flush_pending_points(), 0)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.referrer.pk)), 0)
+
+    def test_interrupted_flush_is_finished_without_applying_twice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+        # A flush that committed its batch and died before settling it
+        batch = points_service._next_batch(100)
+        points_service._apply_batch(batch)
+
+        self.assertEqual(flush_pending_points(), 1)
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[0]).scored_point, 40)
+        self.assertEqual(PointEvent.objects.filter(user=self.users[0]).count(), 1)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk)), 0)
+        self.assertEqual(flush_pending_points(), 0)
+
+    def test_amounts_that_were_not_credited_are_not_settled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points_many([(user.pk, 10, Reason.TASK, "") for user in self.users])
+        ProfileScore.objects.filter(profile_id=self.users[0].pk).delete()  # a profile without its score row
+        deleted = self.users[1].pk
+        self.users[1].delete()
+
+        with self.assertLogs("main.services.points", "WARNING") as logs:
+            self.assertEqual(flush_pending_points(), 2)  # users[2] credited, the deleted user's amount dropped
+        self.assertIn(f"Dropping 10 task points queued for deleted user {deleted}", "\n".join(logs.output))
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk)), 10)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(deleted)), 0)
+
+        ProfileScore.objects.create(profile_id=self.users[0].pk)
+        self.assertEqual(flush_pending_points(), 1)  # queued again, and credited once the row exists
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[0]).scored_point, 10)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk)), 0)
+
+    def test_points_added_during_a_flush_stay_pending(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+        points_service._next_batch(100)
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 5, Reason.TASK)
+
+        self.assertEqual(flush_pending_points(), 1)
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[0]).scored_point, 40)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk)), 5)
+        self.assertEqual(flush_pending_points(), 1)
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[0]).scored_point, 45)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk)), 0)
+
+    def test_flush_keeps_a_lock_it_does_not_own(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+        cache.set(FLUSH_LOCK_KEY, 12345)
+        self.assertEqual(flush_pending_points(), 0)
+        self.assertEqual(cache.get(FLUSH_LOCK_KEY), 12345)
+
+        # Our lock expired mid-flush and another flush took it: we must not release theirs
+        locks.release(FLUSH_LOCK_KEY, 54321)
+        self.assertEqual(cache.get(FLUSH_LOCK_KEY), 12345)
+        cache.delete(FLUSH_LOCK_KEY)
+        self.assertEqual(flush_pending_points(), 1)
+        self.assertIsNone(cache.get(FLUSH_LOCK_KEY))
+
+    def test_lost_sequence_restarts_after_the_flushed_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+            award_points(self.users[1].pk, 10, Reason.TASK)
+        self.assertEqual(flush_pending_points(), 2)
+        cache.delete_many([PENDING_SEQ_KEY, FLUSHED_SEQ_KEY])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[2].pk, 7, Reason.TASK)
+        self.assertEqual(cache.get(PENDING_SEQ_KEY), 3)
+        self.assertEqual(flush_pending_points(), 1)
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[2]).scored_point, 7)
+
+    def test_reads_include_pending_points(self):
+        client = auth_client(self.users[0])
+        self.assertEqual(client.get(reverse("profile-stats")).data["point"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+
+        self.assertEqual(client.get(reverse("profile-stats")).data["point"], 40)
+        self.assertEqual(client.get(reverse("dashboard"), {"sections": "stats"}).data["stats"]["point"], 40)
+        with self.captureOnCommitCallbacks(execute=True):
+            flush_pending_points()
+        self.assertEqual(client.get(reverse("profile-stats")).data["point"], 40)
+
+    def test_rolled_back_awards_are_not_queued(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            award_points(self.users[0].pk, 40, Reason.TASK)
+        self.assertEqual(flush_pending_points(), 0)
+        self.assertEqual(cache.get(PENDING_TOTAL_KEY.format(self.users[0].pk), 0), 0)
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=3600)
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(make_pass(), points=100)
+        self.client = auth_client(self.user)
+        self.client.get(reverse("profile-stats"))
+        self.client.get(reverse("user-profile"))
+
+    def test_repeat_loads_are_served_from_cache(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse("profile-stats"))
+            self.client.get(reverse("user-profile"))
+
+    def test_point_award_is_visible_on_next_load(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_points(self.user.pk, 25, Reason.TASK)
+        self.assertEqual(self.client.get(reverse("profile-stats")).data["point"], 125)
+
+    def test_profile_update_is_visible_on_next_load(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.patch(reverse("update-profile"), {"names": "Ada"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get(reverse("user-profile")).data["names"], "Ada")
+
+
+@override_settings(DASHBOARD_MAX_WORKERS=0)  # pool threads cannot see the test transaction
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(make_pass(), points=100)
+        make_user(make_pass(), points=40)
+        Task.objects.create(title="Follow", description="x", points=10, task_type="off_site")
+        self.client = auth_client(self.user)
+
+    def test_sections_match_the_separate_endpoints(self):
+        resp = self.client.get(reverse("dashboard"), {"sections": "profile,stats,tasks,leaderboard"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.data), ["profile", "stats", "tasks", "leaderboard"])
+        self.assertEqual(resp.data["profile"], self.client.get(reverse("user-profile")).data)
+        self.assertEqual(resp.data["stats"], self.client.get(reverse("profile-stats")).data)
+        self.assertEqual(resp.data["tasks"], self.client.get(reverse("list_tasks")).data)
+        self.assertEqual(resp.data["leaderboard"], self.client.get(reverse("leaderboard")).data)
+
+    def test_profile_is_loaded_once_for_all_sections(self):
+        self.client.get(reverse("dashboard"), {"sections": "leaderboard"})  # warm claims and snapshot
+        # The shared profile, the Max(scored_point) aggregate and the two rank lookups
+        with self.assertNumQueries(4):
+            self.client.get(reverse("dashboard"), {"sections": "profile,stats,leaderboard"})
+
+    def test_pass_sections_are_reported_for_users_without_a_pass(self):
+        client = auth_client(make_user(points=5))
+        resp = client.get(reverse("dashboard"), {"sections": "stats,tasks"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["stats"]["point"], 5)
+        self.assertNotIn("tasks", resp.data)
+        self.assertIn("tasks", resp.data["errors"])
+
+    def test_unknown_section_is_rejected(self):
+        resp = self.client.get(reverse("dashboard"), {"sections": "profile,wallet"})
+        self.assertEqual(resp.status_code, 400)
+
+    @override_settings(DASHBOARD_MAX_WORKERS=2)
+    def test_failing_section_does_not_fail_the_others(self):
+        def fail():
+            raise RuntimeError("price API down")
+
+        results, errors = build_sections({"a": lambda: 1, "b": fail, "c": lambda: 3})
+        self.assertEqual(results, {"a": 1, "c": 3})
+        self.assertEqual(list(errors), ["b"])
+
+
+@override_settings(DASHBOARD_MAX_WORKERS=2)
+class DashboardPoolTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(make_pass(), points=100)
+        Task.objects.create(title="Follow", description="x", points=10, task_type="off_site")
+        self.client = auth_client(self.user)
+
+    def test_sections_built_on_the_pool_match_the_separate_endpoints(self):
+        resp = self.client.get(reverse("dashboard"), {"sections": "profile,stats,tasks,leaderboard"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("errors", resp.data)
+        self.assertEqual(resp.data["profile"], self.client.get(reverse("user-profile")).data)
+        self.assertEqual(resp.data["stats"], self.client.get(reverse("profile-stats")).data)
+        self.assertEqual(resp.data["tasks"], self.client.get(reverse("list_tasks")).data)
+        self.assertEqual(resp.data["leaderboard"], self.client.get(reverse("leaderboard")).data)
+
+    def test_profile_section_makes_no_chain_call(self):
+        client = auth_client(make_user(points=5))
+        with mock.patch.object(UserProfileView, "sync_pass_from_chain") as sync:
+            resp = client.get(reverse("dashboard"), {"sections": "profile,stats"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data["profile"]["has_pass"])
+        sync.assert_not_called()
+
+
+class LivePushTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        self.users = [make_user(digipass, points=points) for points in (50, 30)]
+        self.broadcaster = Broadcaster()
+        self.broadcaster.board = get_snapshot()
+        self.broadcaster.last_seq = cache.get(SEQ_KEY, 0)
+        for user in self.users:
+            cache.set(CLAIMS_VERSION_KEY.format(user.pk), 0)
+        self.clients = [Subscription(self.users[i % 2].pk, sees_board=True, claims_version=0) for i in range(999)]
+        self.outsider = make_user(points=10)
+        cache.set(CLAIMS_VERSION_KEY.format(self.outsider.pk), 0)
+        self.clients.append(Subscription(self.outsider.pk, sees_board=False, claims_version=0))
+        self.broadcaster.subscribers.update(self.clients)
+
+    def test_one_change_is_fanned_out_with_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_points(self.users[1].pk, 40, Reason.TASK)
+            credit_points(self.outsider.pk, 5, Reason.TASK)
+
+        # The snapshot rebuild; nothing per connected client
+        with self.assertNumQueries(1):
+            async_to_sync(self.broadcaster.poll)()
+
+        diff = [event for event in self.clients[1].queue._queue if event["type"] == "leaderboard_diff"]
+        self.assertEqual([(row["wallet"], row["rank"]) for row in diff[0]["upsert"]],
+                         [(self.users[1].wallet_address, 1), (self.users[0].wallet_address, 2)])
+        self.assertEqual(self.clients[1].queue._queue[0], {
+            "type": "points", "user_id": str(self.users[1].pk), "point": 70, "added": 40,
+        })
+        self.assertEqual(self.clients[0].queue.qsize(), 1)  # diff only, no one else's points
+        self.assertEqual(self.clients[999].queue.qsize(), 1)  # points only: no pass, no diff
+
+    def test_board_access_is_rechecked_before_each_diff(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(user=self.users[0]).update(has_pass=False, current_pass=None)
+            invalidate_pass_claims(self.users[0].pk)
+            credit_points(self.users[1].pk, 40, Reason.TASK)
+
+        async_to_sync(self.broadcaster.poll)()
+
+        self.assertFalse(self.clients[0].sees_board)
+        self.assertEqual(self.clients[0].queue.qsize(), 0)
+        self.assertTrue(self.clients[1].sees_board)
+
+    def test_stream_is_opened_with_a_single_use_ticket(self):
+        resp = auth_client(self.users[0]).post(reverse("live-ticket"))
+        self.assertEqual(resp.status_code, 201)
+        ticket = resp.data["ticket"]
+        self.assertEqual(async_to_sync(redeem_ticket)(ticket), str(self.users[0].pk))
+        self.assertIsNone(async_to_sync(redeem_ticket)(ticket))
+
+        async def open_stream():
+            return await AsyncClient().get(reverse("live-events"), {"ticket": ticket})
+
+        self.assertEqual(async_to_sync(open_stream)().status_code, 401)
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.assertEqual(self.client.get(reverse("live-events"), {"ticket": "any"}).status_code, 503)
+
+
+class GlobalStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        digipass = make_pass()
+        users = [make_user(points=points) for points in (0, 25, 40)]
+        Profile.objects.filter(user=users[2]).update(has_pass=True, current_pass=digipass)
+        PassTransaction.objects.create(
+            user=users[2], wallet_address=users[2].wallet_address, digipass=digipass,
+            minted=True, usd_price=5, amount_paid_bnb=0,
+        )
+        counters.reconcile_counters()
+
+    def test_stats_come_from_counters_and_are_cached(self):
+        credit_points(DigiUser.objects.first().pk, 5, Reason.TASK)
+        DigiUser.objects.create_user(Account.create().address)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("global-stats"))
+        self.assertEqual(resp.data, {"total_users": 4, "total_passes": 1, "total_points": 70, "minted_today": 1})
+        with self.assertNumQueries(0):
+            self.client.get(reverse("global-stats"))
+
+    def test_reconcile_corrects_drift(self):
+        ProfileScore.objects.update(scored_point=F("scored_point") + 1)
+        drift = counters.reconcile_counters()
+
+        self.assertEqual(drift, {counters.POINTS: (65, 68)})
+        self.assertEqual(counters.read_counters(counters.POINTS), {counters.POINTS: 68})
+        self.assertEqual(PlatformCounter.objects.filter(name=counters.POINTS).count(), 1)
+
+
+@override_settings(PLATFORM_COUNTER_SHARDS=1)
+class ImportWalletsCommandTests(TestCase):
+    def write_csv(self, rows):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "wallets.csv")
+        with open(path, "w", newline="") as f:
+            csv.writer(f).writerows([("wallet", "referral_code"), *rows])
+        return path
+
+    def test_bulk_import_creates_users_profiles_and_referrals(self):
+        referrer = make_user()
+        wallets = [Account.create().address for _ in range(25)]
+        path = self.write_csv([
+            *((wallet, referrer.profile.referral_code if i % 2 else "") for i, wallet in enumerate(wallets)),
+            (wallets[0], ""),  # duplicate
+            ("not-a-wallet", ""),
+            (referrer.wallet_address, ""),  # already registered
+        ])
+
+        out = io.StringIO()
+        # 10 statements per chunk of 10 (3 lookups, savepoint, 3 inserts, users counter,
+        # referral counts, release), none per row
+        with self.assertNumQueries(30):
+            call_command("import_wallets", path, "--chunk-size", "10", stdout=out)
+
+        self.assertIn("Created 25 wallets (12 referred)", out.getvalue())
+        self.assertIn("Skipped 1 existing, 1 duplicate and 1 invalid rows", out.getvalue())
+        self.assertEqual(Profile.objects.count(), 26)
+        self.assertEqual(Profile.objects.filter(referred_by=referrer).count(), 12)
+        self.assertEqual(Profile.objects.get(user=referrer).referral_count, 12)
+        self.assertEqual(len(set(Profile.objects.values_list("referral_code", flat=True))), 26)
+
+    def test_referrers_in_the_same_file_are_referred_to_by_wallet(self):
+        hub, first, second, third = (Account.create().address for _ in range(4))
+        path = self.write_csv([
+            (hub, ""),
+            (first, hub),  # same chunk as the hub
+            (second, hub.lower()),  # next chunk
+            (third, third),  # its own wallet: no referrer
+        ])
+
+        call_command("import_wallets", path, "--chunk-size", "2", stdout=io.StringIO())
+
+        hub_user = DigiUser.objects.get(wallet_address=hub.lower())
+        self.assertEqual(
+            set(Profile.objects.filter(referred_by=hub_user).values_list("user__wallet_address", flat=True)),
+            {first.lower(), second.lower()},
+        )
+        self.assertEqual(Profile.objects.get(user=hub_user).referral_count, 2)
+        self.assertIsNone(Profile.objects.get(user__wallet_address=third.lower()).referred_by_id)
+
+
+class AuditPointsCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [make_user(make_pass()) for _ in range(5)]
+        for i, user in enumerate(self.users):
+            credit_points(user.pk, 10 * (i + 1), Reason.TASK)
+
+    def audit(self, *args):
+        with tempfile.NamedTemporaryFile("r", suffix=".csv") as report:
+            call_command("audit_points", "--workers", "0", "--chunks", "7", "--report", report.name, *args,
+                         stderr=io.StringIO())
+            return list(csv.DictReader(report))
+
+    def test_ranges_cover_the_whole_id_space(self):
+        ranges = user_id_ranges(7)
+        self.assertEqual(ranges[0][0].int, 0)
+        self.assertEqual(ranges[-1][1].int, (1 << 128) - 1)
+        self.assertTrue(all(last.int + 1 == first.int for (_, last), (first, _) in zip(ranges, ranges[1:])))
+
+    def test_mismatches_are_reported_and_applied(self):
+        self.assertEqual(self.audit(), [])
+        ProfileScore.objects.filter(profile_id=self.users[1].pk).update(scored_point=999)  # an edit outside credit_points
+
+        rows = self.audit("--apply")
+        self.assertEqual(rows, [{"user_id": str(self.users[1].pk), "balance": "999", "ledger_total": "20", "difference": "-979"}])
+        self.assertEqual(Profile.objects.with_score().get(user=self.users[1]).scored_point, 20)
+        self.assertEqual(self.audit(), [])
+
+    def test_opening_balances_are_checked_against_the_history(self):
+        task = Task.objects.create(title="t", description="d", points=30)
+        for user, opening in ((self.users[0], 50), (self.users[1], 10)):
+            PointEvent.objects.create(user=user, amount=opening, balance_after=opening, reason=Reason.OPENING_BALANCE)
+            UserTaskCompletion.objects.create(
+                user=user, task=task, status=UserTaskCompletion.Status.COMPLETED, awarded_points=30,
+                completed_at=timezone.now() - timedelta(days=2),
+            )
+        PointEvent.objects.filter(reason=Reason.OPENING_BALANCE).update(created_at=timezone.now() - timedelta(days=1))
+
+        def opening_audit(*args):
+            with tempfile.NamedTemporaryFile("r", suffix=".csv") as report:
+                self.audit("--opening-report", report.name, *args)
+                return sorted((row["user_id"], row["difference"]) for row in csv.DictReader(report))
+
+        # 10 points cannot cover a 30-point task; 20 unexplained points can be logins
+        self.assertEqual(opening_audit(), [(str(self.users[1].pk), "-20")])
+        self.assertEqual(
+            opening_audit("--opening-tolerance", "10"),
+            sorted([(str(self.users[0].pk), "20"), (str(self.users[1].pk), "-20")]),
+        )
+
+
+class AuditPointsProcessPoolTests(TransactionTestCase):
+    """The audit on a real spawn pool: workers must reach this test's database, and see committed rows."""
+
+    def test_workers_audit_the_ranges(self):
+        users = [make_user(make_pass()) for _ in range(3)]
+        for user in users:
+            credit_points(user.pk, 10, Reason.TASK)
+        PointEvent.objects.create(user=users[0], amount=40, balance_after=40, reason=Reason.OPENING_BALANCE)
+        ProfileScore.objects.filter(profile_id=users[2].pk).update(scored_point=5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            report, opening = os.path.join(directory, "audit.csv"), os.path.join(directory, "opening.csv")
+            call_command("audit_points", "--workers", "2", "--chunks", "4", "--report", report,
+                         "--opening-report", opening, "--opening-tolerance", "0", stderr=io.StringIO())
+            with open(report) as f:
+                rows = [(row["user_id"], row["difference"]) for row in csv.DictReader(f)]
+            with open(opening) as f:
+                openings = [(row["user_id"], row["difference"]) for row in csv.DictReader(f)]
+        self.assertEqual(sorted(rows), sorted([(str(users[0].pk), "40"), (str(users[2].pk), "5")]))
+        self.assertEqual(openings, [(str(users[0].pk), "40")])
+
+
+@skipUnless(importlib.util.find_spec("numpy"), "allocate_airdrop needs numpy")
+class AllocateAirdropCommandTests(TestCase):
+    def setUp(self):
+        self.holder = make_user(make_pass(point_power=3), points=400)
+        self.member = make_user(make_pass(point_power=1), points=100)
+        self.empty = make_user(make_pass())
+        self.plain = make_user(points=1000)  # no pass: never allocated
+        UserTaskCompletion.objects.create(
+            user=self.member, task=Task.objects.create(title="t", description="d", points=10),
+            status=UserTaskCompletion.Status.COMPLETED,
+        )
+
+    def allocate(self, *args):
+        with tempfile.NamedTemporaryFile("r", suffix=".csv") as output:
+            call_command("allocate_airdrop", output.name, "--decimals", "6", *args, stderr=io.StringIO())
+            return {row["address"]: int(row["amount"]) for row in csv.DictReader(output)}
+
+    def test_pass_multiplier_and_task_points(self):
+        # weights: holder 400 * 3, member (100 + 100 for its task) * 1
+        rows = self.allocate("--total", "1400", "--task-points", "100")
+        self.assertEqual(rows, {self.holder.wallet_address: 1200_000000, self.member.wallet_address: 200_000000})
+
+    def test_sqrt_weighting_sums_exactly(self):
+        rows = self.allocate("--total", "1000", "--weighting", "sqrt", "--no-pass-multiplier")
+        self.assertEqual(sum(rows.values()), 1000_000000)
+        self.assertEqual(rows[self.holder.wallet_address], 666_666667)  # sqrt(400) : sqrt(100) = 2 : 1
+
+    def test_max_share_caps_a_wallet(self):
+        rows = self.allocate("--total", "1000", "--max-share", "0.5")
+        self.assertEqual(rows, {self.holder.wallet_address: 500_000000, self.member.wallet_address: 500_000000})
+
+
+@skipUnless(importlib.util.find_spec("numpy"), "score_sybils needs numpy")
+class SybilScoringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cheap = make_pass()
+        self.premium = DigiPass.objects.create(name="Gold", usd_price=50, pass_type="gold", point_power=5, card="ntfpass/gold.png")
+        self.task = Task.objects.create(title="Follow", description="d", points=10)
+        self.referrer = make_user(self.cheap, points=500)
+        self.farm = [self.add_referee() for _ in range(6)]
+        self.organic = make_user(self.premium, points=100)
+        self.mint(self.organic, self.premium)
+
+    def mint(self, user, digipass):
+        PassTransaction.objects.create(
+            user=user, wallet_address=user.wallet_address, digipass=digipass,
+            minted=True, is_verified=True, usd_price=digipass.usd_price, amount_paid_bnb=0,
+        )
+
+    def add_referee(self):
+        # A fresh wallet that mints the cheapest pass and does the same task as its siblings, minutes apart
+        user = make_user(self.cheap, points=1000)
+        Profile.objects.filter(user=user).update(referred_by=self.referrer)
+        Profile.objects.filter(user=self.referrer).update(referral_count=F("referral_count") + 1)
+        self.mint(user, self.cheap)
+        UserTaskCompletion.objects.create(
+            user=user, task=self.task, status=UserTaskCompletion.Status.COMPLETED, completed_at=timezone.now(),
+        )
+        return user
+
+    def score(self, *args):
+        call_command("score_sybils", *args, stdout=io.StringIO())
+        return dict(SybilScore.objects.values_list("user_id", "score"))
+
+    def test_star_cluster_is_flagged_and_left_off_the_board(self):
+        scores = self.score()
+        self.assertTrue(all(scores[user.pk] >= settings.SYBIL_SCORE_THRESHOLD for user in self.farm))
+        self.assertLess(scores[self.organic.pk], settings.SYBIL_SCORE_THRESHOLD)
+        self.assertLess(scores[self.referrer.pk], settings.SYBIL_SCORE_THRESHOLD)
+        self.assertEqual(SybilScore.objects.get(user=self.farm[0]).mint_burst, 5)
+
+        rows, _ = top_rows(10)
+        self.assertEqual([row["wallet"] for row in rows], [self.referrer.wallet_address, self.organic.wallet_address])
+
+    def test_only_new_or_active_users_and_their_stars_are_rescored(self):
+        def rescored():
+            return set(SybilScore.objects.filter(scored_at__gte=timezone.now() - timedelta(hours=1))
+                       .values_list("user_id", flat=True))
+
+        def age():
+            SybilScore.objects.update(scored_at=timezone.now() - timedelta(days=1))
+            PassTransaction.objects.update(created_at=timezone.now() - timedelta(days=2))
+            UserTaskCompletion.objects.update(completed_at=timezone.now() - timedelta(days=2))
+
+        self.score()
+        age()
+        self.score()
+        self.assertEqual(rescored(), set())
+
+        newcomer = self.add_referee()
+        self.score()
+        self.assertEqual(rescored(), {newcomer.pk, self.referrer.pk, *(user.pk for user in self.farm)})
+        self.assertEqual(SybilScore.objects.get(user=self.farm[0]).star_size, 7)
+        self.assertEqual(SybilScore.objects.get(user=self.referrer).star_size, 7)
+
+        age()
+        UserTaskCompletion.objects.create(
+            user=self.organic, task=self.task, status=UserTaskCompletion.Status.COMPLETED, completed_at=timezone.now(),
+        )
+        self.score()
+        self.assertEqual(rescored(), {self.organic.pk})
+
+    def test_flagged_users_get_no_allocation(self):
+        self.score()
+        with tempfile.NamedTemporaryFile("r", suffix=".csv") as output:
+            call_command("allocate_airdrop", output.name, "--total", "100", stderr=io.StringIO())
+            wallets = {row["address"] for row in csv.DictReader(output)}
+        self.assertEqual(wallets, {self.referrer.wallet_address, self.organic.wallet_address})
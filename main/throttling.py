@@ -0,0 +1,146 @@
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+from .models import DigiUser
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """
+    Parses "<requests>/<period>" where period is s/m/h/d with an optional count,
+    e.g. "30/m", "5/10s", "1/7d". Returns (requests, period_seconds).
+    """
+    num, period = rate.split("/")
+    count = int(period[:-1]) if len(period) > 1 else 1
+    return int(num), count * PERIODS[period[-1]]
+
+
+class RateLimiter:
+    """
+    Sliding-window counter: one counter per fixed window, and the previous window's
+    count weighted by how much of it still overlaps the sliding window. Counting uses
+    cache.add + cache.incr, which are atomic on memcached/Redis, so concurrent
+    requests can never all slip under the limit.
+    """
+
+    def __init__(self, scope, rate):
+        self.scope = scope
+        self.num_requests, self.period = parse_rate(rate)
+
+    def _state(self, ident):
+        now = time.time()
+        window = int(now // self.period)
+        elapsed = (now % self.period) / self.period
+        current_key = f"ratelimit:{self.scope}:{ident}:{window}"
+        previous_key = f"ratelimit:{self.scope}:{ident}:{window - 1}"
+        return elapsed, current_key, previous_key
+
+    def _retry_after(self, elapsed, previous, current):
+        remaining = self.period * (1 - elapsed)
+        if current >= self.num_requests or not previous:
+            # Even a fully decayed previous window leaves this one over the limit
+            return math.ceil(remaining)
+        # Time until previous * (1 - elapsed') + current drops below the limit
+        fraction = 1 - (self.num_requests - current) / previous
+        return max(1, math.ceil(self.period * (fraction - elapsed)))
+
+    def _estimate(self, elapsed, previous, current):
+        return previous * (1 - elapsed) + current
+
+    def hit(self, ident):
+        """Counts a request. Returns 0 if it is allowed, otherwise seconds until retry."""
+        elapsed, current_key, previous_key = self._state(ident)
+        cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The key expired between add and incr
+            cache.set(current_key, 1, timeout=self.period * 2)
+            current = 1
+        previous = cache.get(previous_key, 0)
+        if self._estimate(elapsed, previous, current) <= self.num_requests:
+            return 0
+        return self._retry_after(elapsed, previous, current)
+
+
+def get_rate(scope):
+    return settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {}).get(scope)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Base throttle keyed on one identity (IP, wallet, user). The rate is looked up as
+    "<view.throttle_scope>.<kind>" in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], so each
+    view picks its limits by setting throttle_scope; views without a rate are not limited.
+    A throttle with `methods` counts only requests of those methods.
+    DRF turns a rejection into a 429 with a Retry-After header from wait().
+    """
+    kind = None
+    methods = None
+
+    def get_ident_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if self.methods and request.method not in self.methods:
+            return True
+        scope = getattr(view, "throttle_scope", None)
+        rate = get_rate(f"{scope}.{self.kind}") if scope else None
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if not ident:
+            return True
+        self.retry_after = RateLimiter(f"{scope}.{self.kind}", rate).hit(ident) or None
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = "ip"
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class PostIPRateThrottle(IPRateThrottle):
+    """The "<scope>.ip" limit counted on POSTs only, for views whose GETs have their own limit."""
+    methods = ("POST",)
+
+
+class NonceRateThrottle(IPRateThrottle):
+    """
+    Nonce requests (GETs) per IP, limited under "<scope>.nonce" apart from the login
+    attempts, so the GET and POST of one login do not both count against one limit.
+    """
+    kind = "nonce"
+    methods = ("GET",)
+
+
+class WalletRateThrottle(SlidingWindowThrottle):
+    """
+    Limits attempts on one wallet from one client. Keyed on IP + wallet because the
+    wallet is client-supplied and counted before the signature is checked: keyed on
+    the wallet alone, anyone could lock a victim out of login with unsigned requests.
+    """
+    kind = "wallet"
+    methods = ("POST",)
+
+    def get_ident_key(self, request, view):
+        wallet = DigiUser.objects.normalize_wallet_address(request.data.get("walletAddress"))
+        return f"{self.get_ident(request)}:{wallet}" if wallet else None
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    kind = "user"
+
+    def get_ident_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return str(request.user.pk)
@@ -13,7 +13,18 @@ urlpatterns=[
     path('tasks/<int:task_id>/start', StartTaskView.as_view(), name="start-task"),
     path('tasks/<int:task_id>/completed', CompleteTaskView.as_view(), name="task-completion"),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/all', LeaderboardPageView.as_view(), name='leaderboard-page'),
+    path('leaderboard/around-me', LeaderboardAroundMeView.as_view(), name='leaderboard-around-me'),
+    path('leaderboard/daily', LeaderboardPeriodView.as_view(), {"period": "daily"}, name='leaderboard-daily'),
+    path('leaderboard/weekly', LeaderboardPeriodView.as_view(), {"period": "weekly"}, name='leaderboard-weekly'),
+    path('dashboard', DashboardView.as_view(), name='dashboard'),
+    path('seasons', SeasonListView.as_view(), name='seasons'),
+    path('seasons/<str:season>/leaderboard', SeasonLeaderboardView.as_view(), name='season-leaderboard'),
+    path('seasons/<str:season>/me', SeasonMeView.as_view(), name='season-me'),
+    path('referrals/top', TopReferrersView.as_view(), name='top-referrers'),
     path('webhooks/moralis', moralis_webhook),
     path('testnet/onboard/', TestnetOnboardView.as_view(), name='testnet-onboard'),
     path('stats/', GlobalStatsView.as_view(), name='global-stats'),
+    path('live/ticket', LiveTicketView.as_view(), name='live-ticket'),
+    path('live', live_events, name='live-events'),
 ]
\ No newline at end of file
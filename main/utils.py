@@ -1,5 +1,6 @@
 import requests
 from .models import DigiUser, Profile
+from .services.points import Reason, award_points_many
 from decimal import Decimal
 from django.core.cache import cache
 from django.conf import settings
@@ -77,16 +78,17 @@ def award_referral_points(profile):
     """
     Awards referral points to the referrer of the user associated with the given profile.
     Uses the referrer's current pass point power as a multiplier, defaulting to 1 if no pass is owned.
-    Also awards the joined user (profile.scored_point += 80) directly.
+    Also awards the joined user 80 points directly.
     """
     if profile.referred_by:
         referrer_profile = profile.referred_by.profile
         base_referral_points = 100
         multiplier = getattr(referrer_profile.current_pass, "point_power", 1)
         multiplied_points = base_referral_points * multiplier
-        referrer_profile.scored_point += multiplied_points
-        referrer_profile.save(update_fields=["scored_point"])
-        
-        # Award the joined user 80 points directly
-        profile.scored_point += 80
-        profile.save(update_fields=["scored_point"])
+
+        # Award the joined user 80 points directly; both credits share one UPDATE.
+        # A popular referrer's awards are batched further in write-behind mode.
+        award_points_many([
+            (referrer_profile.user_id, multiplied_points, Reason.REFERRAL, profile.user_id),
+            (profile.user_id, 80, Reason.REFERRAL_BONUS, referrer_profile.user_id),
+        ])
@@ -1,27 +1,47 @@
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse, HttpResponseForbidden
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.utils import timezone
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from datetime import date
 from django.conf import settings
 from web3 import Web3
+import asyncio
 import json
 import hmac
 import hashlib
 import logging
+import threading
 from .utils import get_bnb_usd_price
 from main.services.pass_verifier import (handle_pass_minted,handle_pass_upgraded)
+from main.services.login_nonce import issue_nonce, verify_nonce, consume_nonce
+from main.services.wallet_login import login_wallet
+from main.services.signature import verify_wallet_signature, SignaturePoolBroken, SignatureQueueFull
+from main.services import counters
+from main.services.points import Reason, award_points, credit_points, with_pending_points
+from main.services.rank import get_rank
+from main.services.referrals import top_referrers
+from main.services.profile_cache import cached_payload
+from main.services.live import broadcaster, issue_ticket, redeem_ticket
+from main.services.dashboard import build_sections
+from main.services.seasons import (board_rows as season_board_rows, get_season_board, get_season_standing,
+                                   list_seasons, resolve_season, season_stats)
+from main.services.leaderboard import (InvalidCursor, get_around, get_page, get_period_board, get_snapshot,
+                                      note_profile_change)
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction, IntegrityError
-from django.db.models import F, Window, Max
-from django.db.models.functions import Rank
-from eth_account.messages import encode_defunct
-from django.utils.crypto import get_random_string
+from django.db.models import Max
+from eth_utils import is_checksum_address, to_checksum_address
 from decimal import Decimal
 from .permissions import HasPassPermission
+from .throttling import (IPRateThrottle, NonceRateThrottle, PostIPRateThrottle, RateLimiter, UserRateThrottle,
+                         WalletRateThrottle)
 from rest_framework import generics, response, permissions, status, views
-from .serializers import  DigiPassSerializer, LeaderboardSerializer, UpdateProfileSerializer, UserProfileSerializer, TaskSerializer, UserTaskCompletionSerializer
-from .models import DigiUser, DigiPass,LoginNonce, PassTransaction,Profile, Task, UserTaskCompletion
-from rest_framework_simplejwt.tokens import RefreshToken
+from .serializers import  DigiPassSerializer, UpdateProfileSerializer, UserProfileSerializer, TaskSerializer, UserTaskCompletionSerializer
+from .models import DigiUser, DigiPass, PassTransaction,Profile, ProfileScore, Task, UserTaskCompletion
+from .authentication import ProfileClaimsRefreshToken, get_pass_claims, get_point_power, invalidate_pass_claims
 
 logger = logging.getLogger(__name__)
 
@@ -33,10 +53,12 @@ web3 = Web3(Web3.HTTPProvider(BSC_RPC))
 
 
 class WalletLoginView(views.APIView):
+    throttle_classes = [NonceRateThrottle, PostIPRateThrottle, WalletRateThrottle]
+    throttle_scope = "login"
+
     def get(self, request):
-        # Generate nonce for signing (valid for 5 minutes)
-        nonce = get_random_string(32)
-        LoginNonce.objects.create(nonce=nonce)
+        # Generate a signed, self-expiring nonce (valid for 5 minutes). No DB write.
+        nonce = issue_nonce()
         message = f"Login to Digidrop: {nonce}"
         return response.Response({'nonce': nonce, 'message': message}, status=status.HTTP_200_OK)
     
@@ -50,55 +72,35 @@ class WalletLoginView(views.APIView):
         if not all([wallet_address, signature, nonce_str]):
             return response.Response({'error': 'Missing fields'}, status=400)
         
-        try:
-            nonce_obj = LoginNonce.objects.get(nonce=nonce_str)
-            if nonce_obj.used or nonce_obj.is_expired():
-                return response.Response({'error': 'Invalid or expired nonce'}, status=400)
-        except LoginNonce.DoesNotExist:
-            return response.Response({'error': 'Invalid nonce'}, status=400)
+        if not verify_nonce(nonce_str):
+            return response.Response({'error': 'Invalid or expired nonce'}, status=400)
 
         # Verify signature
         message = f"Login to Digidrop: {nonce_str}"
 
         # Step 1: Validate address format
-        w3 = Web3()
-        if not w3.is_checksum_address(wallet_address):
+        if not is_checksum_address(wallet_address):
             try:
-                wallet_address = w3.to_checksum_address(wallet_address)
+                wallet_address = to_checksum_address(wallet_address)
             except ValueError:
                 return response.Response({'error': 'Invalid wallet address'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Step 2: Verify signature
+        # Step 2: Verify signature (offloaded to the recovery pool when configured)
         try:
-            encoded_msg = encode_defunct(text=message)
-            recovered_address = w3.eth.account.recover_message(encoded_msg, signature=signature)
-            if recovered_address.lower() != wallet_address.lower():
+            if not verify_wallet_signature(wallet_address, message, signature):
                 return response.Response({'error': 'Signature mismatch'}, status=status.HTTP_400_BAD_REQUEST)
-        
+        except SignatureQueueFull:
+            return response.Response({'error': 'Login is busy, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+        except SignaturePoolBroken:
+            return response.Response({'error': 'Login is restarting, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
         except Exception:
             return response.Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
 
-        nonce_obj.used = True
-        nonce_obj.save()
-        # Create/find user
-        user, created = DigiUser.objects.get_or_create(
-            wallet_address__iexact=wallet_address,
-            defaults={'wallet_address': wallet_address}
-            )
-        if created and user_ref:
-            referrer = DigiUser.objects.filter(profile__referral_code=user_ref).first()
-            if referrer:
-                user.profile.referred_by = referrer
-                user.profile.save()
-        profile = user.profile  # Assuming OneToOneField; create if not exists via signal
-        today = date.today()
-        if profile.last_login_date != today:
-            base_login_points = 10 
-            multiplier = getattr(profile.current_pass, "point_power", 1)
-            profile.scored_point += base_login_points * multiplier
-            profile.last_login_date = today
-            profile.save()
-        refresh = RefreshToken.for_user(user)
+        if not consume_nonce(nonce_str):
+            return response.Response({'error': 'Invalid or expired nonce'}, status=400)
+        # Create/find user and award daily login points in one short transaction
+        user, created = login_wallet(wallet_address, user_ref)
+        refresh = ProfileClaimsRefreshToken.for_user(user)
         return response.Response({'token': str(refresh.access_token),'refresh': str(refresh),'isNewUser': created}, status=status.HTTP_200_OK)
 
 class PassListEndpoint(generics.ListAPIView):
@@ -119,10 +121,25 @@ class UpdateProfileEndpoint(generics.UpdateAPIView):
         """
         return self.request.user.profile
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # Names and avatars are shown on the leaderboard
+        note_profile_change(self.request.user.pk)
+
 class UserProfileView(generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        # Pass holders are served from the per-user cache; profiles without a pass always
+        # go through get_object so the on-chain self-heal still runs.
+        data = cached_payload(
+            "detail", request.user.pk,
+            lambda: dict(self.get_serializer(self.get_object()).data),
+            cache_if=lambda payload: payload["has_pass"],
+        )
+        return response.Response(data)
+
     def get_object(self):
         profile = (
             Profile.objects.select_related("user", "current_pass").get(user=self.request.user)
@@ -131,14 +148,15 @@ class UserProfileView(generics.RetrieveAPIView):
         # Layer 2 — Self-healing: DB says no pass, but maybe the webhook missed it.
         # Check the smart contract directly and fix the DB if needed.
         if not profile.has_pass:
-            self._sync_pass_from_chain(profile)
+            self.sync_pass_from_chain(profile)
 
         return profile
 
-    def _sync_pass_from_chain(self, profile):
+    @staticmethod
+    def sync_pass_from_chain(profile):
         """Query the BNB Chain contract and heal profile.has_pass if user already minted."""
+        wallet = profile.user.wallet_address
         try:
-            wallet = self.request.user.wallet_address
             w3 = Web3(Web3.HTTPProvider(settings.BSC_RPC))
             with open(settings.BASE_DIR / 'contracts' / 'abi.json') as f:
                 abi = json.load(f)
@@ -154,39 +172,79 @@ class UserProfileView(generics.RetrieveAPIView):
                     )
                     profile.has_pass = True
                     profile.current_pass = digipass
-                    profile.save(update_fields=["has_pass", "current_pass"])
+                    with transaction.atomic():
+                        profile.save(update_fields=["has_pass", "current_pass"])
+                        counters.increment(counters.PASSES)
+                        invalidate_pass_claims(profile.user_id)
         except Exception as exc:
             # Never crash the /profile endpoint over a chain call failure
-            logger.warning(f"[SelfHeal] On-chain check failed for {self.request.user.wallet_address}: {exc}")
+            logger.warning(f"[SelfHeal] On-chain check failed for {wallet}: {exc}")
     
+def scoped_season(request):
+    """
+    The active season, which /leaderboard and profile/stats rank by while one runs;
+    None with ?scope=all-time or between seasons.
+    """
+    if request.query_params.get("scope") == "all-time":
+        return None
+    return resolve_season("current")
+
+
+def scoped_stats(request, load_profile):
+    """profile/stats for the caller; during a season, rank and highest_point are the season's."""
+    user_id = request.user.pk
+    # Cached per generation: any write to this profile is seen on the next load.
+    # Rank and highest point also move with other users, so keep them only briefly.
+    stats = cached_payload(
+        "stats", user_id, lambda: UserProfileStatsView.build_stats(load_profile()),
+        timeout=settings.PROFILE_STATS_CACHE_TTL,
+    )
+    season = scoped_season(request)
+    if season is not None:
+        stats = {**stats, **cached_payload(
+            f"season_stats:{season.id}", user_id, lambda: season_stats(season, user_id),
+            timeout=settings.PROFILE_STATS_CACHE_TTL,
+        )}
+    return with_pending_points(stats, "point", user_id)
+
+
 class UserProfileStatsView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        profile = request.user.profile
-        points = profile.scored_point
+        stats = scoped_stats(
+            request,
+            lambda: Profile.objects.select_related("score").only("referral_count", "score__scored_point").get(user_id=request.user.pk),
+        )
+        return response.Response(stats, status=status.HTTP_200_OK)
 
-        # Calculate rank: count profiles with higher scored_points + 1
-        rank = Profile.objects.filter(scored_point__gt=points).count() + 1
+    @staticmethod
+    def build_stats(profile):
+        points = profile.score.scored_point
+
+        # Rank from the score histogram: profiles with higher scored_points + 1
+        rank = get_rank(points)
 
         # 2️⃣ Get highest score on the platform (rank #1 points)
         highest_score = (
-            Profile.objects.aggregate(max_score=Max("scored_point")).get("max_score", 0)
+            ProfileScore.objects.aggregate(max_score=Max("scored_point")).get("max_score", 0)
         )
 
-        # 3️⃣ Referral count
-        referral_count = request.user.referred_users.count()
+        # 3️⃣ Referral count (maintained on signup)
+        referral_count = profile.referral_count
 
-        return response.Response({
+        return {
             "point": points,
             "rank": rank,
             "highest_point": highest_score or 0,
             "referral_count": referral_count,
-        }, status=status.HTTP_200_OK)
+        }
 
 
 class VerifyPaymentView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserRateThrottle]
+    throttle_scope = "verify_payment"
 
     def post(self, request):
         tx_hash = request.data['txHash']
@@ -228,6 +286,7 @@ class VerifyPaymentView(generics.GenericAPIView):
                     tx_hash=tx_hash,
                     user=request.user,
                 )
+                newly_minted = not tx_obj.minted
 
                 tx_obj.wallet_address = tx["from"]
                 tx_obj.digipass = digipass
@@ -239,6 +298,8 @@ class VerifyPaymentView(generics.GenericAPIView):
                 tx_obj.usd_price = digipass.usd_price
                 tx_obj.is_upgrade = is_upgrade
                 tx_obj.save()
+                if newly_minted:
+                    counters.record_mint(tx_obj.created_at)
 
                 profile = request.user.profile
                 if profile.referred_by and not profile.has_pass:
@@ -248,26 +309,33 @@ class VerifyPaymentView(generics.GenericAPIView):
                 # Login points adjustment logic
                 from datetime import date
                 today = date.today()
-                if profile.last_login_date == today:
+                if profile.score.last_login_date == today:
                     old_pass = profile.current_pass
                     old_power = getattr(old_pass, "point_power", 1) if old_pass else 1
                     new_power = getattr(digipass, "point_power", 1)
                     if new_power > old_power:
                         points_to_add = (new_power - old_power) * 10
-                        profile.scored_point += points_to_add
+                        credit_points(profile.user_id, points_to_add, Reason.PASS_ADJUSTMENT, reference=tx_hash)
                         logger.info(f"[VerifyPayment] Adjusted daily login points for {request.user.wallet_address}: +{points_to_add} points (power {old_power} -> {new_power})")
 
+                if not profile.has_pass:
+                    counters.increment(counters.PASSES)
                 profile.current_pass = digipass
                 profile.has_pass = True
-                profile.save(update_fields=["current_pass", "has_pass", "scored_point"])
+                profile.save(update_fields=["current_pass", "has_pass"])
+                profile.claims_version = invalidate_pass_claims(profile.user_id)
         except IntegrityError:
             return response.Response({"success": True})
 
+        # Fresh tokens carry the new pass claims, so the client can drop the stale ones
+        refresh = ProfileClaimsRefreshToken.for_user(request.user)
         return response.Response({
             "success": True,
             "pass_id": pass_id,
             "points": points,
             "tx_hash": tx_hash,
+            "token": str(refresh.access_token),
+            "refresh": str(refresh),
         })
             
 
@@ -318,12 +386,15 @@ class TaskListView(generics.ListAPIView):
     serializer_class = TaskSerializer
 
     def get_queryset(self):
+        return self.visible_tasks(self.request.user.pk)
+
+    @staticmethod
+    def visible_tasks(user_id):
         from django.db import models
         from django.utils import timezone
         from datetime import date, timedelta
         
         today = timezone.now().date()
-        user = self.request.user
 
         # Fetch all tasks that are active and fit within the scheduled date range
         all_active_tasks = Task.objects.filter(is_active=True).filter(
@@ -336,7 +407,7 @@ class TaskListView(generics.ListAPIView):
         for task in all_active_tasks:
             # Check completions for this task
             completions = UserTaskCompletion.objects.filter(
-                user=user, 
+                user_id=user_id, 
                 task=task, 
                 status=UserTaskCompletion.Status.COMPLETED
             )
@@ -381,7 +452,7 @@ class StartTaskView(views.APIView):
         # Get or create completion record. For daily/weekly tasks, we allow starting a new record if the previous ones are completed.
         # Find if there is an active (started but not completed) completion
         user_task = UserTaskCompletion.objects.filter(
-            user=request.user,
+            user_id=request.user.pk,
             task=task,
             status=UserTaskCompletion.Status.STARTED
         ).first()
@@ -389,7 +460,7 @@ class StartTaskView(views.APIView):
         if not user_task:
             # Check if one_time task is already completed
             completed_exists = UserTaskCompletion.objects.filter(
-                user=request.user,
+                user_id=request.user.pk,
                 task=task,
                 status=UserTaskCompletion.Status.COMPLETED
             ).exists()
@@ -398,12 +469,12 @@ class StartTaskView(views.APIView):
                 return response.Response({"error": "Task already completed"}, status=400)
             
             # For daily/weekly, check if completed within the limit
-            if task.reset_interval == 'daily' and UserTaskCompletion.objects.filter(user=request.user, task=task, status=UserTaskCompletion.Status.COMPLETED, completed_at__date=today).exists():
+            if task.reset_interval == 'daily' and UserTaskCompletion.objects.filter(user_id=request.user.pk, task=task, status=UserTaskCompletion.Status.COMPLETED, completed_at__date=today).exists():
                 return response.Response({"error": "Task already completed today"}, status=400)
 
             # Create a fresh completion record
             user_task = UserTaskCompletion.objects.create(
-                user=request.user,
+                user_id=request.user.pk,
                 task=task,
                 status=UserTaskCompletion.Status.STARTED,
                 started_at=timezone.now()
@@ -425,8 +496,8 @@ class CompleteTaskView(views.APIView):
 
     def post(self, request, task_id):
         # Retrieve the currently started task completion for this user
-        user_task = UserTaskCompletion.objects.filter(
-            user=request.user, 
+        user_task = UserTaskCompletion.objects.select_related("task").filter(
+            user_id=request.user.pk, 
             task_id=task_id, 
             status=UserTaskCompletion.Status.STARTED
         ).first()
@@ -434,12 +505,10 @@ class CompleteTaskView(views.APIView):
         if not user_task:
             return response.Response({"error": "Task not started"}, status=400)
 
-        # Award points
-        profile = request.user.profile
-        multiplier = getattr(profile.current_pass, "point_power", 1)
+        # Award points (multiplier comes from the token's pass claims when current)
+        multiplier = get_point_power(request)
         multiplied_points = user_task.task.points * multiplier
-        profile.scored_point += multiplied_points
-        profile.save(update_fields=["scored_point"])
+        award_points(request.user.pk, multiplied_points, Reason.TASK, reference=task_id)
 
         user_task.status = UserTaskCompletion.Status.COMPLETED
         user_task.completed_at = timezone.now()
@@ -451,35 +520,212 @@ class CompleteTaskView(views.APIView):
             "points_awarded": multiplied_points
         })
 
-class LeaderboardView(generics.ListAPIView):
+class LeaderboardView(views.APIView):
     permission_classes = [HasPassPermission]  # Public leaderboard
-    serializer_class = LeaderboardSerializer
-    pagination_class = None  # No pagination needed for top 100
 
-    def get_queryset(self):
-        return (
-        Profile.objects.filter(has_pass=True, current_pass__isnull=False)
-        .order_by('-scored_point')[:100]
-    )
+    def get(self, request):
+        season = scoped_season(request)
+        if season is not None:
+            # The season's board, in the same row shape; its cache is shared and brief
+            rows = season_board_rows(season)
+            etag = quote_etag(hashlib.md5(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest())
+            resp = get_conditional_response(request, etag=etag) or response.Response(rows, status=status.HTTP_200_OK)
+            resp["ETag"] = etag
+            return resp
+
+        # Every caller sees the same top 100: serve the shared snapshot, or 304 if unchanged
+        snapshot = get_snapshot()
+        etag = quote_etag(snapshot["etag"])
+        last_modified = int(snapshot["last_modified"].timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        resp = not_modified or response.Response(snapshot["rows"], status=status.HTTP_200_OK)
+        resp["ETag"] = etag
+        resp["Last-Modified"] = http_date(last_modified)
+        return resp
+
+
+def _bounded_int_param(request, name, default, maximum):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        return None
+    return value if 1 <= value <= maximum else None
+
+
+class LeaderboardPageView(views.APIView):
+    """Full leaderboard, cursor-paginated with dense ranks: ?limit=&cursor="""
+    permission_classes = [HasPassPermission]
+
+    def get(self, request):
+        limit = _bounded_int_param(request, "limit", 50, settings.LEADERBOARD_PAGE_MAX_SIZE)
+        if limit is None:
+            return response.Response(
+                {"error": f"limit must be between 1 and {settings.LEADERBOARD_PAGE_MAX_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            page = get_page(request.query_params.get("cursor"), limit)
+        except InvalidCursor as exc:
+            return response.Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return response.Response(page, status=status.HTTP_200_OK)
+
+
+class LeaderboardAroundMeView(views.APIView):
+    """The caller and up to ?size= neighbours on each side, with cursors to keep paging."""
+    permission_classes = [HasPassPermission]
+
+    def get(self, request):
+        size = _bounded_int_param(request, "size", 10, settings.LEADERBOARD_PAGE_MAX_SIZE)
+        if size is None:
+            return response.Response(
+                {"error": f"size must be between 1 and {settings.LEADERBOARD_PAGE_MAX_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        window = get_around(request.user.pk, size)
+        if window is None:
+            return response.Response({"error": "You are not on the leaderboard"}, status=status.HTTP_404_NOT_FOUND)
+        return response.Response(window, status=status.HTTP_200_OK)
+
+
+class LeaderboardPeriodView(views.APIView):
+    """Top earners of the day or ISO week containing ?date= (default: today)."""
+    permission_classes = [HasPassPermission]
+
+    def get(self, request, period):
+        day = request.query_params.get("date")
+        try:
+            day = date.fromisoformat(day) if day else None
+        except ValueError:
+            return response.Response({"error": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        return response.Response(get_period_board(period, day), status=status.HTTP_200_OK)
+
+
+class SeasonListView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return response.Response(list_seasons(), status=status.HTTP_200_OK)
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        # Add rank to each (1-based)
-        data = []
-        for rank, profile in enumerate(queryset, start=1):
-            serializer = self.get_serializer(profile, context={'rank': rank})
-            data.append(serializer.data)
+
+class SeasonLeaderboardView(views.APIView):
+    """Top of a season's board; <season> is "current" or a season id."""
+    permission_classes = [HasPassPermission]
+
+    def get(self, request, season):
+        season = resolve_season(season)
+        if season is None:
+            return response.Response({"error": "Season not found"}, status=status.HTTP_404_NOT_FOUND)
+        return response.Response(get_season_board(season), status=status.HTTP_200_OK)
+
+
+class SeasonMeView(views.APIView):
+    """The caller's points and rank in a season."""
+    permission_classes = [HasPassPermission]
+
+    def get(self, request, season):
+        season = resolve_season(season)
+        if season is None:
+            return response.Response({"error": "Season not found"}, status=status.HTTP_404_NOT_FOUND)
+        standing = get_season_standing(season, request.user.pk)
+        if standing is None:
+            return response.Response({"error": "You are not ranked in this season"}, status=status.HTTP_404_NOT_FOUND)
+        return response.Response(standing, status=status.HTTP_200_OK)
+
+
+class TopReferrersView(views.APIView):
+    permission_classes = [HasPassPermission]
+
+    def get(self, request):
+        return response.Response(top_referrers(), status=status.HTTP_200_OK)
+
+
+class DashboardView(views.APIView):
+    """
+    The /profile, /profile/stats, /tasks/, /leaderboard/ and /digi-passes payloads in one
+    response: ?sections=profile,stats,tasks,leaderboard,passes (default: all).
+    Auth, the pass check and the profile load happen once and are shared by the sections,
+    which are built concurrently. A section that fails, or that needs a pass the caller
+    does not have, is left out and reported under "errors".
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    SECTIONS = ("profile", "stats", "tasks", "leaderboard", "passes")
+    PASS_SECTIONS = ("tasks", "leaderboard")
+
+    def get(self, request):
+        sections = request.query_params.get("sections")
+        sections = [name.strip() for name in sections.split(",") if name.strip()] if sections else list(self.SECTIONS)
+        unknown = sorted(set(sections) - set(self.SECTIONS))
+        if unknown:
+            return response.Response(
+                {"error": f"Unknown sections: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        sections = list(dict.fromkeys(sections))
+
+        self.profile_lock = threading.Lock()
+        self.loaded_profile = None
+
+        errors = {}
+        builders = {}
+        claims = get_pass_claims(request)
+        for name in sections:
+            if name in self.PASS_SECTIONS and not self.has_pass(claims):
+                errors[name] = "You need a pass to view this section"
+            else:
+                builders[name] = getattr(self, f"build_{name}")
+
+        results, failed = build_sections(builders)
+        errors.update(failed)
+        data = {name: results[name] for name in sections if name in results}
+        if errors:
+            data["errors"] = errors
         return response.Response(data, status=status.HTTP_200_OK)
 
+    def get_profile(self):
+        # Loaded at most once per request, by whichever section needs it first
+        with self.profile_lock:
+            if self.loaded_profile is None:
+                self.loaded_profile = (
+                    Profile.objects.select_related("user", "current_pass", "score").get(user_id=self.request.user.pk)
+                )
+            return self.loaded_profile
+
+    def has_pass(self, claims):
+        if claims is not None:
+            return claims["has_pass"]
+        return self.get_profile().has_pass
+
+    def build_profile(self):
+        # No on-chain self-heal here: a chain RPC would hold up every section. GET /profile still runs it.
+        return cached_payload(
+            "detail", self.request.user.pk, lambda: dict(UserProfileSerializer(self.get_profile()).data),
+            cache_if=lambda payload: payload["has_pass"],
+        )
+
+    def build_stats(self):
+        return scoped_stats(self.request, self.get_profile)
+
+    def build_tasks(self):
+        tasks = TaskListView.visible_tasks(self.request.user.pk)
+        return TaskSerializer(tasks, many=True, context={"request": self.request}).data
+
+    def build_leaderboard(self):
+        season = scoped_season(self.request)
+        return season_board_rows(season) if season is not None else get_snapshot()["rows"]
+
+    def build_passes(self):
+        return DigiPassSerializer(DigiPass.objects.all(), many=True).data
+
 
 class TestnetOnboardView(views.APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [IPRateThrottle]
+    throttle_scope = "testnet_onboard"
 
     def post(self, request):
         import os
         import requests
         from datetime import timedelta
-        from django.core.cache import cache
         from django.db.models import Q
         from .models import TestnetApplication
 
@@ -497,17 +743,21 @@ class TestnetOnboardView(views.APIView):
             except ValueError:
                 return response.Response({'error': 'Invalid wallet address format.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Step 2: Rate Limiting & Uniqueness Checks
-        if TestnetApplication.objects.filter(wallet_address__iexact=wallet_address).exists():
+        # Step 2: Rate Limiting & Uniqueness Checks (exact matches on the canonical lowercase forms)
+        wallet_key = DigiUser.objects.normalize_wallet_address(wallet_address)
+        if TestnetApplication.objects.filter(wallet_address=wallet_key).exists():
             return response.Response({'error': 'This wallet address has already been registered.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if TestnetApplication.objects.filter(email__iexact=email).exists():
+        if TestnetApplication.objects.filter(email=email).exists():
             return response.Response({'error': 'This email address has already been registered.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        client_ip = request.META.get('HTTP_X_FORWARDED_FOR', request.META.get('REMOTE_ADDR', '')).split(',')[0].strip()
-        ip_cache_key = f"testnet_ip_{client_ip}"
-        if cache.get(ip_cache_key):
-            return response.Response({'error': 'Too many requests from this IP. Please wait 7 days.'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        client_ip = IPRateThrottle().get_ident(request)
+        registration_limit = RateLimiter("testnet_onboard.registration", settings.TESTNET_REGISTRATION_RATE)
+        # Counted up front in one atomic hit: a peek now and a hit after the payout would let
+        # concurrent requests from one IP all pass and all be paid
+        retry_after = registration_limit.hit(client_ip)
+        if retry_after:
+            return response.Response({'error': 'Too many requests from this IP. Please wait 7 days.'}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
 
         # Step 3: Programmatic Faucet Dispatch
         faucet_tx_hash = None
@@ -539,15 +789,12 @@ class TestnetOnboardView(views.APIView):
             platform=request.data.get('platform', ''),
             invite_link=request.data.get('inviteLink', ''),
             member_count=request.data.get('memberCount', ''),
-            wallet_address=wallet_address,
+            wallet_address=wallet_key,
             email=email,
             feedback=request.data.get('feedback', ''),
             faucet_tx_hash=faucet_tx_hash
         )
 
-        # Set IP cache rate limit for 7 days
-        cache.set(ip_cache_key, True, timeout=7 * 24 * 60 * 60)
-
         # Step 5: Send Emails via Resend
         resend_key = getattr(settings, 'RESEND_API_KEY', os.getenv('RESEND_API_KEY', 're_123456789'))
         
@@ -798,21 +1045,73 @@ class TestnetOnboardView(views.APIView):
 
 class GlobalStatsView(views.APIView):
     permission_classes = [permissions.AllowAny]
+    cache_key = "global_stats"
 
     def get(self, request):
-        from django.db.models import Sum
-        from django.utils import timezone
-        from datetime import datetime, time
-        total_users = DigiUser.objects.count()
-        total_passes = Profile.objects.filter(has_pass=True).count()
-        total_points = Profile.objects.aggregate(sum_points=Sum('scored_point'))['sum_points'] or 0
-        
-        today_start = timezone.make_aware(datetime.combine(timezone.now().date(), time.min))
-        minted_today = PassTransaction.objects.filter(minted=True, created_at__gte=today_start).count()
+        # Polled by the landing page: serve a short-lived cached copy of the sharded counters
+        stats = cache.get(self.cache_key)
+        if stats is None:
+            minted_key = counters.minted_counter(timezone.now().date())
+            values = counters.read_counters(counters.USERS, counters.PASSES, counters.POINTS, minted_key)
+            stats = {
+                'total_users': values[counters.USERS],
+                'total_passes': values[counters.PASSES],
+                'total_points': values[counters.POINTS],
+                'minted_today': values[minted_key],
+            }
+            cache.set(self.cache_key, stats, timeout=settings.GLOBAL_STATS_CACHE_TTL)
+
+        return response.Response(stats, status=200)
+
+
+def _sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+class LiveTicketView(views.APIView):
+    """A single-use ticket for opening /live, which EventSource cannot send an Authorization header to."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return response.Response(
+            {"ticket": issue_ticket(request.user.pk), "expires_in": settings.LIVE_TICKET_TTL},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+async def live_events(request):
+    """
+    Server-Sent Events stream replacing leaderboard and points polling. Sends the
+    leaderboard on connect, then leaderboard_diff events (to current pass holders: the
+    pass is rechecked before each diff) and the caller's own points events. Opened with
+    ?ticket= from POST /live/ticket. Only served by the ASGI app (digi_drop/asgi.py):
+    under WSGI the endless stream would pin a sync worker per client.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The live stream is only served by the ASGI app"}, status=503)
+    user_id = await redeem_ticket(request.GET.get("ticket"))
+    if user_id is None:
+        return JsonResponse({"error": "Invalid or expired ticket"}, status=401)
+
+    subscription = await broadcaster.subscribe(user_id)
+    if subscription is None:
+        return JsonResponse({"error": "Invalid or expired ticket"}, status=401)
+
+    async def stream():
+        try:
+            yield f"retry: {settings.LIVE_RETRY_MS}\n\n"
+            while not subscription.dropped:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.LIVE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    resp = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return resp
 
-        return response.Response({
-            'total_users': total_users,
-            'total_passes': total_passes,
-            'total_points': total_points,
-            'minted_today': minted_today
-        }, status=200)